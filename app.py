@@ -557,6 +557,8 @@ def main():
                 if result['success']:
                     response = result['answer']
                     st.markdown(response)
+                    if result.get('cached'):
+                        st.caption(f"⚡ Reused answer to a similar question: \"{result.get('cached_question', '')}\"")
                     
                     # Show reasoning steps if available (collapsible)
                     if result.get('reasoning_steps') and len(result['reasoning_steps']) > 0:
@@ -5,25 +5,89 @@ Trusts LLM reasoning for query generation
 """
 
 import os
+import re
 import json
-from typing import List, Dict, Any, Optional
+import asyncio
+import threading
+from collections import OrderedDict
+from contextvars import ContextVar
+from functools import wraps
+from typing import List, Dict, Any, Optional, Callable
 from dotenv import load_dotenv
 from pydantic import BaseModel, Field
 
-from langchain_openai import ChatOpenAI
+from langchain_openai import ChatOpenAI, OpenAIEmbeddings
 from langchain.agents import AgentExecutor, create_openai_functions_agent
 from langchain.tools import Tool, StructuredTool
 from langchain.prompts import ChatPromptTemplate, MessagesPlaceholder
 from langchain.schema import HumanMessage, AIMessage
 
 # Use relative imports since we're in the src directory
-from sql_executor import SQLExecutor
-from rag_system import LeadRAGSystem
+from sql_executor import SQLExecutor, normalize_query
+from rag_system import FALLBACK_RETRIEVAL, LeadRAGSystem
 from database_schema import get_schema_prompt, get_sample_queries
 from conversation_aggregator import aggregate_conversations
+from tool_output import ToolOutputEncoder, to_columnar
+from answer_cache import entity_terms, get_answer_cache
 
 load_dotenv()
 
+# Output guardrail for the SQL tool: results above SQL_OUTPUT_MAX_ROWS rows are
+# cut down to a SQL_OUTPUT_PREVIEW_ROWS-row preview plus the total count
+SQL_OUTPUT_MAX_ROWS = 50
+SQL_OUTPUT_PREVIEW_ROWS = 10
+
+# Tool-call memoization limits: results kept per memo, and chat sessions
+# whose memos are kept when session-wide memoization is on
+TOOL_MEMO_MAX_ENTRIES = 256
+TOOL_MEMO_MAX_SESSIONS = 100
+
+# semantic_search mode used by the agent tool: keyword lookups ("wifi",
+# "guarantor") are answered by BM25 without an embedding call, everything
+# else by hybrid vector + BM25 retrieval
+AGENT_SEARCH_MODE = "auto"
+
+# Columns whose values name things in questions (statuses, places, ...): a
+# cached answer is only reused for a question naming the same values
+ANSWER_CACHE_ENTITY_COLUMNS = (
+    ("leads", "status"),
+    ("lead_requirements", "nationality"),
+    ("lead_requirements", "location"),
+    ("lead_requirements", "university"),
+    ("lead_requirements", "room_type"),
+    ("lead_properties", "property_name"),
+)
+
+# Columns of semantic_search tool output
+SEARCH_RESULT_COLUMNS = ["distance", "retrieval", "metadata", "content"]
+
+# Memo of the query() call running in the current thread / task
+_current_tool_memo: ContextVar[Optional["_ToolMemo"]] = ContextVar("tool_memo", default=None)
+
+
+class _ToolMemo:
+    """Tool results already computed in one agent run (or chat session)"""
+    
+    def __init__(self, data_version=None):
+        self.data_version = data_version
+        self.results: OrderedDict = OrderedDict()
+        self.saved_calls = 0
+        self.lock = threading.Lock()
+    
+    def get(self, key: str) -> Optional[str]:
+        with self.lock:
+            result = self.results.get(key)
+            if result is not None:
+                self.results.move_to_end(key)
+                self.saved_calls += 1
+            return result
+    
+    def set(self, key: str, result: str) -> None:
+        with self.lock:
+            self.results[key] = result
+            if len(self.results) > TOOL_MEMO_MAX_ENTRIES:
+                self.results.popitem(last=False)
+
 
 class AggregationInput(BaseModel):
     """Input schema for conversation aggregation tool"""
@@ -47,18 +111,34 @@ class AggregationInput(BaseModel):
 class SimpleLeadIntelligenceAgent:
     """Simplified AI Agent with minimal tools - trusts LLM reasoning"""
     
-    def __init__(self, db_path: str = "data/leads.db"):
+    def __init__(
+        self,
+        db_path: str = "data/leads.db",
+        use_answer_cache: bool = True,
+        session_tool_memo: bool = False
+    ):
         """
         Initialize simplified agent
         
         Args:
             db_path: Path to SQLite database
+            use_answer_cache: Reuse answers for paraphrased questions while the
+                data is unchanged (see answer_cache.SemanticAnswerCache)
+            session_tool_memo: Share memoized tool results across all queries
+                with the same session_id (instead of only within one query)
         """
         self.db_path = db_path
+        self.session_tool_memo = session_tool_memo
+        self._session_memos: OrderedDict = OrderedDict()
+        self._session_memos_lock = threading.Lock()
+        self.tool_calls_saved = 0
         
         # Initialize SQL executor
         self.sql_executor = SQLExecutor(db_path=db_path)
         
+        # Compact tool output encoding (+ token savings tracking)
+        self.output_encoder = ToolOutputEncoder()
+        
         # Initialize RAG system
         try:
             self.rag_system = LeadRAGSystem(db_path=db_path)
@@ -79,6 +159,18 @@ class SimpleLeadIntelligenceAgent:
             openai_api_key=api_key
         )
         
+        # Semantic answer cache (shared across agents); questions are embedded
+        # with the RAG system's model when available
+        self.answer_cache = get_answer_cache() if use_answer_cache else None
+        self._answer_terms = (None, frozenset())  # (data version, entity terms)
+        if self.rag_system is not None:
+            self.question_embeddings = self.rag_system.embeddings
+        else:
+            self.question_embeddings = OpenAIEmbeddings(
+                model="text-embedding-3-small",
+                openai_api_key=api_key
+            )
+        
         # Create tools (only 3!)
         self.tools = self._create_tools()
         
@@ -99,7 +191,8 @@ class SimpleLeadIntelligenceAgent:
             verbose=False,
             max_iterations=15,
             max_execution_time=60,
-            handle_parsing_errors=True
+            handle_parsing_errors=True,
+            return_intermediate_steps=True
         )
     
     def _create_tools(self) -> List[Tool]:
@@ -111,7 +204,14 @@ class SimpleLeadIntelligenceAgent:
         tools.append(
             Tool(
                 name="execute_sql_query",
-                func=lambda query, params=None: self._execute_sql_wrapper(query, params),
+                func=self._memoize_tool(
+                    "execute_sql_query",
+                    lambda query, params=None: self._execute_sql_wrapper(query, params)
+                ),
+                coroutine=self._amemoize_tool(
+                    "execute_sql_query",
+                    lambda query, params=None: self._aexecute_sql_wrapper(query, params)
+                ),
                 description="""Execute a SQL SELECT query against the database.
                 
                 Use this for ANY structured data query:
@@ -125,10 +225,12 @@ class SimpleLeadIntelligenceAgent:
                 - query (string): SQL SELECT query
                 - params (optional): Parameters for parameterized queries
                 
-                Returns: Dict with 'columns', 'rows' (list of dicts), 'row_count', and 'error' (if any)
+                Returns: JSON with 'columns' (names, listed once), 'rows' (one array of values per row,
+                in column order), 'row_count', and 'error' (if any)
                 
                 You know the database schema - write SQL directly based on the schema provided in your context.
-                You can write any SQL query as long as it's a SELECT statement.
+                You can write any read-only query: SELECT, WITH ... SELECT (CTEs) and window functions all work.
+                The connection is read-only, so statements that modify data are rejected.
                 """
             )
         )
@@ -138,7 +240,8 @@ class SimpleLeadIntelligenceAgent:
             tools.append(
                 Tool(
                     name="semantic_search",
-                    func=self._semantic_search_wrapper,
+                    func=self._memoize_tool("semantic_search", self._semantic_search_wrapper),
+                    coroutine=self._amemoize_tool("semantic_search", self._asemantic_search_wrapper),
                     description="""Search conversations and lead data semantically using RAG.
                     
                     Use this for:
@@ -152,7 +255,13 @@ class SimpleLeadIntelligenceAgent:
                     Input: query (string) - Natural language query to search for
                     Optional: n_results (int) - Number of results (default: 5)
                     
-                    Returns: List of relevant conversation excerpts with context
+                    Several related searches? Pass them at once as a JSON list of
+                    strings, e.g. ["wifi problems", "deposit refunds", "guarantor"]
+                    (one call instead of one per query).
+                    
+                    Returns: JSON with 'columns' (distance, metadata, content) and 'rows'
+                    (one array per relevant conversation excerpt, most relevant first).
+                    For a list of queries: {"searches": [{"query", "columns", "rows"}, ...]}
                     """
                 )
             )
@@ -160,7 +269,7 @@ class SimpleLeadIntelligenceAgent:
         # Tool 3: Conversation Aggregator (for text-based aggregation) - Using StructuredTool
         tools.append(
             StructuredTool.from_function(
-                func=self._aggregate_conversations_structured,
+                func=self._memoize_tool("aggregate_conversations", self._aggregate_conversations_structured),
                 name="aggregate_conversations",
                 description="""Aggregate and analyze conversations for patterns, counts, and rankings.
                 
@@ -191,7 +300,7 @@ class SimpleLeadIntelligenceAgent:
         tools.append(
             Tool(
                 name="get_lead_by_id",
-                func=self._get_lead_wrapper,
+                func=self._memoize_tool("get_lead_by_id", self._get_lead_wrapper),
                 description="""Quick lookup for a specific lead by ID.
                 
                 Use this for convenience when you need basic lead info quickly.
@@ -205,47 +314,204 @@ class SimpleLeadIntelligenceAgent:
         
         return tools
     
+    def _tool_memo_key(self, tool_name: str, args: tuple, kwargs: dict) -> str:
+        """
+        Memo key for a tool call: tool name plus normalized arguments
+        
+        SQL is normalized like the executor does (comments, whitespace), other
+        string arguments have their whitespace collapsed.
+        """
+        if tool_name == "execute_sql_query":
+            sql_query, params = self._parse_sql_tool_input(*args, **kwargs)
+            normalized = [normalize_query(sql_query), params]
+        else:
+            def normalize(value):
+                if isinstance(value, str):
+                    return re.sub(r'\s+', ' ', value).strip()
+                if isinstance(value, dict):
+                    return {k: normalize(v) for k, v in value.items()}
+                if isinstance(value, (list, tuple)):
+                    return [normalize(v) for v in value]
+                return value
+            normalized = [normalize(list(args)), normalize(kwargs)]
+        return f"{tool_name}:{json.dumps(normalized, sort_keys=True, default=str)}"
+    
+    @staticmethod
+    def _is_memoizable(output: Any) -> bool:
+        """
+        Only successful results are reused: errors may be transient, and so
+        are lexical fallbacks of semantic_search (a retry may get vector results)
+        """
+        if not isinstance(output, str):
+            return False
+        try:
+            parsed = json.loads(output)
+        except ValueError:
+            return True
+        if not isinstance(parsed, dict):
+            return True
+        if parsed.get("error"):
+            return False
+        for table in parsed.get("searches") or [parsed]:
+            columns = table.get("columns") if isinstance(table, dict) else None
+            if isinstance(columns, list) and "retrieval" in columns:
+                position = columns.index("retrieval")
+                if any(row[position] == FALLBACK_RETRIEVAL for row in table.get("rows") or []):
+                    return False
+        return True
+    
+    def _memoize_tool(self, tool_name: str, func: Callable) -> Callable:
+        """Wrap a tool function so repeated calls within a run return the prior result"""
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            memo = _current_tool_memo.get()
+            if memo is None:
+                return func(*args, **kwargs)
+            key = self._tool_memo_key(tool_name, args, kwargs)
+            result = memo.get(key)
+            if result is not None:
+                return result
+            result = func(*args, **kwargs)
+            if self._is_memoizable(result):
+                memo.set(key, result)
+            return result
+        return wrapper
+    
+    def _amemoize_tool(self, tool_name: str, coroutine: Callable) -> Callable:
+        """Async counterpart of _memoize_tool"""
+        @wraps(coroutine)
+        async def wrapper(*args, **kwargs):
+            memo = _current_tool_memo.get()
+            if memo is None:
+                return await coroutine(*args, **kwargs)
+            key = self._tool_memo_key(tool_name, args, kwargs)
+            result = memo.get(key)
+            if result is not None:
+                return result
+            result = await coroutine(*args, **kwargs)
+            if self._is_memoizable(result):
+                memo.set(key, result)
+            return result
+        return wrapper
+    
+    def _get_tool_memo(self, session_id: Optional[str]) -> _ToolMemo:
+        """
+        Memo for a query: fresh per query, or the session's memo when
+        session_tool_memo is on (reset whenever the data version changes)
+        """
+        if not (self.session_tool_memo and session_id):
+            return _ToolMemo()
+        version = self.sql_executor.data_version()
+        with self._session_memos_lock:
+            memo = self._session_memos.get(session_id)
+            if memo is None or memo.data_version != version:
+                memo = _ToolMemo(data_version=version)
+                self._session_memos[session_id] = memo
+            self._session_memos.move_to_end(session_id)
+            while len(self._session_memos) > TOOL_MEMO_MAX_SESSIONS:
+                self._session_memos.popitem(last=False)
+            return memo
+    
+    def _run_with_tool_memo(self, session_id: Optional[str]):
+        """Activate a tool memo for the current context; returns (memo, token, saved_before)"""
+        memo = self._get_tool_memo(session_id)
+        token = _current_tool_memo.set(memo)
+        return memo, token, memo.saved_calls
+    
+    def _finish_tool_memo(self, memo: _ToolMemo, token, saved_before: int) -> int:
+        """Deactivate the memo and return the tool calls it saved during this query"""
+        _current_tool_memo.reset(token)
+        saved = memo.saved_calls - saved_before
+        with self._session_memos_lock:
+            self.tool_calls_saved += saved
+        return saved
+    
+    @staticmethod
+    def _parse_sql_tool_input(query: Any, params: Optional[Any] = None) -> tuple:
+        """Normalize the SQL tool input into (sql_query, params)"""
+        # LangChain may pass query as string or dict
+        if isinstance(query, dict):
+            sql_query = query.get('query', '') or query.get('input', '')
+            params = query.get('params', params)
+        else:
+            sql_query = str(query)
+        
+        # Handle params
+        if params:
+            if isinstance(params, str):
+                try:
+                    params = json.loads(params)
+                    if isinstance(params, list):
+                        params = tuple(params)
+                except:
+                    params = (params,)
+            elif isinstance(params, list):
+                params = tuple(params)
+        
+        return sql_query, params
+    
+    def _format_sql_tool_result(self, result: Dict[str, Any]) -> str:
+        """Apply the output guardrail to a page result and serialize it compactly for the LLM"""
+        columns = result.get('columns', [])
+        rows = result.get('rows', [])
+        
+        # 🛡️ HARD GUARDRAIL: Prevent large outputs (safety net if LLM forgets)
+        if result.get('truncated'):
+            total_count = result.get('total_count', 0)
+            total_label = str(total_count) if result.get('total_is_exact') else f"at least {total_count}"
+            rows = rows[:SQL_OUTPUT_PREVIEW_ROWS]
+            # Truncate to preview rows with warning
+            output = {
+                "row_count": total_count,
+                "total_is_exact": result.get('total_is_exact', True),
+                "truncated": True,
+                "original_count": total_count,
+                "warning": f"⚠️ LARGE OUTPUT DETECTED: Query returned {total_label} rows. "
+                          f"Automatically limited to first {SQL_OUTPUT_PREVIEW_ROWS} for practical display. "
+                          f"Consider: (1) Adding WHERE filters, (2) Using aggregations (COUNT, AVG), "
+                          f"or (3) Asking for analysis instead of raw data."
+            }
+        else:
+            output = {
+                "row_count": result.get('row_count', 0),
+                "error": result.get('error')
+            }
+            if result.get('budget_exceeded'):
+                # Give the LLM the plan so it can fix the join/filter and retry
+                output["budget_exceeded"] = True
+                output["query_plan"] = result.get('query_plan', [])
+        
+        # Column names once, rows as arrays
+        compact = {**to_columnar(rows, columns), **output}
+        legacy = {"columns": columns, "rows": rows, **output}
+        return self.output_encoder.encode("execute_sql_query", compact, legacy_payload=legacy)
+    
     def _execute_sql_wrapper(self, query: str, params: Optional[Any] = None) -> str:
         """Wrapper for SQL execution with smart output guardrail"""
         try:
-            # LangChain may pass query as string or dict
-            if isinstance(query, dict):
-                sql_query = query.get('query', '') or query.get('input', '')
-                params = query.get('params', params)
-            else:
-                sql_query = str(query)
-            
-            # Handle params
-            if params:
-                if isinstance(params, str):
-                    try:
-                        params = json.loads(params)
-                        if isinstance(params, list):
-                            params = tuple(params)
-                    except:
-                        params = (params,)
-                elif isinstance(params, list):
-                    params = tuple(params)
-            
-            result = self.sql_executor.execute(sql_query, params)
+            sql_query, params = self._parse_sql_tool_input(query, params)
             
-            # 🛡️ HARD GUARDRAIL: Prevent large outputs (safety net if LLM forgets)
-            if result.get('row_count', 0) > 50:
-                # Truncate to 10 rows with warning
-                truncated_result = {
-                    "columns": result.get('columns', []),
-                    "rows": result.get('rows', [])[:10],
-                    "row_count": result.get('row_count', 0),
-                    "truncated": True,
-                    "original_count": result.get('row_count', 0),
-                    "warning": f"⚠️ LARGE OUTPUT DETECTED: Query returned {result.get('row_count', 0)} rows. "
-                              f"Automatically limited to first 10 for practical display. "
-                              f"Consider: (1) Adding WHERE filters, (2) Using aggregations (COUNT, AVG), "
-                              f"or (3) Asking for analysis instead of raw data."
-                }
-                return json.dumps(truncated_result, indent=2, default=str)
-            
-            return json.dumps(result, indent=2, default=str)
+            # Only max_rows + 1 rows are fetched and the rest are counted on the
+            # open cursor, so only the rows we actually show are materialized
+            result = self.sql_executor.execute_page(
+                sql_query, params,
+                max_rows=SQL_OUTPUT_MAX_ROWS,
+                preview_rows=SQL_OUTPUT_PREVIEW_ROWS
+            )
+            return self._format_sql_tool_result(result)
+        except Exception as e:
+            return json.dumps({"error": f"Error executing SQL: {str(e)}"})
+    
+    async def _aexecute_sql_wrapper(self, query: str, params: Optional[Any] = None) -> str:
+        """Async wrapper for SQL execution (used when the agent runs via aquery)"""
+        try:
+            sql_query, params = self._parse_sql_tool_input(query, params)
+            result = await self.sql_executor.aexecute(
+                sql_query, params,
+                max_rows=SQL_OUTPUT_MAX_ROWS,
+                preview_rows=SQL_OUTPUT_PREVIEW_ROWS
+            )
+            return self._format_sql_tool_result(result)
         except Exception as e:
             return json.dumps({"error": f"Error executing SQL: {str(e)}"})
     
@@ -260,12 +526,18 @@ class SimpleLeadIntelligenceAgent:
         try:
             # Handle different input formats
             if isinstance(query, dict):
-                search_query = query.get('query', '') or query.get('input', '')
+                search_query = query.get('queries') or query.get('query', '') or query.get('input', '')
                 n_results = query.get('n_results', n_results)
+                mode = query.get('mode', AGENT_SEARCH_MODE)
             else:
-                search_query = str(query)
+                search_query = query
+                mode = AGENT_SEARCH_MODE
             
-            results = self.rag_system.semantic_search(search_query, n_results=n_results)
+            search_queries = self._parse_search_queries(search_query)
+            if search_queries is not None:
+                return self._semantic_search_many(search_queries, n_results, mode)
+            
+            results = self.rag_system.semantic_search(str(search_query), n_results=n_results, mode=mode)
             
             # If no results, provide helpful message
             if not results or len(results) == 0:
@@ -275,7 +547,8 @@ class SimpleLeadIntelligenceAgent:
                     "results": []
                 })
             
-            return json.dumps(results, indent=2, default=str)
+            compact = to_columnar(self._search_rows(results), SEARCH_RESULT_COLUMNS)
+            return self.output_encoder.encode("semantic_search", compact, legacy_payload=results)
         except Exception as e:
             error_msg = str(e)
             # Provide helpful error message with SQL fallback suggestion
@@ -284,6 +557,44 @@ class SimpleLeadIntelligenceAgent:
                 "suggestion": "The RAG system may not be fully initialized. You can query conversation data directly using execute_sql_query. Example: SELECT l.lead_id, l.name, l.status, SUBSTR(l.communication_timeline, 1, 1000) as conversation FROM leads l WHERE l.communication_timeline IS NOT NULL"
             })
     
+    @staticmethod
+    def _parse_search_queries(query: Any) -> Optional[List[str]]:
+        """Queries of a multi-query tool input (a list, or a JSON list string); None for a single query"""
+        if isinstance(query, str) and query.strip().startswith('['):
+            try:
+                query = json.loads(query)
+            except ValueError:
+                return None
+        if isinstance(query, (list, tuple)):
+            return [str(q) for q in query if str(q).strip()]
+        return None
+    
+    @staticmethod
+    def _search_rows(results: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """Search results reduced to the fields shown to the LLM"""
+        return [
+            {"distance": r.get('distance'), "retrieval": r.get('retrieval'), "metadata": r.get('metadata'),
+             "content": r.get('content')}
+            for r in results
+        ]
+    
+    def _semantic_search_many(self, queries: List[str], n_results: int, mode: str) -> str:
+        """Run a list of searches with one embedding request and one vector query"""
+        if not queries:
+            return json.dumps({"error": "No queries given", "searches": []})
+        
+        all_results = self.rag_system.semantic_search_many(queries, n_results=n_results, mode=mode)
+        compact = {"searches": [
+            {"query": q, **to_columnar(self._search_rows(results), SEARCH_RESULT_COLUMNS)}
+            for q, results in zip(queries, all_results)
+        ]}
+        legacy = {"searches": [{"query": q, "results": results} for q, results in zip(queries, all_results)]}
+        return self.output_encoder.encode("semantic_search", compact, legacy_payload=legacy)
+    
+    async def _asemantic_search_wrapper(self, query: str, n_results: int = 5) -> str:
+        """Async wrapper for semantic search (embedding + vector lookup run off the event loop)"""
+        return await asyncio.to_thread(self._semantic_search_wrapper, query, n_results)
+    
     def _aggregate_conversations_structured(
         self,
         aggregation_type: str,
@@ -336,7 +647,7 @@ class SimpleLeadIntelligenceAgent:
 
 ## YOUR TOOLS (4 tools):
 1. **execute_sql_query** - Write SQL for structured data queries (counts, filtering, joins, etc.)
-2. **semantic_search** - Search conversations for examples, themes, patterns (returns 5-10 samples)
+2. **semantic_search** - Search conversations for examples, themes, patterns (returns 5-10 samples); pass a JSON list of queries to run several related searches in one call
 3. **aggregate_conversations** - Analyze ALL conversations for patterns, counts, rankings (for "top/most" queries)
 4. **get_lead_by_id** - Quick lead lookup (convenience)
 
@@ -605,6 +916,108 @@ Always answer the user's question directly. Use tools when needed. Be honest abo
         
         return prompt
     
+    @staticmethod
+    def _to_langchain_history(chat_history: Optional[List]) -> List:
+        """Convert chat history (messages or role/content dicts) to LangChain format"""
+        langchain_history = []
+        if chat_history:
+            for msg in chat_history:
+                if isinstance(msg, (HumanMessage, AIMessage)):
+                    langchain_history.append(msg)
+                elif isinstance(msg, dict):
+                    if msg.get("role") == "user":
+                        langchain_history.append(HumanMessage(content=msg.get("content", "")))
+                    elif msg.get("role") == "assistant":
+                        langchain_history.append(AIMessage(content=msg.get("content", "")))
+        return langchain_history
+    
+    def _embed_question(self, question: str) -> List[float]:
+        """
+        Embed a question for the answer cache
+        
+        Goes through the RAG system's query-embedding cache when available, so
+        the embedding is computed once and shared with semantic searches.
+        """
+        if self.rag_system is not None:
+            return self.rag_system._embed_query(question)
+        return self.question_embeddings.embed_query(question)
+    
+    def _answer_entity_terms(self, data_version) -> frozenset:
+        """Entity words of ANSWER_CACHE_ENTITY_COLUMNS, reloaded when the data changes"""
+        version, terms = self._answer_terms
+        if version == data_version:
+            return terms
+        values = []
+        for table, column in ANSWER_CACHE_ENTITY_COLUMNS:
+            result = self.sql_executor.execute(f"SELECT DISTINCT {column} FROM {table}")
+            if not result.get('error'):
+                values.extend(row[column] for row in result['rows'])
+        terms = entity_terms(values)
+        self._answer_terms = (data_version, terms)
+        return terms
+    
+    def _answer_scope(self, chat_history: Optional[List]) -> Optional[tuple]:
+        """
+        Answer cache scope for a question: (namespace, version, entity terms)
+        
+        The namespace covers the database, model and search mode; the version
+        covers both the data and the search index. Follow-up questions
+        (non-empty chat history) get None and are never cached, since their
+        meaning depends on the conversation.
+        """
+        if self.answer_cache is None or chat_history:
+            return None
+        data_version = self.sql_executor.data_version()
+        if data_version is None:
+            return None
+        index_version = self.rag_system.index_version() if self.rag_system is not None else None
+        namespace = (self.db_path, getattr(self.llm, "model_name", None), AGENT_SEARCH_MODE)
+        return namespace, (data_version, index_version), self._answer_entity_terms(data_version)
+    
+    def _lookup_answer(self, question: str, chat_history: Optional[List]) -> tuple:
+        """
+        Check the semantic answer cache for a question
+        
+        Returns:
+            (cached_response or None, scope); scope is None when the answer
+            can't be cached
+        """
+        try:
+            scope = self._answer_scope(chat_history)
+            if scope is None:
+                return None, None
+            namespace, version, terms = scope
+            hit = self.answer_cache.lookup(question.strip(), self._embed_question, namespace, version, terms)
+        except Exception:
+            # Cache failures (e.g. embedding errors) must never block answering
+            return None, None
+        
+        if hit is None:
+            return None, scope
+        return {
+            "answer": hit["answer"],
+            "success": True,
+            "error": None,
+            "iterations": 0,
+            "cached": True,
+            "cached_question": hit["question"],
+            "similarity": round(hit["similarity"], 4)
+        }, scope
+    
+    def _store_answer(self, question: str, scope: Optional[tuple], response: Dict[str, Any]) -> None:
+        """Remember a successful answer for similar future questions"""
+        if scope is None or not response.get("success") or not response.get("answer"):
+            return
+        namespace, version, terms = scope
+        try:
+            self.answer_cache.add(
+                question.strip(), response["answer"], self._embed_question, namespace, version, terms,
+                metadata={"iterations": response.get("iterations", 0)}
+            )
+        except Exception:
+            # Caching is best effort; the answer itself is already computed
+            pass
+    
     def query(
         self,
         question: str,
@@ -619,10 +1032,14 @@ Always answer the user's question directly. Use tools when needed. Be honest abo
             question: User's question
             chat_history: Optional chat history (List of HumanMessage/AIMessage)
             user_id: Optional user ID for logging
-            session_id: Optional session ID for logging
+            session_id: Optional session ID for logging (and for sharing
+                memoized tool results when session_tool_memo is on)
             
         Returns:
-            Dict with 'answer', 'success', 'error' (if any)
+            Dict with 'answer', 'success', 'error' (if any), 'iterations' and
+            'tool_calls_saved' (repeated tool calls answered from the memo).
+            Answers served from the semantic answer cache also carry
+            'cached': True, 'cached_question' and 'similarity'.
         """
         try:
             # Validate input
@@ -633,29 +1050,89 @@ Always answer the user's question directly. Use tools when needed. Be honest abo
                     "error": "Invalid question: must be a non-empty string"
                 }
             
-            # Convert chat history to LangChain format
-            langchain_history = []
-            if chat_history:
-                for msg in chat_history:
-                    if isinstance(msg, (HumanMessage, AIMessage)):
-                        langchain_history.append(msg)
-                    elif isinstance(msg, dict):
-                        if msg.get("role") == "user":
-                            langchain_history.append(HumanMessage(content=msg.get("content", "")))
-                        elif msg.get("role") == "assistant":
-                            langchain_history.append(AIMessage(content=msg.get("content", "")))
+            # Paraphrase of a recent question on unchanged data? Skip the LLM
+            cached, scope = self._lookup_answer(question, chat_history)
+            if cached is not None:
+                return cached
             
-            # Execute query
-            result = self.agent_executor.invoke({
-                "input": question,
-                "chat_history": langchain_history
-            })
+            # Execute query (identical tool calls within the run are memoized)
+            memo, token, saved_before = self._run_with_tool_memo(session_id)
+            try:
+                result = self.agent_executor.invoke({
+                    "input": question,
+                    "chat_history": self._to_langchain_history(chat_history)
+                })
+            finally:
+                tool_calls_saved = self._finish_tool_memo(memo, token, saved_before)
             
+            response = {
+                "answer": result.get('output', ''),
+                "success": True,
+                "error": None,
+                # Agent iterations (tool calls) used to reach the answer
+                "iterations": len(result.get('intermediate_steps', [])),
+                "tool_calls_saved": tool_calls_saved
+            }
+            self._store_answer(question, scope, response)
+            return response
+            
+        except Exception as e:
+            error_msg = str(e)
             return {
+                "answer": f"I encountered an error: {error_msg}",
+                "success": False,
+                "error": error_msg
+            }
+    
+    async def aquery(
+        self,
+        question: str,
+        chat_history: Optional[List] = None,
+        user_id: Optional[str] = None,
+        session_id: Optional[str] = None
+    ) -> Dict[str, Any]:
+        """
+        Async version of query for asyncio-based servers
+        
+        Tool calls go through the async tool wrappers, so SQL runs on the
+        executor's bounded worker pool and several questions can be served
+        concurrently without blocking the event loop.
+        
+        Returns:
+            Same dict as query
+        """
+        try:
+            if not question or not isinstance(question, str):
+                return {
+                    "answer": "",
+                    "success": False,
+                    "error": "Invalid question: must be a non-empty string"
+                }
+            
+            cached, scope = await asyncio.to_thread(
+                self._lookup_answer, question, chat_history
+            )
+            if cached is not None:
+                return cached
+            
+            memo, token, saved_before = self._run_with_tool_memo(session_id)
+            try:
+                result = await self.agent_executor.ainvoke({
+                    "input": question,
+                    "chat_history": self._to_langchain_history(chat_history)
+                })
+            finally:
+                tool_calls_saved = self._finish_tool_memo(memo, token, saved_before)
+            
+            response = {
                 "answer": result.get('output', ''),
                 "success": True,
-                "error": None
+                "error": None,
+                "iterations": len(result.get('intermediate_steps', [])),
+                "tool_calls_saved": tool_calls_saved
             }
+            await asyncio.to_thread(self._store_answer, question, scope, response)
+            return response
             
         except Exception as e:
             error_msg = str(e)
@@ -664,4 +1141,14 @@ Always answer the user's question directly. Use tools when needed. Be honest abo
                 "success": False,
                 "error": error_msg
             }
-
+    
+    def get_tool_output_stats(self) -> Dict[str, Any]:
+        """
+        Get token usage of tool outputs fed back to the LLM
+        
+        Returns:
+            Dict with tokens spent vs. the legacy indent=2 encoding, overall
+            and per tool, plus the most recent per-call measurements (only
+            measured when TOOL_OUTPUT_TRACK_SAVINGS=1; 'tracking' says which)
+        """
+        return self.output_encoder.get_stats()
@@ -0,0 +1,394 @@
+"""
+Semantic Answer Cache
+Reuses agent answers for paraphrased questions asked against unchanged data
+"""
+
+import hashlib
+import json
+import re
+import threading
+import time
+from typing import Any, Callable, Dict, FrozenSet, Hashable, Iterable, List, Optional, Sequence
+
+import numpy as np
+
+try:
+    from query_cache import get_disk_cache
+except ImportError:
+    def get_disk_cache(path=None):
+        return None
+
+
+# Cosine similarity above which two questions are treated as the same question
+DEFAULT_SIMILARITY_THRESHOLD = 0.95
+
+# Answers kept per scope (oldest are dropped first)
+DEFAULT_MAX_ENTRIES = 500
+
+# Backstop expiry for cached answers in seconds
+DEFAULT_ANSWER_TTL = 24 * 3600
+
+# Capitalized words that start or phrase a question rather than name something
+GENERIC_WORDS = frozenset("""
+a all an and any are average breakdown can compare could count did do does find for get give how i in is
+list me my number of on or our percentage please show summarize tell the top total us we what when where
+which who whom whose why
+""".split())
+
+# Comparison and negation wording, by the qualifier it puts on a question's
+# literals ("leads above 5 tasks" vs "leads below 5 tasks", "with" vs "without")
+QUALIFIERS = {
+    ">=": ("at least", "no less than", "no fewer than", ">="),
+    "<=": ("at most", "no more than", "<="),
+    ">": ("above", "over", "more", "greater", "exceeding", ">"),
+    "<": ("below", "under", "less", "fewer", "<"),
+    "not": ("not", "no", "without", "excluding", "except", "never", "n't", "n’t", "!=", "<>"),
+}
+
+
+def _qualifier_pattern(phrase: str) -> str:
+    """Regex for a QUALIFIERS phrase: whole words, any whitespace; contractions ("n't") as suffixes"""
+    pattern = re.escape(phrase).replace(r"\ ", r"\s+")
+    if phrase[0].isalpha() and phrase[1] not in "'’":
+        pattern = r"\b" + pattern
+    if phrase[-1].isalpha():
+        pattern += r"\b"
+    if phrase == "no":
+        pattern += r"(?!\.)"  # "no. of leads" is a number, not a negation
+    return pattern
+
+
+_QUALIFIER_OF = {phrase: qualifier for qualifier, phrases in QUALIFIERS.items() for phrase in phrases}
+_QUALIFIER_RE = re.compile(
+    "|".join(_qualifier_pattern(phrase) for phrase in sorted(_QUALIFIER_OF, key=len, reverse=True)),
+    re.IGNORECASE
+)
+_NUMBER_RE = re.compile(r"\d+(?:[.,]\d+)*")
+_QUOTED_RE = re.compile(r'"([^"]+)"|“([^”]+)”|(?<!\w)\'([^\']+)\'(?!\w)')
+_CAPITALIZED_RE = re.compile(r"\b[A-Z][\w'-]*")
+_WORD_RE = re.compile(r"\w+")
+
+
+def normalize_question(question: str) -> str:
+    """Question text as compared for exact repeats (case and whitespace folded)"""
+    return " ".join(question.lower().split()).rstrip("?!. ")
+
+
+def entity_terms(values: Iterable[Optional[str]]) -> FrozenSet[str]:
+    """Lowercase words of entity values (e.g. lead statuses, countries) for question_literals"""
+    terms = set()
+    for value in values:
+        if value:
+            terms.update(word for word in _WORD_RE.findall(str(value).lower()) if word not in GENERIC_WORDS)
+    return frozenset(terms)
+
+
+def question_literals(question: str, terms: FrozenSet[str] = frozenset()) -> str:
+    """
+    Signature of the literals a question names
+
+    Numbers, quoted strings, capitalized words (other than GENERIC_WORDS),
+    any word found in terms, and the comparisons and negations (QUALIFIERS)
+    applied to them. Two questions with different signatures ask about
+    different things, however similar their embeddings are ("Won leads in
+    India" vs "Lost leads in China", "more than 5 tasks" vs "at most 5 tasks").
+    """
+    literals = {number.replace(",", "") for number in _NUMBER_RE.findall(question)}
+    literals.update(
+        "".join(groups).strip().lower() for groups in _QUOTED_RE.findall(question)
+    )
+    literals.update(
+        word.lower() for word in _CAPITALIZED_RE.findall(question)
+        if word.lower() not in GENERIC_WORDS and word.lower() not in _QUALIFIER_OF
+    )
+    literals.update(word for word in _WORD_RE.findall(question.lower()) if word in terms)
+    literals.update(
+        "op:" + _QUALIFIER_OF[" ".join(phrase.lower().split())] for phrase in _QUALIFIER_RE.findall(question)
+    )
+    return "|".join(sorted(literals))
+
+
+class _ScopeIndex:
+    """Normalized question embeddings and answers for one (namespace, version) scope"""
+
+    def __init__(self, capacity: int):
+        self.vectors: Optional[np.ndarray] = None  # Allocated on the first answer
+        self.created = np.zeros(capacity, dtype=np.float64)
+        self.literals = np.empty(capacity, dtype=object)
+        self.entries: List[Optional[Dict[str, Any]]] = [None] * capacity
+        self.questions: Dict[str, int] = {}  # Normalized question -> slot
+        self.count = 0
+        self.next_slot = 0  # Ring buffer: overwrite the oldest answer when full
+
+    def put(self, vector: np.ndarray, created: float, entry: Dict[str, Any], literals: str) -> None:
+        """Store an answer in the next slot"""
+        capacity = len(self.entries)
+        if self.vectors is None or self.vectors.shape[1] != vector.shape[0]:
+            # First answer, or the embedding model changed: start over
+            self.__init__(capacity)
+            self.vectors = np.zeros((capacity, vector.shape[0]), dtype=np.float32)
+        slot = self.next_slot
+        replaced = self.entries[slot]
+        if replaced is not None and self.questions.get(replaced["key"]) == slot:
+            del self.questions[replaced["key"]]
+        self.vectors[slot] = vector
+        self.created[slot] = created
+        self.literals[slot] = literals
+        self.entries[slot] = entry
+        self.questions[entry["key"]] = slot
+        self.next_slot = (slot + 1) % capacity
+        self.count = min(self.count + 1, capacity)
+
+    def live(self, ttl: Optional[float]) -> np.ndarray:
+        """Mask of the stored answers that have not expired"""
+        if ttl is None:
+            return np.ones(self.count, dtype=bool)
+        return self.created[:self.count] >= time.time() - ttl
+
+
+class SemanticAnswerCache:
+    """
+    Cache of answered questions looked up by embedding similarity
+
+    Answers are grouped by scope: a namespace (e.g. database path and agent
+    mode) plus the version the answer was computed against (e.g. data and
+    index versions). Looking up a new version drops the namespace's older
+    versions, so answers never outlive the data they were based on.
+
+    A question only matches answers to questions naming the same literals
+    (see question_literals); among those, the most similar one above the
+    threshold is returned. Questions are embedded lazily: an exact repeat,
+    or a question with no same-literal answer in scope, costs no embedding.
+    A lookup is a single matrix-vector product over at most max_entries rows.
+
+    With a disk tier (l2), every answer is also written there under its
+    scope, and a scope not yet in memory is loaded from disk on first use,
+    so answers survive restarts while the data is unchanged.
+    """
+
+    def __init__(
+        self,
+        threshold: float = DEFAULT_SIMILARITY_THRESHOLD,
+        max_entries: int = DEFAULT_MAX_ENTRIES,
+        ttl: Optional[float] = DEFAULT_ANSWER_TTL,
+        l2: Optional[Any] = None
+    ):
+        """
+        Initialize answer cache
+
+        Args:
+            threshold: Minimum cosine similarity for a hit
+            max_entries: Maximum answers kept per scope
+            ttl: Seconds before a cached answer is ignored (None = no expiry)
+            l2: Optional persistent tier (query_cache.DiskCache)
+        """
+        self.threshold = threshold
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.l2 = l2
+        self._lock = threading.Lock()
+        self._scopes: Dict[Hashable, Dict[Hashable, _ScopeIndex]] = {}
+        self.hits = 0
+        self.misses = 0
+        self.embeddings = 0
+
+    @staticmethod
+    def _normalize(embedding: Sequence[float]) -> Optional[np.ndarray]:
+        """Unit-length float32 copy of an embedding (None for a zero vector)"""
+        vector = np.asarray(embedding, dtype=np.float32)
+        norm = float(np.linalg.norm(vector))
+        if norm == 0.0:
+            return None
+        return vector / norm
+
+    @staticmethod
+    def _l2_scope(namespace: Hashable, version: Hashable) -> str:
+        """Disk tier namespace of a scope"""
+        return "answer:" + json.dumps([namespace, version], default=str)
+
+    def _load_scope(self, namespace: Hashable, version: Hashable) -> Optional[_ScopeIndex]:
+        """Rebuild a scope from the disk tier (None if it has no answers there)"""
+        if self.l2 is None:
+            return None
+        stored = [entry for _, entry in self.l2.items(self._l2_scope(namespace, version))][-self.max_entries:]
+        if not stored:
+            return None
+        index = _ScopeIndex(self.max_entries)
+        for entry in stored:
+            vector = self._normalize(entry["embedding"])
+            if vector is not None:
+                index.put(vector, entry["created"], {
+                    "key": normalize_question(entry["question"]),
+                    "question": entry["question"],
+                    "answer": entry["answer"],
+                    "metadata": entry["metadata"]
+                }, entry["literals"])
+        return index
+
+    def _scope(self, namespace: Hashable, version: Hashable, create: bool) -> Optional[_ScopeIndex]:
+        """Get the index for a scope, dropping the namespace's other versions (lock held)"""
+        versions = self._scopes.get(namespace)
+        if versions is not None and version not in versions:
+            # The data changed: every answer for older versions is stale
+            if self.l2 is not None:
+                for old_version in versions:
+                    self.l2.invalidate_namespace(self._l2_scope(namespace, old_version))
+            versions.clear()
+        index = versions.get(version) if versions else None
+        if index is None:
+            index = self._load_scope(namespace, version)
+            if index is None and create:
+                index = _ScopeIndex(self.max_entries)
+            if index is not None:
+                self._scopes.setdefault(namespace, {})[version] = index
+        return index
+
+    def _candidates(self, index: Optional[_ScopeIndex], literals: str) -> Optional[np.ndarray]:
+        """Mask of live answers naming the same literals (None if there are none)"""
+        if index is None or index.count == 0:
+            return None
+        mask = index.live(self.ttl) & (index.literals[:index.count] == literals)
+        return mask if mask.any() else None
+
+    def _hit(self, index: _ScopeIndex, slot: int, similarity: float) -> Dict[str, Any]:
+        """Hit result for a slot (lock held)"""
+        self.hits += 1
+        entry = index.entries[slot]
+        return {
+            "question": entry["question"],
+            "answer": entry["answer"],
+            "metadata": dict(entry["metadata"]),
+            "similarity": similarity
+        }
+
+    def lookup(
+        self,
+        question: str,
+        embed: Callable[[str], Sequence[float]],
+        namespace: Hashable,
+        version: Hashable,
+        terms: FrozenSet[str] = frozenset()
+    ) -> Optional[Dict[str, Any]]:
+        """
+        Find the closest previously answered question in a scope
+
+        Args:
+            question: Incoming question
+            embed: Embeds a question; only called when a same-literal answer
+                exists and the question is not an exact repeat
+            namespace: Scope namespace (e.g. db path / mode)
+            version: Current data version
+            terms: Entity words counted as literals (see question_literals)
+
+        Returns:
+            Dict with 'question', 'answer', 'metadata' and 'similarity', or None
+        """
+        key = normalize_question(question)
+        literals = question_literals(question, terms)
+        with self._lock:
+            index = self._scope(namespace, version, create=False)
+            if index is not None and key in index.questions:
+                slot = index.questions[key]
+                if index.live(self.ttl)[slot]:
+                    return self._hit(index, slot, 1.0)
+            if self._candidates(index, literals) is None:
+                self.misses += 1
+                return None
+
+        vector = self._normalize(embed(question))
+        with self._lock:
+            self.embeddings += 1
+            index = self._scope(namespace, version, create=False)
+            candidates = self._candidates(index, literals)
+            if vector is None or candidates is None or index.vectors.shape[1] != vector.shape[0]:
+                self.misses += 1
+                return None
+            similarities = index.vectors[:index.count] @ vector
+            similarities[~candidates] = -1.0
+            best = int(np.argmax(similarities))
+            similarity = float(similarities[best])
+            if similarity < self.threshold:
+                self.misses += 1
+                return None
+            return self._hit(index, best, similarity)
+
+    def add(
+        self,
+        question: str,
+        answer: str,
+        embed: Callable[[str], Sequence[float]],
+        namespace: Hashable,
+        version: Hashable,
+        terms: FrozenSet[str] = frozenset(),
+        metadata: Optional[Dict[str, Any]] = None
+    ) -> None:
+        """
+        Store an answered question
+
+        Args:
+            question: Question text
+            answer: Answer to reuse for similar questions
+            embed: Embeds the question
+            namespace: Scope namespace (e.g. db path / mode)
+            version: Data version the answer was computed against
+            terms: Entity words counted as literals (see question_literals)
+            metadata: Extra fields returned with hits
+        """
+        vector = self._normalize(embed(question))
+        if vector is None:
+            return
+        literals = question_literals(question, terms)
+        created = time.time()
+
+        with self._lock:
+            self.embeddings += 1
+            index = self._scope(namespace, version, create=True)
+            index.put(vector, created, {
+                "key": normalize_question(question),
+                "question": question,
+                "answer": answer,
+                "metadata": metadata or {}
+            }, literals)
+
+        if self.l2 is not None:
+            scope = self._l2_scope(namespace, version)
+            key = f"{scope}:{hashlib.sha1(question.encode('utf-8')).hexdigest()}"
+            self.l2.set(key, {
+                "embedding": vector,
+                "created": created,
+                "literals": literals,
+                "question": question,
+                "answer": answer,
+                "metadata": metadata or {}
+            }, ttl=self.ttl, namespace=scope)
+
+    def clear(self) -> None:
+        """Drop all cached answers (including the disk tier's)"""
+        with self._lock:
+            self._scopes.clear()
+            if self.l2 is not None:
+                self.l2.invalidate("answer:")
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Get answer cache statistics"""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": sum(
+                    index.count for versions in self._scopes.values() for index in versions.values()
+                ),
+                "threshold": self.threshold,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 3) if lookups else 0.0,
+                "embeddings": self.embeddings
+            }
+
+
+# Shared instance so every agent (e.g. one per Streamlit session) reuses answers
+_global_answer_cache = SemanticAnswerCache(l2=get_disk_cache())
+
+
+def get_answer_cache() -> SemanticAnswerCache:
+    """Get the shared answer cache instance"""
+    return _global_answer_cache
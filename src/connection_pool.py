@@ -5,36 +5,224 @@ Thread-safe connection pool for SQLite database connections
 
 import sqlite3
 import threading
-from queue import Queue, Empty
-from typing import Optional
+import bisect
+from collections import deque
+from typing import Optional, Dict, Tuple, Any, List
 import time
 import os
+import sys
+from pathlib import Path
+
+
+# Named PRAGMA profiles applied when a connection is created.
+# cache_size is negative to express KiB rather than pages.
+TUNING_PROFILES: Dict[str, Dict[str, Any]] = {
+    # SQLite defaults (rollback journal, ~2MB page cache, no mmap)
+    "default": {},
+    # Read-only analytics over leads.db: serve the file from memory maps
+    # and keep sorts/temp b-trees in RAM
+    "read_heavy_analytics": {
+        "mmap_size": 268435456,  # 256MB, covers the ~100MB database
+        "cache_size": -65536,  # 64MB
+        "temp_store": "MEMORY",
+        "busy_timeout": 5000,
+    },
+    # Ingestion/re-indexing: WAL lets readers continue while batches commit.
+    # Writable connections only (see open_ingest_connection).
+    "bulk_ingest": {
+        "journal_mode": "WAL",
+        "synchronous": "NORMAL",
+        "cache_size": -131072,  # 128MB
+        "temp_store": "MEMORY",
+        "busy_timeout": 30000,
+    },
+}
+
+
+# Profile used by the ingestion scripts. It is left out of read benchmarks:
+# its WAL/synchronous PRAGMAs cannot apply to read-only connections.
+INGEST_PROFILE = "bulk_ingest"
+
+
+# Authorizer actions a read-only connection may perform. Everything else
+# (writes, DDL, ATTACH, transactions, PRAGMA) is denied by the engine itself.
+_READ_ONLY_ACTIONS = {
+    sqlite3.SQLITE_SELECT,
+    sqlite3.SQLITE_READ,
+    sqlite3.SQLITE_FUNCTION,
+    getattr(sqlite3, "SQLITE_RECURSIVE", 33),
+}
+
+
+def read_only_authorizer(action, arg1, arg2, db_name, trigger_name):
+    """SQLite authorizer callback that only permits read operations"""
+    if action in _READ_ONLY_ACTIONS:
+        return sqlite3.SQLITE_OK
+    return sqlite3.SQLITE_DENY
+
+
+def fts_read_only_authorizer(action, arg1, arg2, db_name, trigger_name):
+    """
+    read_only_authorizer that also lets FTS5 open its tables
+    
+    Connecting an FTS5 table queries PRAGMA data_version and declares the
+    table's schema, which SQLite authorizes as an update of sqlite_master
+    columns. Neither writes anything (and the connection is mode=ro anyway).
+    """
+    if action == sqlite3.SQLITE_PRAGMA and arg1 == "data_version" and arg2 is None:
+        return sqlite3.SQLITE_OK
+    if action == sqlite3.SQLITE_UPDATE and arg1 == "sqlite_master":
+        return sqlite3.SQLITE_OK
+    return read_only_authorizer(action, arg1, arg2, db_name, trigger_name)
+
+
+def apply_tuning_profile(conn: sqlite3.Connection, profile: str = "default") -> Dict[str, Any]:
+    """
+    Apply a named PRAGMA profile to a connection
+    
+    PRAGMAs that cannot apply to this connection (e.g. journal_mode=WAL on a
+    read-only connection) are skipped rather than failing connection setup.
+    
+    Args:
+        conn: Connection to tune (must not have the read-only authorizer yet)
+        profile: Key of TUNING_PROFILES
+        
+    Returns:
+        Dict of the PRAGMAs that were applied
+    """
+    if profile not in TUNING_PROFILES:
+        raise ValueError(
+            f"Unknown tuning profile: {profile}. Available: {', '.join(TUNING_PROFILES)}"
+        )
+    
+    applied = {}
+    for pragma, value in TUNING_PROFILES[profile].items():
+        try:
+            conn.execute(f"PRAGMA {pragma} = {value}")
+            applied[pragma] = value
+        except sqlite3.Error:
+            continue
+    return applied
+
+
+def open_read_only_connection(
+    db_path: str,
+    profile: str = "default",
+    authorizer=read_only_authorizer,
+    **kwargs
+) -> sqlite3.Connection:
+    """
+    Open a connection in SQLite read-only URI mode with the read-only authorizer
+    
+    Args:
+        db_path: Path to SQLite database
+        profile: Tuning profile applied before the authorizer is installed
+        authorizer: Authorizer callback (fts_read_only_authorizer for FTS5 tables)
+        **kwargs: Extra arguments passed to sqlite3.connect
+    """
+    uri = Path(db_path).resolve().as_uri() + "?mode=ro"
+    conn = sqlite3.connect(uri, uri=True, **kwargs)
+    apply_tuning_profile(conn, profile)
+    conn.set_authorizer(authorizer)
+    return conn
+
+
+def open_ingest_connection(db_path: str, **kwargs) -> sqlite3.Connection:
+    """
+    Open a writable connection tuned for bulk ingestion (INGEST_PROFILE)
+    
+    Args:
+        db_path: Path to SQLite database
+        **kwargs: Extra arguments passed to sqlite3.connect
+    """
+    conn = sqlite3.connect(db_path, **kwargs)
+    apply_tuning_profile(conn, INGEST_PROFILE)
+    return conn
+
+
+# Upper bounds (seconds) of the checkout latency histogram buckets
+CHECKOUT_LATENCY_BUCKETS = (0.0001, 0.0005, 0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1.0, 5.0)
+
+# Error messages that mean a connection should not be reused
+_BROKEN_CONNECTION_MARKERS = ("disk i/o error", "malformed", "not a database", "closed database")
+
+
+def is_connection_error(error: BaseException) -> bool:
+    """Whether an exception indicates the connection itself is unusable"""
+    if isinstance(error, sqlite3.InterfaceError):
+        return True
+    error_msg = str(error).lower()
+    return any(marker in error_msg for marker in _BROKEN_CONNECTION_MARKERS)
 
 
 class SQLiteConnectionPool:
     """Thread-safe connection pool for SQLite"""
     
-    def __init__(self, db_path: str, max_connections: int = 5, timeout: int = 5):
+    def __init__(
+        self,
+        db_path: str,
+        max_connections: int = 5,
+        timeout: int = 5,
+        statement_cache_size: int = 128,
+        read_only: bool = False,
+        profile: str = "default",
+        max_lifetime: float = 3600,
+        max_idle: float = 600,
+        thread_affinity: bool = False
+    ):
         """
         Initialize connection pool
         
         Args:
             db_path: Path to SQLite database
             max_connections: Maximum number of connections in pool
-            timeout: Timeout in seconds for getting connection from pool
+            timeout: Timeout in seconds for waiting on a connection when the
+                pool is at capacity
+            statement_cache_size: Prepared statements kept per connection
+            read_only: Open connections in read-only URI mode with an authorizer
+                that rejects anything other than reads
+            profile: Name of the TUNING_PROFILES entry applied to new connections
+            max_lifetime: Seconds after which a connection is replaced on checkout
+            max_idle: Seconds a connection may sit idle before being replaced
+            thread_affinity: Prefer handing a thread the idle connection it used
+                last (keeps its statement cache and page cache warm)
         """
+        if profile not in TUNING_PROFILES:
+            raise ValueError(
+                f"Unknown tuning profile: {profile}. Available: {', '.join(TUNING_PROFILES)}"
+            )
+        
         self.db_path = db_path
         self.max_connections = max_connections
         self.timeout = timeout
-        self._pool = Queue(maxsize=max_connections)
+        self.statement_cache_size = statement_cache_size
+        self.read_only = read_only
+        self.profile = profile
+        self.max_lifetime = max_lifetime
+        self.max_idle = max_idle
+        self.thread_affinity = thread_affinity
+        
+        self._idle = deque()  # Idle connections, most recently returned last
         self._lock = threading.Lock()
+        self._available = threading.Condition(self._lock)
         self._created_connections = 0
+        # id(conn) -> {"created", "last_used", "owner"}; only pool-owned connections
+        self._conn_info: Dict[int, Dict[str, Any]] = {}
+        
+        # Metrics
+        self._checkouts = 0
+        self._recycled = 0
+        self._timeouts = 0
+        self._waiters = 0
+        self._peak_waiters = 0
+        self._wait_time_total = 0.0
+        self._latency_counts = [0] * (len(CHECKOUT_LATENCY_BUCKETS) + 1)
         
         # Don't pre-create connections - create them lazily on first use
         # This allows agent initialization even if database doesn't exist yet
     
     def _create_connection(self) -> sqlite3.Connection:
-        """Create a new database connection"""
+        """Create a new database connection (capacity is reserved by the caller)"""
         # Check if database exists, try both lowercase and uppercase paths
         if not os.path.exists(self.db_path):
             # Try alternative path (case-sensitive filesystems)
@@ -48,80 +236,219 @@ class SQLiteConnectionPool:
                     f"Please ensure the database is initialized by running ensure_databases_exist()"
                 )
         
-        conn = sqlite3.connect(self.db_path, check_same_thread=False)
+        if self.read_only:
+            conn = open_read_only_connection(
+                self.db_path,
+                profile=self.profile,
+                check_same_thread=False,
+                cached_statements=self.statement_cache_size
+            )
+        else:
+            conn = sqlite3.connect(
+                self.db_path,
+                check_same_thread=False,
+                cached_statements=self.statement_cache_size
+            )
+            apply_tuning_profile(conn, self.profile)
         conn.row_factory = sqlite3.Row  # Enable dict-like access
-        self._created_connections += 1
+        
+        now = time.monotonic()
+        with self._lock:
+            self._conn_info[id(conn)] = {"created": now, "last_used": now, "owner": None}
         return conn
     
+    def _is_reusable(self, conn: sqlite3.Connection, now: float) -> bool:
+        """Lease check based on bookkeeping only (no round trip to SQLite)"""
+        with self._lock:
+            info = self._conn_info.get(id(conn))
+            if info is None:
+                return False
+            if now - info["created"] > self.max_lifetime:
+                return False
+            return now - info["last_used"] <= self.max_idle
+    
+    def _discard(self, conn: sqlite3.Connection) -> None:
+        """Close a connection without releasing its capacity slot"""
+        with self._lock:
+            self._conn_info.pop(id(conn), None)
+        try:
+            conn.close()
+        except Exception:
+            pass
+    
+    def _take_idle(self) -> Optional[sqlite3.Connection]:
+        """Pop an idle connection (caller holds the lock)"""
+        if not self._idle:
+            return None
+        if self.thread_affinity:
+            owner = threading.get_ident()
+            for conn in reversed(self._idle):
+                info = self._conn_info.get(id(conn))
+                if info and info["owner"] == owner:
+                    self._idle.remove(conn)
+                    return conn
+        # LIFO keeps the hottest connections in use and lets cold ones age out
+        return self._idle.pop()
+    
+    def _record_checkout(self, start: float, waited: float) -> None:
+        """Update checkout metrics (caller holds the lock)"""
+        latency = time.perf_counter() - start
+        self._checkouts += 1
+        self._wait_time_total += waited
+        self._latency_counts[bisect.bisect_left(CHECKOUT_LATENCY_BUCKETS, latency)] += 1
+    
     def get_connection(self) -> sqlite3.Connection:
         """
         Get a connection from the pool
         
+        Idle connections are handed out immediately; when none are idle and
+        the pool is under capacity a new connection is opened right away.
+        Only a pool at capacity waits (up to timeout) for a return.
+        
         Returns:
             SQLite connection object
-        """
-        try:
-            # Try to get from pool
-            conn = self._pool.get(timeout=self.timeout)
             
-            # Check if connection is still valid
+        Raises:
+            TimeoutError: If no connection became available within timeout
+        """
+        start = time.perf_counter()
+        deadline = time.monotonic() + self.timeout
+        waited = 0.0
+        conn = None
+        
+        with self._available:
+            while True:
+                conn = self._take_idle()
+                if conn is not None:
+                    break
+                if self._created_connections < self.max_connections:
+                    # Reserve the slot now, open the connection outside the lock
+                    self._created_connections += 1
+                    break
+                
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    self._timeouts += 1
+                    raise TimeoutError(
+                        f"Timed out after {self.timeout}s waiting for a database connection "
+                        f"({self.max_connections} in use)"
+                    )
+                
+                self._waiters += 1
+                self._peak_waiters = max(self._peak_waiters, self._waiters)
+                wait_start = time.perf_counter()
+                try:
+                    self._available.wait(remaining)
+                finally:
+                    self._waiters -= 1
+                    waited += time.perf_counter() - wait_start
+        
+        now = time.monotonic()
+        if conn is not None and not self._is_reusable(conn, now):
+            # Too old, idle too long, or unknown: replace it in the same slot
+            self._discard(conn)
+            conn = None
+            with self._lock:
+                self._recycled += 1
+        
+        if conn is None:
             try:
-                conn.execute("SELECT 1")
-            except sqlite3.Error:
-                # Connection is dead, create new one
                 conn = self._create_connection()
-            
-            return conn
-            
-        except Empty:
-            # Pool is empty, create new connection if under limit
-            with self._lock:
-                if self._created_connections < self.max_connections:
-                    return self._create_connection()
-                else:
-                    # Wait for connection to become available
-                    return self._pool.get(timeout=self.timeout)
+            except Exception:
+                with self._available:
+                    self._created_connections -= 1
+                    self._available.notify()
+                raise
+        
+        with self._lock:
+            info = self._conn_info.get(id(conn))
+            if info is not None:
+                info["last_used"] = now
+                info["owner"] = threading.get_ident()
+            self._record_checkout(start, waited)
+        
+        return conn
     
-    def return_connection(self, conn: sqlite3.Connection) -> None:
+    def return_connection(self, conn: sqlite3.Connection, broken: bool = False) -> None:
         """
         Return a connection to the pool
         
         Args:
             conn: Connection to return
+            broken: Whether the caller saw an error that makes the connection
+                unusable (see is_connection_error); it is closed instead of reused
         """
-        if conn:
+        if not conn:
+            return
+        
+        with self._lock:
+            owned = id(conn) in self._conn_info
+        if owned and not broken:
             try:
                 # Reset connection state
                 conn.rollback()
-                self._pool.put(conn, block=False)
-            except:
-                # Pool is full or connection is bad, just close it
-                try:
-                    conn.close()
-                except:
-                    pass
-                with self._lock:
-                    self._created_connections -= 1
+                with self._available:
+                    self._conn_info[id(conn)]["last_used"] = time.monotonic()
+                    self._idle.append(conn)
+                    self._available.notify()
+                return
+            except Exception:
+                # Connection is bad, close it below
+                pass
+        
+        self._discard(conn)
+        if owned:
+            with self._available:
+                self._created_connections -= 1
+                self._available.notify()
     
     def close_all(self) -> None:
-        """Close all connections in the pool"""
-        while not self._pool.empty():
+        """Close all idle connections in the pool"""
+        with self._available:
+            idle = list(self._idle)
+            self._idle.clear()
+            for conn in idle:
+                self._conn_info.pop(id(conn), None)
+            self._created_connections = len(self._conn_info)  # Still leased
+            self._available.notify_all()
+        
+        for conn in idle:
             try:
-                conn = self._pool.get_nowait()
                 conn.close()
-            except:
+            except Exception:
                 pass
-        
+    
+    def get_metrics(self) -> Dict[str, Any]:
+        """Get checkout metrics (latency histogram, waiters, timeouts)"""
         with self._lock:
-            self._created_connections = 0
+            histogram = {
+                f"le_{bound}s": count
+                for bound, count in zip(CHECKOUT_LATENCY_BUCKETS, self._latency_counts)
+            }
+            histogram["le_inf"] = self._latency_counts[-1]
+            return {
+                "checkouts": self._checkouts,
+                "timeouts": self._timeouts,
+                "recycled": self._recycled,
+                "waiters": self._waiters,
+                "peak_waiters": self._peak_waiters,
+                "total_wait_seconds": self._wait_time_total,
+                "checkout_latency_histogram": histogram,
+            }
     
     def get_stats(self) -> dict:
         """Get pool statistics"""
+        with self._lock:
+            idle = len(self._idle)
+            created = self._created_connections
         return {
-            "pool_size": self._pool.qsize(),
+            "pool_size": idle,
             "max_connections": self.max_connections,
-            "created_connections": self._created_connections,
-            "available_connections": self._pool.qsize()
+            "created_connections": created,
+            "in_use_connections": created - idle,
+            "profile": self.profile,
+            "available_connections": idle,
+            "metrics": self.get_metrics()
         }
 
 
@@ -143,30 +470,136 @@ class ConnectionContext:
         return False  # Don't suppress exceptions
 
 
-# Global connection pool (lazy initialization)
-_global_pool: Optional[SQLiteConnectionPool] = None
+# Global connection pools (lazy initialization), one per (db_path, read_only).
+# Settings such as the tuning profile are taken from the first caller.
+_global_pools: Dict[Tuple[str, bool], SQLiteConnectionPool] = {}
 _pool_lock = threading.Lock()
 
 
-def get_connection_pool(db_path: str = "data/leads.db", max_connections: int = 5) -> SQLiteConnectionPool:
-    """Get or create global connection pool"""
-    global _global_pool
+def get_connection_pool(
+    db_path: str = "data/leads.db",
+    max_connections: int = 5,
+    statement_cache_size: int = 128,
+    read_only: bool = False,
+    profile: str = "default"
+) -> SQLiteConnectionPool:
+    """Get or create the global connection pool for a database"""
+    key = (db_path, read_only)
+    pool = _global_pools.get(key)
     
-    if _global_pool is None:
+    if pool is None:
         with _pool_lock:
-            if _global_pool is None:
-                _global_pool = SQLiteConnectionPool(db_path, max_connections)
+            pool = _global_pools.get(key)
+            if pool is None:
+                pool = SQLiteConnectionPool(
+                    db_path,
+                    max_connections,
+                    statement_cache_size=statement_cache_size,
+                    read_only=read_only,
+                    profile=profile
+                )
+                _global_pools[key] = pool
     
-    return _global_pool
+    return pool
 
 
-def get_connection(db_path: str = "data/leads.db") -> ConnectionContext:
+def get_connection(db_path: str = "data/leads.db", read_only: bool = False) -> ConnectionContext:
     """Get a connection from the global pool (context manager)"""
-    pool = get_connection_pool(db_path)
+    pool = get_connection_pool(db_path, read_only=read_only)
     return ConnectionContext(pool)
 
 
-if __name__ == "__main__":
+# Representative read-only analytics used to compare profiles
+BENCHMARK_QUERIES = [
+    "SELECT status, COUNT(*) FROM leads GROUP BY status",
+    "SELECT lr.room_type, COUNT(*), AVG(lr.budget_max) FROM leads l "
+    "JOIN lead_requirements lr ON l.lead_id = lr.lead_id GROUP BY lr.room_type",
+    "SELECT event_type, COUNT(*), SUM(LENGTH(content)) FROM timeline_events GROUP BY event_type",
+    "SELECT lead_id, COUNT(*) AS n FROM timeline_events GROUP BY lead_id ORDER BY n DESC LIMIT 10",
+    "SELECT COUNT(*) FROM rag_documents WHERE content LIKE '%budget%'",
+]
+
+
+def benchmark_profiles(
+    db_path: str = "data/leads.db",
+    queries: Optional[List[str]] = None,
+    iterations: int = 5,
+    profiles: Optional[List[str]] = None
+) -> Dict[str, Any]:
+    """
+    Time the benchmark queries under each read profile on read-only connections
+    
+    Every profile gets one untimed warm-up pass first, so the OS page cache is
+    equally warm for all of them. The timed rounds then rotate the profile
+    order, so no profile always runs first or last. Queries that fail on this
+    database (e.g. a missing table) are skipped.
+    
+    Args:
+        db_path: Path to SQLite database
+        queries: Queries to time (defaults to BENCHMARK_QUERIES)
+        iterations: Timed rounds; each round runs the query set once per profile
+        profiles: Profiles to compare (defaults to all except INGEST_PROFILE)
+        
+    Returns:
+        Dict with per-profile 'timings' (seconds) and the 'best_profile'
+    """
+    queries = queries or BENCHMARK_QUERIES
+    profiles = profiles or [name for name in TUNING_PROFILES if name != INGEST_PROFILE]
+    
+    # Drop queries this database cannot run
+    probe = open_read_only_connection(db_path)
+    runnable = []
+    for query in queries:
+        try:
+            probe.execute(query).fetchall()
+            runnable.append(query)
+        except sqlite3.Error:
+            continue
+    probe.close()
+    
+    def run_queries(conn: sqlite3.Connection) -> float:
+        start = time.perf_counter()
+        for query in runnable:
+            conn.execute(query).fetchall()
+        return time.perf_counter() - start
+    
+    connections = {profile: open_read_only_connection(db_path, profile=profile) for profile in profiles}
+    try:
+        for conn in connections.values():
+            run_queries(conn)  # Warm-up
+        
+        timings = {profile: 0.0 for profile in profiles}
+        for round_number in range(iterations):
+            shift = round_number % len(profiles)
+            for profile in profiles[shift:] + profiles[:shift]:
+                timings[profile] += run_queries(connections[profile])
+    finally:
+        for conn in connections.values():
+            conn.close()
+    
+    best_profile = min(timings, key=timings.get) if timings else "default"
+    return {
+        "timings": timings,
+        "best_profile": best_profile,
+        "queries": len(runnable),
+        "iterations": iterations
+    }
+
+
+if __name__ == "__main__" and "--benchmark" in sys.argv:
+    # Pick the best tuning profile for this host: python src/connection_pool.py --benchmark [db_path]
+    args = [arg for arg in sys.argv[1:] if arg != "--benchmark"]
+    db = args[0] if args else "data/leads.db"
+    
+    print(f"Benchmarking tuning profiles on {db}...")
+    report = benchmark_profiles(db)
+    for name, seconds in sorted(report["timings"].items(), key=lambda item: item[1]):
+        print(f"   {name:<22} {seconds * 1000:8.1f} ms")
+    print(f"\n✅ Best profile: {report['best_profile']} "
+          f"({report['queries']} queries x {report['iterations']} iterations)")
+    print(f"   Use it for the SQL executor with: export SQL_CONNECTION_PROFILE={report['best_profile']}")
+
+elif __name__ == "__main__":
     # Test connection pool
     print("Testing Connection Pool...")
     
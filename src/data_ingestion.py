@@ -10,6 +10,12 @@ from datetime import datetime
 from typing import Dict, List, Any
 import os
 
+try:
+    from connection_pool import open_ingest_connection
+except ImportError:
+    def open_ingest_connection(db_path, **kwargs):
+        return sqlite3.connect(db_path, **kwargs)
+
 
 class LeadDataIngestion:
     """Handles ingestion of lead data from CSV into SQLite and text extraction for RAG"""
@@ -17,7 +23,7 @@ class LeadDataIngestion:
     def __init__(self, db_path: str = "data/leads.db"):
         self.db_path = db_path
         os.makedirs(os.path.dirname(db_path) if os.path.dirname(db_path) else ".", exist_ok=True)
-        self.conn = sqlite3.connect(db_path)
+        self.conn = open_ingest_connection(db_path)
         self.cursor = self.conn.cursor()
         self._create_tables()
     
@@ -0,0 +1,226 @@
+"""
+Embedding Pipeline
+Concurrent, token-aware batching of embedding requests with a single writer
+"""
+
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
+
+from rate_limiter import RateLimiter
+from token_counter import count_tokens
+
+
+# OpenAI embedding request limits: ~300k tokens and 2048 inputs per request.
+# Batches stay below both with some headroom for tokenizer differences.
+MAX_BATCH_TOKENS = 250_000
+MAX_BATCH_INPUTS = 2048
+
+# Default concurrency and account limits (text-embedding-3-small, tier 1)
+DEFAULT_CONCURRENCY = 4
+DEFAULT_REQUESTS_PER_MINUTE = 3000
+DEFAULT_TOKENS_PER_MINUTE = 1_000_000
+
+
+class _TokenBudget:
+    """Sliding one-minute window of tokens sent (blocks when the budget is spent)"""
+
+    def __init__(self, tokens_per_minute: int):
+        self.tokens_per_minute = tokens_per_minute
+        self._sent = deque()  # (timestamp, tokens)
+        self._total = 0
+        self._lock = threading.Lock()
+
+    def acquire(self, tokens: int) -> None:
+        tokens = min(tokens, self.tokens_per_minute)
+        while True:
+            with self._lock:
+                now = time.time()
+                while self._sent and now - self._sent[0][0] >= 60:
+                    self._total -= self._sent.popleft()[1]
+                if self._total + tokens <= self.tokens_per_minute:
+                    self._sent.append((now, tokens))
+                    self._total += tokens
+                    return
+                wait_time = 60 - (now - self._sent[0][0])
+            time.sleep(min(max(wait_time, 0.01), 1.0))
+
+
+class EmbeddingPipeline:
+    """
+    Embeds documents with several requests in flight and writes results in order of completion
+
+    Stages:
+      1. Batching: documents are grouped into requests by token count
+         (tiktoken), up to the per-request token and input limits.
+      2. Embedding: up to `concurrency` requests run at once on worker threads,
+         throttled by requests/minute and tokens/minute limits. Each batch is
+         sent once; retrying failed requests is left to embed_fn (e.g. the
+         OpenAI client's max_retries), so attempts never multiply.
+      3. Writing: completed batches are handed to write_fn on the calling
+         thread, one at a time, while the next requests are already in flight.
+    """
+
+    def __init__(
+        self,
+        embed_fn: Callable[[List[str]], List[List[float]]],
+        model: str = "text-embedding-3-small",
+        concurrency: int = DEFAULT_CONCURRENCY,
+        max_batch_tokens: int = MAX_BATCH_TOKENS,
+        max_batch_inputs: int = MAX_BATCH_INPUTS,
+        requests_per_minute: int = DEFAULT_REQUESTS_PER_MINUTE,
+        tokens_per_minute: int = DEFAULT_TOKENS_PER_MINUTE
+    ):
+        """
+        Initialize pipeline
+
+        Args:
+            embed_fn: Embeds a list of texts (e.g. EmbeddingStore.embed_documents bound to the API)
+            model: Embedding model (selects the tokenizer used for batching)
+            concurrency: Maximum embedding requests in flight
+            max_batch_tokens: Token limit per request
+            max_batch_inputs: Input limit per request
+            requests_per_minute: Request rate limit
+            tokens_per_minute: Token rate limit
+        """
+        self.embed_fn = embed_fn
+        self.model = model
+        self.concurrency = max(1, concurrency)
+        self.max_batch_tokens = max_batch_tokens
+        self.max_batch_inputs = max_batch_inputs
+        self.rate_limiter = RateLimiter(max_calls=requests_per_minute, period=60)
+        self.token_budget = _TokenBudget(tokens_per_minute)
+
+    def _batches(self, items: Iterable[Tuple[Any, str]]) -> Iterator[Tuple[List[Any], List[str], int]]:
+        """Group (key, text) items into requests by token count; yields (keys, texts, tokens)"""
+        keys: List[Any] = []
+        texts: List[str] = []
+        batch_tokens = 0
+        for key, text in items:
+            tokens = count_tokens(text, self.model)
+            if keys and (
+                batch_tokens + tokens > self.max_batch_tokens
+                or len(keys) >= self.max_batch_inputs
+            ):
+                yield keys, texts, batch_tokens
+                keys, texts, batch_tokens = [], [], 0
+            keys.append(key)
+            texts.append(text)
+            batch_tokens += tokens
+        if keys:
+            yield keys, texts, batch_tokens
+
+    def _throttle(self, tokens: int) -> None:
+        """Block until both the request and token rate limits allow a request"""
+        while True:
+            allowed, wait_time = self.rate_limiter.is_allowed("embeddings")
+            if allowed:
+                break
+            time.sleep(min(wait_time or 0.1, 1.0))
+        self.token_budget.acquire(tokens)
+
+    def _embed_batch(self, batch_texts: List[str], tokens: int) -> List[List[float]]:
+        """Embed one request once rate limits allow it"""
+        self._throttle(tokens)
+        return self.embed_fn(batch_texts)
+
+    def run(
+        self,
+        ids: Sequence[str],
+        texts: Sequence[str],
+        write_fn: Callable[[List[int], List[List[float]]], None],
+        progress: Optional[Callable[[Dict[str, Any]], None]] = None
+    ) -> Dict[str, Any]:
+        """
+        Embed all texts and pass each finished batch to write_fn
+
+        Args:
+            ids: Document ids (used for counting/reporting)
+            texts: Document texts
+            write_fn: Called as write_fn(positions, embeddings) for each
+                completed batch, on the calling thread (single writer)
+            progress: Optional callback receiving running stats after each write
+
+        Returns:
+            Same as run_stream
+        """
+        return self.run_stream(((idx, text) for idx, text in enumerate(texts)), write_fn, progress)
+
+    def run_stream(
+        self,
+        items: Iterable[Tuple[Any, str]],
+        write_fn: Callable[[List[Any], List[List[float]]], None],
+        progress: Optional[Callable[[Dict[str, Any]], None]] = None
+    ) -> Dict[str, Any]:
+        """
+        Embed a stream of (key, text) items, passing each finished batch to write_fn
+
+        Items are pulled lazily, only as far as needed to keep the workers
+        busy, so memory stays bounded by the batches in flight however long
+        the stream is. The item iterator is consumed on the calling thread.
+
+        Args:
+            items: (key, text) pairs; keys are passed back to write_fn
+            write_fn: Called as write_fn(keys, embeddings) for each completed
+                batch, on the calling thread (single writer)
+            progress: Optional callback receiving running stats after each write
+
+        Returns:
+            Dict with 'documents', 'tokens', 'batches', 'seconds',
+            'docs_per_second' and 'tokens_per_second'
+
+        Raises:
+            The embedding error of the first batch that failed (no further
+            batches are sent; batches already in flight are still written)
+        """
+        started = time.time()
+        stats = {"documents": 0, "tokens": 0, "batches": 0}
+        batches = self._batches(items)
+        max_in_flight = self.concurrency * 2  # Keep workers busy while the writer works
+
+        def report() -> Dict[str, Any]:
+            elapsed = max(time.time() - started, 1e-9)
+            return {
+                **stats,
+                "seconds": round(elapsed, 2),
+                "docs_per_second": round(stats["documents"] / elapsed, 1),
+                "tokens_per_second": round(stats["tokens"] / elapsed, 1)
+            }
+
+        with ThreadPoolExecutor(max_workers=self.concurrency, thread_name_prefix="embedder") as workers:
+            pending = {}
+            exhausted = False
+            failure = None
+            while True:
+                while not exhausted and failure is None and len(pending) < max_in_flight:
+                    batch = next(batches, None)
+                    if batch is None:
+                        exhausted = True
+                        break
+                    keys, batch_texts, tokens = batch
+                    future = workers.submit(self._embed_batch, batch_texts, tokens)
+                    pending[future] = (keys, tokens)
+                if not pending:
+                    break
+
+                done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    keys, tokens = pending.pop(future)
+                    try:
+                        embeddings = future.result()
+                    except Exception as e:
+                        # Stop submitting; in-flight batches still get written
+                        failure = failure or e
+                        continue
+                    write_fn(keys, embeddings)
+                    stats["documents"] += len(keys)
+                    stats["tokens"] += tokens
+                    stats["batches"] += 1
+                    if progress:
+                        progress(report())
+
+        if failure is not None:
+            raise failure
+        return report()
@@ -0,0 +1,194 @@
+"""
+Embedding Store
+Local content-addressed cache of document embeddings
+"""
+
+import hashlib
+import json
+import os
+import re
+import threading
+from typing import Any, Callable, Dict, List, Optional, Sequence
+
+import numpy as np
+
+
+DEFAULT_STORE_PATH = "data/embedding_store"
+
+
+def content_hash(text: str) -> str:
+    """sha256 hex digest of a text (the store key)"""
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+class EmbeddingStore:
+    """
+    Embeddings keyed by (model, sha256(text)), persisted on disk
+
+    Each model gets its own directory holding:
+      - vectors.f32: float32 matrix (one row per text), read via np.memmap
+      - index.txt:   one sha256 digest per line; line N is matrix row N
+      - meta.json:   model name and vector dimensions
+
+    Both data files are append-only. Vectors are written before their digests,
+    so an interrupted write leaves at most some unindexed rows, which are
+    truncated on the next open.
+    """
+
+    def __init__(self, path: str = DEFAULT_STORE_PATH, model: str = "text-embedding-3-small"):
+        """
+        Initialize embedding store
+
+        Args:
+            path: Root directory of the store
+            model: Embedding model name (vectors of different models never mix)
+        """
+        self.model = model
+        self.directory = os.path.join(path, re.sub(r'[^A-Za-z0-9._-]+', '_', model))
+        self._vectors_path = os.path.join(self.directory, "vectors.f32")
+        self._index_path = os.path.join(self.directory, "index.txt")
+        self._meta_path = os.path.join(self.directory, "meta.json")
+        self._lock = threading.Lock()
+        self._rows: Dict[str, int] = {}
+        self._matrix: Optional[np.memmap] = None
+        self.dimensions: Optional[int] = None
+        self.hits = 0
+        self.misses = 0
+
+        os.makedirs(self.directory, exist_ok=True)
+        self._load()
+
+    def _load(self) -> None:
+        """Read the index and drop any rows left without a digest"""
+        if os.path.exists(self._meta_path):
+            with open(self._meta_path) as f:
+                self.dimensions = json.load(f)["dimensions"]
+        if self.dimensions is None:
+            return
+
+        digests = []
+        if os.path.exists(self._index_path):
+            with open(self._index_path) as f:
+                digests = [line.strip() for line in f if line.strip()]
+
+        row_bytes = self.dimensions * 4
+        stored_rows = os.path.getsize(self._vectors_path) // row_bytes if os.path.exists(self._vectors_path) else 0
+        rows = min(len(digests), stored_rows)
+        if stored_rows and os.path.getsize(self._vectors_path) != rows * row_bytes:
+            with open(self._vectors_path, "r+b") as f:
+                f.truncate(rows * row_bytes)
+        if len(digests) != rows:
+            digests = digests[:rows]
+            with open(self._index_path, "w") as f:
+                f.writelines(f"{digest}\n" for digest in digests)
+
+        self._rows = {digest: row for row, digest in enumerate(digests)}
+
+    def _get_matrix(self) -> Optional[np.memmap]:
+        """Memory-map the vectors file (remapped after appends)"""
+        rows = len(self._rows)
+        if rows == 0:
+            return None
+        if self._matrix is None or self._matrix.shape[0] != rows:
+            self._matrix = np.memmap(self._vectors_path, dtype=np.float32, mode="r", shape=(rows, self.dimensions))
+        return self._matrix
+
+    def __len__(self) -> int:
+        return len(self._rows)
+
+    def get(self, text: str) -> Optional[List[float]]:
+        """Get the stored embedding for a text (None if not stored)"""
+        return self.get_many([text])[0]
+
+    def get_many(self, texts: Sequence[str]) -> List[Optional[List[float]]]:
+        """Get stored embeddings for texts (None for each text not stored)"""
+        with self._lock:
+            matrix = self._get_matrix()
+            results = []
+            for text in texts:
+                row = self._rows.get(content_hash(text))
+                if row is None:
+                    self.misses += 1
+                    results.append(None)
+                else:
+                    self.hits += 1
+                    results.append(matrix[row].tolist())
+            return results
+
+    def put_many(self, texts: Sequence[str], vectors: Sequence[Sequence[float]]) -> None:
+        """Store embeddings for texts (texts already stored are skipped)"""
+        with self._lock:
+            new_digests = {}
+            new_vectors = []
+            for text, vector in zip(texts, vectors):
+                digest = content_hash(text)
+                if digest in self._rows or digest in new_digests:
+                    continue
+                new_digests[digest] = None
+                new_vectors.append(vector)
+            if not new_digests:
+                return
+
+            matrix = np.asarray(new_vectors, dtype=np.float32)
+            if self.dimensions is None:
+                self.dimensions = int(matrix.shape[1])
+                with open(self._meta_path, "w") as f:
+                    json.dump({"model": self.model, "dimensions": self.dimensions}, f)
+            elif matrix.shape[1] != self.dimensions:
+                raise ValueError(
+                    f"Embedding has {matrix.shape[1]} dimensions, store for {self.model} expects {self.dimensions}"
+                )
+
+            # Vectors first, then digests: a crash in between leaves only orphan rows
+            with open(self._vectors_path, "ab") as f:
+                f.write(matrix.tobytes())
+                f.flush()
+                os.fsync(f.fileno())
+            with open(self._index_path, "a") as f:
+                f.writelines(f"{digest}\n" for digest in new_digests)
+
+            start = len(self._rows)
+            for offset, digest in enumerate(new_digests):
+                self._rows[digest] = start + offset
+
+    def embed_documents(
+        self,
+        texts: Sequence[str],
+        embed_fn: Callable[[List[str]], List[List[float]]]
+    ) -> List[List[float]]:
+        """
+        Embed texts, calling embed_fn only for texts not already stored
+
+        Args:
+            texts: Texts to embed
+            embed_fn: Embedding call for missing texts (e.g. OpenAIEmbeddings.embed_documents)
+
+        Returns:
+            One embedding per input text, in input order
+        """
+        results = self.get_many(texts)
+        missing = {}
+        for idx, vector in enumerate(results):
+            if vector is None:
+                missing.setdefault(texts[idx], []).append(idx)
+
+        if missing:
+            missing_texts = list(missing)
+            vectors = embed_fn(missing_texts)
+            self.put_many(missing_texts, vectors)
+            for text, vector in zip(missing_texts, vectors):
+                vector = list(vector)
+                for idx in missing[text]:
+                    results[idx] = vector
+        return results
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Get store statistics"""
+        with self._lock:
+            return {
+                "model": self.model,
+                "vectors": len(self._rows),
+                "dimensions": self.dimensions,
+                "hits": self.hits,
+                "misses": self.misses
+            }
@@ -11,6 +11,12 @@ from typing import Dict, List, Any, Optional
 import os
 import glob
 
+try:
+    from connection_pool import open_ingest_connection
+except ImportError:
+    def open_ingest_connection(db_path, **kwargs):
+        return sqlite3.connect(db_path, **kwargs)
+
 
 class ExportedDataIngestion:
     """Handles ingestion of exported JSON dataset into SQLite"""
@@ -18,7 +24,7 @@ class ExportedDataIngestion:
     def __init__(self, db_path: str = "data/leads.db"):
         self.db_path = db_path
         os.makedirs(os.path.dirname(db_path) if os.path.dirname(db_path) else ".", exist_ok=True)
-        self.conn = sqlite3.connect(db_path)
+        self.conn = open_ingest_connection(db_path)
         self.cursor = self.conn.cursor()
         self._create_enhanced_tables()
     
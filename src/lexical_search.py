@@ -0,0 +1,296 @@
+"""
+Lexical Search
+BM25 keyword search over the indexed lead documents with SQLite FTS5
+"""
+
+import json
+import os
+import re
+import sqlite3
+import threading
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple
+
+from connection_pool import fts_read_only_authorizer, open_read_only_connection
+from vector_index import matches_where
+
+
+DEFAULT_LEXICAL_PATH = "data/lexical_index.db"
+
+# FTS5 table holding the document texts; its rowid is lexical_documents.row
+FTS_TABLE = "lexical_fts"
+
+# Ids per IN (...) query (below SQLite's default host-parameter limit)
+MAX_SQL_PARAMS = 900
+
+# Words left out of queries (they match nearly every conversation)
+STOPWORDS = frozenset("""
+a an and are as at be but by can do does for from had has have how i in is it its me my of on or so
+than that the their them then there these they this to was we were what when where which who why will
+with you your about any some show give find list all
+""".split())
+
+# Constant k of reciprocal rank fusion: score = sum(1 / (k + rank))
+RRF_K = 60
+
+
+def fts_query(text: str) -> Optional[str]:
+    """
+    Convert free text into an FTS5 MATCH expression
+
+    Every word becomes a quoted term (so FTS5 syntax in the input is inert)
+    and terms are OR-ed, letting BM25 rank documents matching more and rarer
+    terms first. Returns None when nothing searchable is left.
+    """
+    words = [word for word in re.findall(r"\w+", text.lower()) if word not in STOPWORDS]
+    if not words:
+        return None
+    return " OR ".join(f'"{word}"' for word in dict.fromkeys(words))
+
+
+def reciprocal_rank_fusion(rankings: Sequence[List[Dict[str, Any]]], k: int = RRF_K) -> List[Dict[str, Any]]:
+    """
+    Fuse ranked result lists with reciprocal rank fusion
+
+    Results are identified by document id (the lexical index holds the same
+    documents as the vector collection, under the same ids), so a document
+    found by several retrievers is merged (the first list's copy is kept) and
+    accumulates score from each list it appears in.
+
+    Returns:
+        Merged results, best first, each with an 'rrf_score'
+    """
+    fused: Dict[str, Dict[str, Any]] = {}
+    for ranking in rankings:
+        for rank, result in enumerate(ranking, 1):
+            key = result.get('id')
+            entry = fused.get(key)
+            if entry is None:
+                entry = fused[key] = {**result, 'rrf_score': 0.0, 'retrieval': result.get('retrieval')}
+            elif entry.get('retrieval') != result.get('retrieval'):
+                entry['retrieval'] = "hybrid"
+                for field in ('distance', 'bm25'):
+                    if entry.get(field) is None and result.get(field) is not None:
+                        entry[field] = result[field]
+            entry['rrf_score'] += 1.0 / (k + rank)
+    return sorted(fused.values(), key=lambda entry: entry['rrf_score'], reverse=True)
+
+
+class LexicalIndex:
+    """
+    BM25 retriever over the documents synced into the vector collection
+
+    The index lives in its own SQLite file and is written by the sync
+    (LeadRAGSystem.sync_documents), which passes every document it reads
+    together with its content hash: new or changed documents are (re)indexed,
+    unchanged ones are only stamped with the run id, and documents of the
+    synced sources a run did not see are removed. An empty index next to a
+    non-empty collection is filled from the collection's stored documents
+    when LeadRAGSystem starts. Searching opens the file
+    read-only and never creates anything, so a missing index (or SQLite
+    without FTS5) just returns no lexical results.
+    """
+
+    def __init__(self, path: str = DEFAULT_LEXICAL_PATH):
+        """
+        Initialize lexical index
+
+        Args:
+            path: SQLite file holding the index (created by the first sync)
+        """
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn: Optional[sqlite3.Connection] = None
+        self.error: Optional[str] = None
+
+    def _writer(self) -> Optional[sqlite3.Connection]:
+        """Writable connection, creating the index tables on first use (None if FTS5 is unavailable)"""
+        if self._conn is not None or self.error is not None:
+            return self._conn
+        conn = None
+        try:
+            os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+            conn = sqlite3.connect(self.path)
+            conn.execute("PRAGMA journal_mode=WAL")
+            with conn:
+                conn.execute("""
+                    CREATE TABLE IF NOT EXISTS lexical_documents (
+                        row INTEGER PRIMARY KEY,
+                        doc_id TEXT NOT NULL UNIQUE,
+                        source TEXT NOT NULL,
+                        content_hash TEXT NOT NULL,
+                        metadata TEXT,
+                        run_id TEXT
+                    )
+                """)
+                conn.execute(f"""
+                    CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} USING fts5(
+                        content, tokenize = 'porter unicode61'
+                    )
+                """)
+        except sqlite3.Error as e:
+            # E.g. SQLite built without FTS5: syncs go on without a lexical index
+            if conn is not None:
+                conn.close()
+            self.error = str(e)
+            print(f"⚠️  Lexical index unavailable: {self.error}")
+            return None
+        self._conn = conn
+        return conn
+
+    def upsert(self, documents: Iterable[Tuple[str, str, Dict[str, Any], str]], run_id: Optional[str] = None) -> int:
+        """
+        Index documents read by a sync
+
+        Args:
+            documents: (doc_id, text, metadata, content_hash) tuples; metadata must include 'source'
+            run_id: Sync run that saw these documents
+
+        Returns:
+            Number of documents (re)indexed
+        """
+        documents = list(documents)
+        conn = self._writer()
+        if conn is None or not documents:
+            return 0
+        with self._lock:
+            try:
+                with conn:
+                    recorded = {}
+                    for start in range(0, len(documents), MAX_SQL_PARAMS):
+                        chunk = [doc_id for doc_id, _, _, _ in documents[start:start + MAX_SQL_PARAMS]]
+                        placeholders = ",".join("?" * len(chunk))
+                        for row, doc_id, content_hash in conn.execute(
+                            f"SELECT row, doc_id, content_hash FROM lexical_documents WHERE doc_id IN ({placeholders})", chunk
+                        ):
+                            recorded[doc_id] = (row, content_hash)
+
+                    written = 0
+                    unchanged = []
+                    for doc_id, text, metadata, content_hash in documents:
+                        row, recorded_hash = recorded.get(doc_id, (None, None))
+                        if recorded_hash == content_hash:
+                            unchanged.append((run_id, doc_id))
+                            continue
+                        values = (metadata.get("source", "unknown"), content_hash, json.dumps(metadata), run_id)
+                        if row is None:
+                            row = conn.execute(
+                                "INSERT INTO lexical_documents (doc_id, source, content_hash, metadata, run_id) "
+                                "VALUES (?, ?, ?, ?, ?)", (doc_id, *values)
+                            ).lastrowid
+                        else:
+                            conn.execute(f"DELETE FROM {FTS_TABLE} WHERE rowid = ?", (row,))
+                            conn.execute(
+                                "UPDATE lexical_documents SET source = ?, content_hash = ?, metadata = ?, run_id = ? "
+                                "WHERE row = ?", (*values, row)
+                            )
+                        conn.execute(f"INSERT INTO {FTS_TABLE} (rowid, content) VALUES (?, ?)", (row, text or ""))
+                        recorded[doc_id] = (row, content_hash)
+                        written += 1
+                    conn.executemany("UPDATE lexical_documents SET run_id = ? WHERE doc_id = ?", unchanged)
+                return written
+            except sqlite3.Error as e:
+                print(f"⚠️  Lexical index not updated: {str(e)}")
+                return 0
+
+    def remove_stale(self, sources: set, run_id: str) -> int:
+        """
+        Remove documents of the given sources that a sync run did not see
+
+        Returns:
+            Number of documents removed
+        """
+        conn = self._writer()
+        if conn is None or not sources:
+            return 0
+        placeholders = ",".join("?" * len(sources))
+        with self._lock:
+            try:
+                with conn:
+                    rows = [row for (row,) in conn.execute(
+                        f"SELECT row FROM lexical_documents WHERE source IN ({placeholders}) "
+                        f"AND (run_id IS NULL OR run_id != ?)", [*sources, run_id]
+                    )]
+                    conn.executemany(f"DELETE FROM {FTS_TABLE} WHERE rowid = ?", [(row,) for row in rows])
+                    conn.executemany("DELETE FROM lexical_documents WHERE row = ?", [(row,) for row in rows])
+                return len(rows)
+            except sqlite3.Error as e:
+                print(f"⚠️  Lexical index not updated: {str(e)}")
+                return 0
+
+    def count(self) -> int:
+        """Number of indexed documents (0 if the index has not been built)"""
+        if not os.path.exists(self.path):
+            return 0
+        try:
+            conn = open_read_only_connection(self.path, authorizer=fts_read_only_authorizer)
+            try:
+                return conn.execute("SELECT COUNT(*) FROM lexical_documents").fetchone()[0]
+            finally:
+                conn.close()
+        except sqlite3.Error:
+            return 0
+
+    def search(
+        self,
+        query: str,
+        n_results: int = 5,
+        filter_dict: Optional[Dict[str, Any]] = None
+    ) -> List[Dict[str, Any]]:
+        """
+        BM25 search
+
+        Args:
+            query: Free-text query
+            n_results: Maximum results
+            filter_dict: Optional Chroma-style where clause on document metadata
+
+        Returns:
+            List of dicts with 'id', 'content', 'metadata', 'distance' (None),
+            'bm25' (higher is better) and 'retrieval' ('lexical')
+        """
+        match = fts_query(query or "")
+        if match is None or not os.path.exists(self.path):
+            return []
+
+        # Over-fetch when filtering, since filters apply after ranking
+        limit = n_results if not filter_dict else n_results * 10
+        try:
+            conn = open_read_only_connection(self.path, authorizer=fts_read_only_authorizer)
+            try:
+                rows = conn.execute(f"""
+                    SELECT d.doc_id, f.content, d.metadata, bm25({FTS_TABLE}) AS score
+                    FROM {FTS_TABLE} f
+                    JOIN lexical_documents d ON d.row = f.rowid
+                    WHERE {FTS_TABLE} MATCH ?
+                    ORDER BY score
+                    LIMIT ?
+                """, (match, limit)).fetchall()
+            finally:
+                conn.close()
+        except sqlite3.Error as e:
+            print(f"❌ Error in lexical search: {str(e)}")
+            return []
+
+        results = []
+        for doc_id, content, metadata_json, score in rows:
+            metadata = json.loads(metadata_json) if metadata_json else {}
+            if not matches_where(metadata, filter_dict):
+                continue
+            results.append({
+                'id': doc_id,
+                'content': content,
+                'metadata': metadata,
+                'distance': None,
+                'bm25': round(-score, 4),  # FTS5 bm25() is lower-is-better
+                'retrieval': "lexical"
+            })
+            if len(results) >= n_results:
+                break
+        return results
+
+    def close(self) -> None:
+        """Close the writer connection"""
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
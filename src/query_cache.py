@@ -3,32 +3,550 @@ Query Caching Module
 TTL-based caching for frequent queries to improve performance
 """
 
+import os
 import time
+import heapq
 import hashlib
+import itertools
 import json
-from typing import Any, Optional, Callable, Dict
+import sqlite3
+import sys
+import threading
+import zlib
+from typing import Any, Optional, Callable, Dict, Iterable, List, Set, Tuple
 from functools import wraps
 from collections import OrderedDict
 
 
+# Default memory budget for cached values (bytes)
+DEFAULT_MAX_BYTES = 64 * 1024 * 1024
+
+# Defaults for the optional on-disk (L2) tier
+DEFAULT_DISK_CACHE_PATH = "data/query_cache.db"
+DEFAULT_DISK_MAX_BYTES = 256 * 1024 * 1024
+
+# Set to a file path to give the hot caches (SQL results, query embeddings,
+# agent answers and the global cache) a shared persistent L2 tier
+DISK_CACHE_ENV_VAR = "QUERY_CACHE_DISK_PATH"
+
+# The disk cache holds query results, so it is created owner-only
+DISK_CACHE_FILE_MODE = 0o600
+
+
+def estimate_size(obj: Any) -> int:
+    """
+    Estimate the memory footprint of a value in bytes
+    
+    Walks dicts, lists, tuples and sets recursively (shared objects are
+    counted once), so a 2,000-row result weighs far more than a scalar.
+    """
+    seen = set()
+    stack = [obj]
+    total = 0
+    while stack:
+        item = stack.pop()
+        if id(item) in seen:
+            continue
+        seen.add(id(item))
+        total += sys.getsizeof(item)
+        if isinstance(item, dict):
+            stack.extend(item.keys())
+            stack.extend(item.values())
+        elif isinstance(item, (list, tuple, set, frozenset)):
+            stack.extend(item)
+    return total
+
+
+# Global access counter shared by every stripe, so least recently used
+# entries can be compared across stripes (next() on a count is atomic)
+_access_counter = itertools.count()
+
+
+class _CacheEntry:
+    """Bookkeeping for one cached value"""
+    
+    __slots__ = ('created', 'deadline', 'size', 'namespace', 'tags', 'stamp')
+    
+    def __init__(self, created: float, deadline: Optional[float], size: int,
+                 namespace: Optional[str], tags: Set[str]):
+        self.created = created
+        self.deadline = deadline
+        self.size = size
+        self.namespace = namespace
+        self.tags = tags
+        self.stamp = next(_access_counter)
+
+
+class _Flight:
+    """A computation in progress that concurrent callers can wait on"""
+    
+    __slots__ = ('done', 'value', 'error', 'owner')
+    
+    def __init__(self):
+        self.done = threading.Event()
+        self.value = None
+        self.error = None
+        self.owner = threading.get_ident()  # Thread running the computation
+
+
+class _CacheStripe:
+    """
+    One independently locked shard of a QueryCache
+    
+    Holds the LRU order, expiry heap, indexes and counters for the keys that
+    hash to it. Capacity is enforced across all stripes by QueryCache.
+    Callers must hold self.lock.
+    """
+    
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.cache = OrderedDict()  # OrderedDict for LRU
+        self.entries: Dict[str, _CacheEntry] = {}
+        self.expiry_heap = []  # (deadline, key); stale pairs are skipped lazily
+        self.namespaces: Dict[str, Set[str]] = {}
+        self.tags: Dict[str, Set[str]] = {}
+        self.inflight: Dict[str, _Flight] = {}
+        self.total_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+    
+    def remove(self, key: str) -> None:
+        """Remove a key and its index entries"""
+        self.cache.pop(key, None)
+        entry = self.entries.pop(key, None)
+        if entry is None:
+            return
+        self.total_bytes -= entry.size
+        if entry.namespace is not None:
+            keys = self.namespaces.get(entry.namespace)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self.namespaces[entry.namespace]
+        for tag in entry.tags:
+            keys = self.tags.get(tag)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self.tags[tag]
+    
+    def expire(self, now: float) -> None:
+        """Drop entries whose deadline has passed (O(log n) per expired entry)"""
+        heap = self.expiry_heap
+        while heap and heap[0][0] <= now:
+            deadline, key = heapq.heappop(heap)
+            entry = self.entries.get(key)
+            # Skip heap pairs left behind by overwritten or removed keys
+            if entry is not None and entry.deadline == deadline:
+                self.remove(key)
+                self.expirations += 1
+    
+    def get(self, key: str, now: float, count: bool = True) -> Optional[Any]:
+        """Get a live value (optionally without touching the hit/miss counters)"""
+        entry = self.entries.get(key)
+        if entry is None:
+            if count:
+                self.misses += 1
+            return None
+        
+        # Check if expired
+        if entry.deadline is not None and entry.deadline <= now:
+            self.remove(key)
+            self.expirations += 1
+            if count:
+                self.misses += 1
+            return None
+        
+        # Move to end (most recently used)
+        self.cache.move_to_end(key)
+        entry.stamp = next(_access_counter)
+        if count:
+            self.hits += 1
+        return self.cache[key]
+    
+    def set(self, key: str, value: Any, size: int, deadline: Optional[float],
+            tags: Set[str], namespace: Optional[str], now: float) -> None:
+        """Store a value (the caller evicts afterwards if the cache is over capacity)"""
+        self.remove(key)
+        self.expire(now)
+        
+        self.cache[key] = value
+        self.entries[key] = _CacheEntry(now, deadline, size, namespace, tags)
+        self.total_bytes += size
+        if deadline is not None:
+            heapq.heappush(self.expiry_heap, (deadline, key))
+        if namespace is not None:
+            self.namespaces.setdefault(namespace, set()).add(key)
+        for tag in tags:
+            self.tags.setdefault(tag, set()).add(key)
+    
+    def oldest_stamp(self) -> Optional[int]:
+        """Access stamp of the least recently used entry (None if empty)"""
+        if not self.cache:
+            return None
+        return self.entries[next(iter(self.cache))].stamp
+    
+    def evict_oldest(self) -> None:
+        """Evict the least recently used entry"""
+        if self.cache:
+            self.remove(next(iter(self.cache)))
+            self.evictions += 1
+    
+    def clear(self) -> None:
+        """Drop all entries (counters are kept)"""
+        self.cache.clear()
+        self.entries.clear()
+        self.expiry_heap.clear()
+        self.namespaces.clear()
+        self.tags.clear()
+        self.total_bytes = 0
+
+
+def _json_default(value: Any) -> Any:
+    """Encode numpy arrays and scalars (anything with tolist) for the disk cache"""
+    if hasattr(value, "tolist"):
+        return value.tolist()
+    raise TypeError(f"{type(value).__name__} is not JSON serializable")
+
+
+class DiskCache:
+    """
+    Persistent cache tier stored in a local SQLite file
+    
+    Same key/TTL/namespace/tag semantics as QueryCache. Values are stored as
+    zlib-compressed JSON, so reading the file never executes code; tuples
+    come back as lists and numpy arrays as lists of floats, and values JSON
+    can't represent are not stored. The file is created owner-only (0600).
+    When it grows past max_bytes the least recently accessed entries are
+    pruned. Survives process restarts and redeploys.
+    """
+    
+    def __init__(self, path: str = DEFAULT_DISK_CACHE_PATH, max_bytes: int = DEFAULT_DISK_MAX_BYTES,
+                 default_ttl: Optional[int] = None, clock: Callable[[], float] = time.time):
+        """
+        Initialize disk cache
+        
+        Args:
+            path: SQLite file holding the cache (created if missing)
+            max_bytes: Budget for compressed values in bytes (LRU pruning)
+            default_ttl: Default time-to-live in seconds (None = no expiry)
+            clock: Wall-clock time source for TTLs (injectable for tests)
+        """
+        self.path = path
+        self.max_bytes = max_bytes
+        self.default_ttl = default_ttl
+        self.clock = clock
+        self.hits = 0
+        self.misses = 0
+        self.prunes = 0
+        self._lock = threading.Lock()
+        
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, mode=0o700, exist_ok=True)
+        # Create the file owner-only before SQLite opens it (its -wal and
+        # -shm files copy these permissions)
+        os.close(os.open(path, os.O_RDWR | os.O_CREAT, DISK_CACHE_FILE_MODE))
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute("PRAGMA busy_timeout=5000")
+        self._conn.executescript("""
+            CREATE TABLE IF NOT EXISTS cache_entries (
+                key TEXT PRIMARY KEY,
+                value BLOB NOT NULL,
+                size INTEGER NOT NULL,
+                created REAL NOT NULL,
+                deadline REAL,
+                last_access REAL NOT NULL,
+                namespace TEXT
+            );
+            CREATE INDEX IF NOT EXISTS idx_cache_entries_access ON cache_entries(last_access);
+            CREATE INDEX IF NOT EXISTS idx_cache_entries_deadline ON cache_entries(deadline);
+            CREATE INDEX IF NOT EXISTS idx_cache_entries_namespace ON cache_entries(namespace);
+            CREATE TABLE IF NOT EXISTS cache_tags (
+                tag TEXT NOT NULL,
+                key TEXT NOT NULL,
+                PRIMARY KEY (tag, key)
+            ) WITHOUT ROWID;
+            CREATE INDEX IF NOT EXISTS idx_cache_tags_key ON cache_tags(key);
+        """)
+        self._total_bytes = self._conn.execute(
+            "SELECT COALESCE(SUM(size), 0) FROM cache_entries"
+        ).fetchone()[0]
+    
+    def _delete_keys(self, keys: List[str]) -> int:
+        """Delete entries and their tags (caller holds the lock)"""
+        for start in range(0, len(keys), 500):
+            chunk = keys[start:start + 500]
+            marks = ",".join("?" * len(chunk))
+            self._conn.execute(f"DELETE FROM cache_tags WHERE key IN ({marks})", chunk)
+            self._conn.execute(f"DELETE FROM cache_entries WHERE key IN ({marks})", chunk)
+        self._total_bytes = self._conn.execute(
+            "SELECT COALESCE(SUM(size), 0) FROM cache_entries"
+        ).fetchone()[0]
+        return len(keys)
+    
+    def _prune(self, now: float) -> None:
+        """Drop expired entries, then least recently accessed ones until under budget"""
+        expired = [row[0] for row in self._conn.execute(
+            "SELECT key FROM cache_entries WHERE deadline IS NOT NULL AND deadline <= ?", (now,)
+        )]
+        if expired:
+            self._delete_keys(expired)
+        
+        excess = self._total_bytes - self.max_bytes
+        if excess <= 0:
+            return
+        victims = []
+        for key, size in self._conn.execute(
+            "SELECT key, size FROM cache_entries ORDER BY last_access"
+        ):
+            victims.append(key)
+            excess -= size
+            if excess <= 0:
+                break
+        self.prunes += len(victims)
+        self._delete_keys(victims)
+    
+    def get_entry(self, key: str) -> Optional[Tuple[Any, Optional[float], Optional[str], Set[str]]]:
+        """
+        Get a live entry with its metadata
+        
+        Returns:
+            (value, deadline, namespace, tags), or None on a miss
+        """
+        now = self.clock()
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT value, deadline, namespace FROM cache_entries WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None:
+                self.misses += 1
+                return None
+            blob, deadline, namespace = row
+            if deadline is not None and deadline <= now:
+                self._delete_keys([key])
+                self.misses += 1
+                return None
+            self._conn.execute("UPDATE cache_entries SET last_access = ? WHERE key = ?", (now, key))
+            tags = {r[0] for r in self._conn.execute("SELECT tag FROM cache_tags WHERE key = ?", (key,))}
+            self.hits += 1
+        
+        try:
+            return json.loads(zlib.decompress(blob)), deadline, namespace, tags
+        except Exception:
+            # Written by an incompatible version; treat as a miss
+            self.delete(key)
+            return None
+    
+    def get(self, key: str) -> Optional[Any]:
+        """Get item from the disk cache if not expired"""
+        entry = self.get_entry(key)
+        return entry[0] if entry is not None else None
+    
+    def set(self, key: str, value: Any, ttl: Optional[int] = None,
+            tags: Optional[Iterable[str]] = None, namespace: Optional[str] = None) -> bool:
+        """
+        Store a value (returns False if it is not JSON-serializable or exceeds the budget)
+        """
+        try:
+            blob = zlib.compress(json.dumps(value, default=_json_default, separators=(",", ":")).encode("utf-8"))
+        except (TypeError, ValueError):
+            return False
+        if len(blob) > self.max_bytes:
+            return False
+        
+        now = self.clock()
+        ttl = self.default_ttl if ttl is None else ttl
+        deadline = now + ttl if ttl is not None else None
+        with self._lock:
+            self._conn.execute("BEGIN")
+            try:
+                old = self._conn.execute("SELECT size FROM cache_entries WHERE key = ?", (key,)).fetchone()
+                self._conn.execute(
+                    "INSERT OR REPLACE INTO cache_entries "
+                    "(key, value, size, created, deadline, last_access, namespace) VALUES (?, ?, ?, ?, ?, ?, ?)",
+                    (key, blob, len(blob), now, deadline, now, namespace)
+                )
+                self._conn.execute("DELETE FROM cache_tags WHERE key = ?", (key,))
+                if tags:
+                    self._conn.executemany(
+                        "INSERT OR IGNORE INTO cache_tags (tag, key) VALUES (?, ?)",
+                        [(tag, key) for tag in tags]
+                    )
+                self._total_bytes += len(blob) - (old[0] if old else 0)
+                if self._total_bytes > self.max_bytes:
+                    self._prune(now)
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+        return True
+    
+    def items(self, namespace: str) -> List[Tuple[str, Any]]:
+        """Live (key, value) pairs stored under a namespace, oldest first"""
+        now = self.clock()
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT key, value FROM cache_entries WHERE namespace = ? AND (deadline IS NULL OR deadline > ?) "
+                "ORDER BY created",
+                (namespace, now)
+            ).fetchall()
+        items = []
+        for key, blob in rows:
+            try:
+                items.append((key, json.loads(zlib.decompress(blob))))
+            except Exception:
+                continue
+        return items
+    
+    def delete(self, key: str) -> bool:
+        """Remove a single key; returns whether it was cached"""
+        with self._lock:
+            found = self._conn.execute("SELECT 1 FROM cache_entries WHERE key = ?", (key,)).fetchone()
+            if found:
+                self._delete_keys([key])
+            return found is not None
+    
+    def clear(self) -> None:
+        """Clear all cached items"""
+        with self._lock:
+            self._conn.execute("DELETE FROM cache_tags")
+            self._conn.execute("DELETE FROM cache_entries")
+            self._total_bytes = 0
+    
+    def _invalidate_query(self, sql: str, params: tuple) -> int:
+        """Delete the keys selected by sql"""
+        with self._lock:
+            keys = [row[0] for row in self._conn.execute(sql, params)]
+            return self._delete_keys(keys) if keys else 0
+    
+    def invalidate_namespace(self, namespace: str) -> int:
+        """Invalidate every entry stored under a namespace"""
+        return self._invalidate_query("SELECT key FROM cache_entries WHERE namespace = ?", (namespace,))
+    
+    def invalidate_tag(self, tag: str) -> int:
+        """Invalidate every entry carrying a tag"""
+        return self._invalidate_query("SELECT key FROM cache_tags WHERE tag = ?", (tag,))
+    
+    def invalidate(self, pattern: Optional[str] = None) -> int:
+        """Invalidate entries by namespace or key prefix (all entries if None)"""
+        if pattern is None:
+            with self._lock:
+                count = self._conn.execute("SELECT COUNT(*) FROM cache_entries").fetchone()[0]
+            self.clear()
+            return count
+        return self._invalidate_query(
+            "SELECT key FROM cache_entries WHERE namespace = ? OR substr(key, 1, ?) = ?",
+            (pattern, len(pattern), pattern)
+        )
+    
+    def get_stats(self) -> Dict[str, Any]:
+        """Get disk cache statistics"""
+        with self._lock:
+            size = self._conn.execute("SELECT COUNT(*) FROM cache_entries").fetchone()[0]
+            return {
+                "path": self.path,
+                "size": size,
+                "bytes": self._total_bytes,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "pruned": self.prunes
+            }
+    
+    def close(self) -> None:
+        """Close the underlying SQLite connection"""
+        with self._lock:
+            self._conn.close()
+
+
 class QueryCache:
-    """TTL-based query cache with LRU eviction"""
+    """
+    Thread-safe TTL-based query cache with LRU eviction and a memory budget
+    
+    State is split across lock stripes chosen by key hash, so concurrent
+    sessions touching different keys don't contend. max_size and max_bytes
+    apply to the whole cache: when a write goes over either, the least
+    recently used entries across all stripes are evicted (one stripe lock at
+    a time, so concurrent writers may briefly overshoot by an entry each).
     
-    def __init__(self, max_size: int = 100, default_ttl: int = 300):
+    An optional DiskCache acts as a persistent L2: writes go to both tiers,
+    and an L1 miss that hits L2 is promoted back into memory.
+    """
+    
+    def __init__(self, max_size: int = 100, default_ttl: Optional[int] = 300,
+                 max_bytes: Optional[int] = DEFAULT_MAX_BYTES, stripes: int = 1,
+                 l2: Optional[DiskCache] = None, clock: Callable[[], float] = time.time):
         """
         Initialize cache
         
         Args:
             max_size: Maximum number of cached items (LRU eviction)
-            default_ttl: Default time-to-live in seconds (5 minutes)
+            default_ttl: Default time-to-live in seconds (5 minutes; None = no expiry)
+            max_bytes: Memory budget for cached values in bytes (None = unbounded)
+            stripes: Number of independently locked shards
+            l2: Optional persistent second tier
+            clock: Wall-clock time source for TTLs (injectable for tests)
         """
         self.max_size = max_size
         self.default_ttl = default_ttl
-        self.cache = OrderedDict()  # OrderedDict for LRU
-        self.timestamps = {}  # Track when items were cached
+        self.max_bytes = max_bytes
+        self.l2 = l2
+        self.clock = clock
+        stripes = max(1, min(stripes, max_size))
+        self._stripes = [_CacheStripe() for _ in range(stripes)]
+    
+    def __len__(self) -> int:
+        return sum(len(stripe.cache) for stripe in self._stripes)
+    
+    def __contains__(self, key: str) -> bool:
+        stripe = self._stripe(key)
+        with stripe.lock:
+            return stripe.get(key, self.clock(), count=False) is not None
+    
+    def _stripe(self, key: str) -> _CacheStripe:
+        """Stripe owning a key"""
+        if len(self._stripes) == 1:
+            return self._stripes[0]
+        return self._stripes[hash(key) % len(self._stripes)]
+    
+    def _over_capacity(self) -> bool:
+        """Whether the cache holds more entries or bytes than allowed (lock-free estimate)"""
+        if sum(len(stripe.cache) for stripe in self._stripes) > self.max_size:
+            return True
+        return self.max_bytes is not None and sum(stripe.total_bytes for stripe in self._stripes) > self.max_bytes
+    
+    def _evict_to_capacity(self) -> None:
+        """Evict least recently used entries across stripes until within max_size/max_bytes"""
+        while self._over_capacity():
+            victim, victim_stamp = None, None
+            for stripe in self._stripes:
+                with stripe.lock:
+                    stamp = stripe.oldest_stamp()
+                if stamp is not None and (victim_stamp is None or stamp < victim_stamp):
+                    victim, victim_stamp = stripe, stamp
+            if victim is None:
+                return
+            with victim.lock:
+                victim.evict_oldest()
+    
+    def _store(self, key: str, value: Any, size: int, deadline: Optional[float],
+               tags: Set[str], namespace: Optional[str], now: float) -> None:
+        """Store a sized value in its stripe and enforce capacity"""
+        stripe = self._stripe(key)
+        with stripe.lock:
+            if self.max_bytes is not None and size > self.max_bytes:
+                # Larger than the whole budget: caching it would flush everything else
+                stripe.remove(key)
+                return
+            stripe.set(key, value, size, deadline, tags, namespace, now)
+        self._evict_to_capacity()
     
     def _generate_key(self, func_name: str, *args, **kwargs) -> str:
-        """Generate cache key from function name and arguments"""
+        """Generate cache key from function name and arguments ("<func_name>:<hash>")"""
         # Create a stable representation of arguments
         key_data = {
             'func': func_name,
@@ -36,97 +554,261 @@ class QueryCache:
             'kwargs': sorted(kwargs.items()) if kwargs else []
         }
         key_str = json.dumps(key_data, sort_keys=True, default=str)
-        return hashlib.md5(key_str.encode()).hexdigest()
+        return f"{func_name}:{hashlib.md5(key_str.encode()).hexdigest()}"
     
     def get(self, key: str) -> Optional[Any]:
-        """Get item from cache if not expired"""
-        if key not in self.cache:
+        """Get item from cache if not expired (falling back to L2)"""
+        stripe = self._stripe(key)
+        with stripe.lock:
+            value = stripe.get(key, self.clock())
+        if value is None and self.l2 is not None:
+            value = self._get_from_l2(key)
+        return value
+    
+    def _get_from_l2(self, key: str) -> Optional[Any]:
+        """Look a key up in L2 and promote a hit into L1 with its remaining TTL"""
+        entry = self.l2.get_entry(key)
+        if entry is None:
             return None
+        value, deadline, namespace, tags = entry
+        self._store(key, value, estimate_size(value), deadline, tags, namespace, self.clock())
+        return value
+    
+    def set(self, key: str, value: Any, ttl: Optional[int] = None,
+            tags: Optional[Iterable[str]] = None, namespace: Optional[str] = None) -> None:
+        """
+        Set item in cache
         
-        # Check if expired
-        if key in self.timestamps:
-            age = time.time() - self.timestamps[key]
-            if age > self.default_ttl:
-                # Expired, remove it
-                del self.cache[key]
-                del self.timestamps[key]
-                return None
+        Args:
+            key: Cache key
+            value: Value to cache
+            ttl: Time-to-live in seconds for this entry (default_ttl if None)
+            tags: Optional tags for invalidate_tag()
+            namespace: Optional namespace for invalidate_namespace()
+        """
+        # Sized outside the lock: walking a large result is the slow part
+        size = estimate_size(value)
+        now = self.clock()
+        ttl = self.default_ttl if ttl is None else ttl
+        deadline = now + ttl if ttl is not None else None
+        tag_set = set(tags) if tags else set()
         
-        # Move to end (most recently used)
-        value = self.cache.pop(key)
-        self.cache[key] = value
+        self._store(key, value, size, deadline, tag_set, namespace, now)
+        if self.l2 is not None:
+            self.l2.set(key, value, ttl=ttl, tags=tag_set, namespace=namespace)
+    
+    def get_or_compute(self, key: str, compute: Callable[[], Any], ttl: Optional[int] = None,
+                       tags: Optional[Iterable[str]] = None, namespace: Optional[str] = None) -> Any:
+        """
+        Get a cached value, computing it at most once across concurrent callers
         
-        return value
+        On a miss the first caller runs compute(); other callers missing on
+        the same key meanwhile wait for that result (or its exception) instead
+        of computing it again. None results are returned but not cached.
+        
+        compute() must not call get_or_compute for its own key: that would
+        wait on itself forever, so it raises RuntimeError instead.
+        """
+        stripe = self._stripe(key)
+        with stripe.lock:
+            value = stripe.get(key, self.clock())
+            if value is not None:
+                return value
+            flight = stripe.inflight.get(key)
+            leader = flight is None
+            if leader:
+                flight = stripe.inflight[key] = _Flight()
+        
+        if not leader:
+            if flight.owner == threading.get_ident():
+                raise RuntimeError(
+                    f"get_or_compute re-entered for key {key!r} from its own compute function"
+                )
+            flight.done.wait()
+            if flight.error is not None:
+                raise flight.error
+            return flight.value
+        
+        try:
+            flight.value = self._get_from_l2(key) if self.l2 is not None else None
+            if flight.value is not None:
+                return flight.value
+            flight.value = compute()
+            if flight.value is not None:
+                self.set(key, flight.value, ttl=ttl, tags=tags, namespace=namespace)
+            return flight.value
+        except BaseException as e:
+            flight.error = e
+            raise
+        finally:
+            with stripe.lock:
+                stripe.inflight.pop(key, None)
+            flight.done.set()
     
-    def set(self, key: str, value: Any, ttl: Optional[int] = None) -> None:
-        """Set item in cache with TTL"""
-        # Remove oldest if at capacity
-        if len(self.cache) >= self.max_size:
-            oldest_key = next(iter(self.cache))
-            del self.cache[oldest_key]
-            if oldest_key in self.timestamps:
-                del self.timestamps[oldest_key]
+    def delete(self, key: str) -> bool:
+        """Remove a single key; returns whether it was cached"""
+        stripe = self._stripe(key)
+        with stripe.lock:
+            found = key in stripe.cache
+            stripe.remove(key)
+        if self.l2 is not None:
+            found = self.l2.delete(key) or found
+        return found
+    
+    def clear(self, include_l2: bool = True) -> None:
+        """
+        Clear all cached items
         
-        # Add new item
-        self.cache[key] = value
-        self.timestamps[key] = time.time()
+        Args:
+            include_l2: Also clear the persistent tier (False drops only the
+                in-memory entries, e.g. when their keys have gone stale)
+        """
+        for stripe in self._stripes:
+            with stripe.lock:
+                stripe.clear()
+        if include_l2 and self.l2 is not None:
+            self.l2.clear()
     
-    def clear(self) -> None:
-        """Clear all cached items"""
-        self.cache.clear()
-        self.timestamps.clear()
+    def _invalidate_where(self, select: Callable[[_CacheStripe], Iterable[str]]) -> int:
+        """Remove the keys select() picks from each stripe"""
+        count = 0
+        for stripe in self._stripes:
+            with stripe.lock:
+                keys = list(select(stripe))
+                for key in keys:
+                    stripe.remove(key)
+                count += len(keys)
+        return count
+    
+    def invalidate_namespace(self, namespace: str) -> int:
+        """Invalidate every entry stored under a namespace (O(k) for k entries)"""
+        count = self._invalidate_where(lambda stripe: stripe.namespaces.get(namespace, ()))
+        if self.l2 is not None:
+            count = max(count, self.l2.invalidate_namespace(namespace))
+        return count
+    
+    def invalidate_tag(self, tag: str) -> int:
+        """Invalidate every entry carrying a tag (O(k) for k entries)"""
+        count = self._invalidate_where(lambda stripe: stripe.tags.get(tag, ()))
+        if self.l2 is not None:
+            count = max(count, self.l2.invalidate_tag(tag))
+        return count
     
     def invalidate(self, pattern: Optional[str] = None) -> int:
         """
         Invalidate cache entries
         
         Args:
-            pattern: Optional pattern to match (if None, clears all)
+            pattern: Namespace or key prefix to match (if None, clears all)
         
         Returns:
-            Number of items invalidated
+            Number of items invalidated (the larger of the two tiers' counts)
         """
+        l2_count = self.l2.invalidate(pattern) if self.l2 is not None else 0
         if pattern is None:
-            count = len(self.cache)
-            self.clear()
-            return count
+            return max(self._invalidate_where(lambda stripe: stripe.cache.keys()), l2_count)
         
-        # Remove matching keys
-        keys_to_remove = [k for k in self.cache.keys() if pattern in k]
-        for key in keys_to_remove:
-            del self.cache[key]
-            if key in self.timestamps:
-                del self.timestamps[key]
+        def select(stripe):
+            if pattern in stripe.namespaces:
+                return stripe.namespaces[pattern]
+            # Keys starting with the pattern
+            return [k for k in stripe.cache.keys() if k.startswith(pattern)]
         
-        return len(keys_to_remove)
+        return max(self._invalidate_where(select), l2_count)
     
     def get_stats(self) -> Dict[str, Any]:
         """Get cache statistics"""
+        now = self.clock()
+        totals = {"size": 0, "bytes": 0, "hits": 0, "misses": 0, "evictions": 0, "expirations": 0}
+        namespaces: Dict[str, int] = {}
+        items = []
+        for stripe in self._stripes:
+            with stripe.lock:
+                totals["size"] += len(stripe.cache)
+                totals["bytes"] += stripe.total_bytes
+                totals["hits"] += stripe.hits
+                totals["misses"] += stripe.misses
+                totals["evictions"] += stripe.evictions
+                totals["expirations"] += stripe.expirations
+                for ns, keys in stripe.namespaces.items():
+                    namespaces[ns] = namespaces.get(ns, 0) + len(keys)
+                for key in list(stripe.cache.keys())[:10 - len(items)]:  # First 10 items
+                    entry = stripe.entries[key]
+                    items.append({"key": key, "age_seconds": now - entry.created, "bytes": entry.size})
+        
+        lookups = totals["hits"] + totals["misses"]
         return {
-            "size": len(self.cache),
+            "size": totals["size"],
             "max_size": self.max_size,
+            "bytes": totals["bytes"],
+            "max_bytes": self.max_bytes,
             "default_ttl": self.default_ttl,
-            "items": [
-                {
-                    "key": key,
-                    "age_seconds": time.time() - self.timestamps.get(key, 0)
-                }
-                for key in list(self.cache.keys())[:10]  # First 10 items
-            ]
+            "stripes": len(self._stripes),
+            "hits": totals["hits"],
+            "misses": totals["misses"],
+            "hit_rate": round(totals["hits"] / lookups, 3) if lookups else 0.0,
+            "evictions": totals["evictions"],
+            "expirations": totals["expirations"],
+            "namespaces": namespaces,
+            "items": items,
+            "l2": self.l2.get_stats() if self.l2 is not None else None
         }
 
 
+# Shared DiskCache per path (None for paths that could not be opened)
+_disk_caches: Dict[str, Optional[DiskCache]] = {}
+_disk_caches_lock = threading.Lock()
+
+
+def get_disk_cache(path: Optional[str] = None) -> Optional[DiskCache]:
+    """
+    Get the shared persistent cache tier
+    
+    Every hot cache (SQL results, query embeddings, agent answers, the global
+    cache) uses this one file, keeping its entries apart by key prefix.
+    
+    Args:
+        path: Cache file (default: QUERY_CACHE_DISK_PATH)
+    
+    Returns:
+        DiskCache, or None when no path is configured or it can't be opened
+    """
+    path = path or os.getenv(DISK_CACHE_ENV_VAR)
+    if not path:
+        return None
+    with _disk_caches_lock:
+        if path not in _disk_caches:
+            try:
+                _disk_caches[path] = DiskCache(path)
+            except (sqlite3.Error, OSError) as e:
+                print(f"⚠️  Disk cache not available ({path}): {str(e)}")
+                _disk_caches[path] = None
+        return _disk_caches[path]
+
+
+def _create_global_cache() -> QueryCache:
+    """Build the global cache, with a disk tier when QUERY_CACHE_DISK_PATH is set"""
+    return QueryCache(max_size=100, default_ttl=300, stripes=8, l2=get_disk_cache())
+
+
 # Global cache instance
-_global_cache = QueryCache(max_size=100, default_ttl=300)
+_global_cache = _create_global_cache()
 
 
-def cached(ttl: Optional[int] = None, cache_instance: Optional[QueryCache] = None):
+def cached(ttl: Optional[int] = None, cache_instance: Optional[QueryCache] = None,
+           tags: Optional[Iterable[str]] = None, single_flight: bool = False):
     """
     Decorator for caching function results
     
+    Results are stored under the function's name as namespace, so
+    cache_clear() only drops that function's entries.
+    
     Args:
         ttl: Time-to-live in seconds (uses cache default if None)
         cache_instance: Cache instance to use (uses global if None)
+        tags: Optional tags attached to every result (see invalidate_tag)
+        single_flight: Concurrent identical calls wait for one computation
+            instead of each running the function
     
     Example:
         @cached(ttl=600)
@@ -141,6 +823,12 @@ def cached(ttl: Optional[int] = None, cache_instance: Optional[QueryCache] = Non
             # Generate cache key
             key = cache._generate_key(func.__name__, *args, **kwargs)
             
+            if single_flight:
+                return cache.get_or_compute(
+                    key, lambda: func(*args, **kwargs),
+                    ttl=ttl, tags=tags, namespace=func.__name__
+                )
+            
             # Try to get from cache
             cached_value = cache.get(key)
             if cached_value is not None:
@@ -150,12 +838,12 @@ def cached(ttl: Optional[int] = None, cache_instance: Optional[QueryCache] = Non
             value = func(*args, **kwargs)
             
             # Store in cache
-            cache.set(key, value, ttl=ttl)
+            cache.set(key, value, ttl=ttl, tags=tags, namespace=func.__name__)
             
             return value
         
         # Add cache control methods to function
-        wrapper.cache_clear = lambda: cache.invalidate(func.__name__)
+        wrapper.cache_clear = lambda: cache.invalidate_namespace(func.__name__)
         wrapper.cache_stats = lambda: cache.get_stats()
         
         return wrapper
@@ -193,7 +881,7 @@ if __name__ == "__main__":
     # Test LRU eviction
     for i in range(6):
         cache.set(f"key{i}", f"value{i}")
-    assert "key0" not in cache.cache  # Oldest should be evicted
+    assert "key0" not in cache  # Oldest should be evicted
     print("✅ LRU eviction working")
     
     # Test decorator
@@ -207,5 +895,49 @@ if __name__ == "__main__":
     assert result1 == result2 == 10
     print("✅ Decorator working")
     
+    # Test decorator invalidation by namespace
+    assert expensive_function.cache_clear() == 1
+    print("✅ cache_clear working")
+    
+    # Test byte budget
+    small = QueryCache(max_size=100, default_ttl=60, max_bytes=50_000)
+    small.set("scalar", 1)
+    small.set("big", [{"id": i, "name": f"lead {i}"} for i in range(2000)])
+    assert small.get("big") is None  # Larger than the whole budget
+    for i in range(20):
+        small.set(f"rows{i}", [{"id": j} for j in range(50)])
+    assert small.get_stats()["bytes"] <= 50_000 and small.get_stats()["evictions"] > 0
+    print("✅ Byte budget working")
+    
+    # Test single-flight coalescing
+    import threading
+    calls = []
+    
+    @cached(ttl=5, single_flight=True)
+    def slow_report(week):
+        calls.append(week)
+        time.sleep(0.2)
+        return {"week": week}
+    
+    threads = [threading.Thread(target=slow_report, args=(42,)) for _ in range(8)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert len(calls) == 1
+    print("✅ Single-flight working")
+    
+    # Test L2 persistence and promotion
+    import tempfile
+    disk_path = os.path.join(tempfile.mkdtemp(), "cache.db")
+    tiered = QueryCache(max_size=5, default_ttl=60, l2=DiskCache(disk_path))
+    tiered.set("report", {"rows": list(range(100))}, tags=["leads"])
+    restarted = QueryCache(max_size=5, default_ttl=60, l2=DiskCache(disk_path))
+    assert restarted.get("report") == {"rows": list(range(100))}
+    assert restarted.get_stats()["size"] == 1  # Promoted into L1
+    assert restarted.invalidate_tag("leads") == 1
+    assert DiskCache(disk_path).get("report") is None
+    print("✅ Disk tier working")
+    
     print("\n✅ All cache tests passed!")
 
@@ -4,30 +4,162 @@ Creates vector embeddings and handles semantic search
 """
 
 import os
+import re
 import sqlite3
 import json
-from typing import List, Dict, Any
+import asyncio
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeoutError
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
 import chromadb
 from chromadb.config import Settings
 from langchain_openai import OpenAIEmbeddings
 from dotenv import load_dotenv
 
+import numpy as np
+
+from embedding_store import EmbeddingStore
+from sync_manifest import SyncManifest, document_hash
+from embedding_pipeline import EmbeddingPipeline, MAX_BATCH_INPUTS
+from query_cache import QueryCache, get_disk_cache
+from text_chunker import (
+    CHUNKING_REPORT_ENV_VAR, DEFAULT_CHUNK_TOKENS, DEFAULT_OVERLAP_TOKENS, ChunkingReport, chunk_text,
+    LEGACY_CHUNK_CHARS
+)
+from vector_index import NumpyVectorIndex
+from lexical_search import LexicalIndex, reciprocal_rank_fusion
+
 load_dotenv()
 
+EMBEDDING_MODEL = "text-embedding-3-small"
+
+# Retries of a failed embedding request. This is the only retry layer: the
+# client backs off (honouring Retry-After), while the sync pipeline and query
+# embedding send each request once.
+EMBEDDING_MAX_RETRIES = 3
+
+# Vector search backends: "chroma" (HNSW index) or "numpy" (exact search
+# over a memory-mapped matrix, see vector_index.py)
+VECTOR_BACKENDS = ("chroma", "numpy")
+DEFAULT_VECTOR_BACKEND = "chroma"
+VECTOR_BACKEND_ENV_VAR = "VECTOR_BACKEND"
+
+# Token budget and overlap for chunks of raw timeline / CRM text (see
+# text_chunker for the embedding-token cost of overlap)
+RAW_TEXT_CHUNK_TOKENS = DEFAULT_CHUNK_TOKENS
+RAW_TEXT_OVERLAP_TOKENS = DEFAULT_OVERLAP_TOKENS
+
+# Collection ids read or deleted per call while syncing
+SYNC_BATCH_SIZE = 100
+
+# Embedding requests in flight while syncing the collection
+EMBEDDING_CONCURRENCY = 4
+
+# Query embeddings kept in memory (shared by all LeadRAGSystem instances).
+# Stored as float32 arrays, ~6KB each; with QUERY_CACHE_DISK_PATH set they
+# also persist across restarts.
+QUERY_EMBEDDING_CACHE_SIZE = 1024
+_query_embedding_cache = QueryCache(
+    max_size=QUERY_EMBEDDING_CACHE_SIZE,
+    default_ttl=None,
+    stripes=4,
+    l2=get_disk_cache()
+)
+
+
+# Threads running query embeddings that have a timeout (a timed-out call
+# keeps running and still fills the cache)
+_query_embedding_executor = ThreadPoolExecutor(max_workers=4, thread_name_prefix="query-embedding")
+
+# semantic_search modes: vector, lexical (BM25 only), hybrid (RRF of both)
+# and auto (lexical for keyword queries with enough hits, else hybrid)
+SEARCH_MODES = ("vector", "lexical", "hybrid", "auto")
+DEFAULT_SEARCH_MODE = "vector"
+
+# Candidates taken from each retriever before rank fusion
+HYBRID_CANDIDATES = 20
+
+# Queries of at most this many words (and no '?') count as keyword lookups in auto mode
+AUTO_LEXICAL_MAX_WORDS = 3
+
+# Seconds to wait for a query embedding before answering lexically
+EMBEDDING_TIMEOUT_SECONDS = 3.0
+
+# 'retrieval' of lexical results returned because vector search was
+# unavailable (embedding timeout, rate limit, ...): a retry may differ
+FALLBACK_RETRIEVAL = "lexical_fallback"
+
+
+def normalize_search_query(query: str) -> str:
+    """Normalize query text for embedding cache lookups (trim, collapse whitespace)"""
+    return re.sub(r'\s+', ' ', query).strip()
+
 
 class LeadRAGSystem:
     """Handles vector embeddings and semantic search for lead conversations"""
     
-    def __init__(self, db_path: str = "data/leads.db", chroma_path: str = "data/chroma_db"):
+    def __init__(
+        self,
+        db_path: str = "data/leads.db",
+        chroma_path: str = "data/chroma_db",
+        vector_backend: str = None
+    ):
+        """
+        Initialize RAG system
+        
+        Args:
+            db_path: SQLite database with lead documents
+            chroma_path: ChromaDB directory (its parent also holds the
+                embedding store, sync manifest and numpy vector index)
+            vector_backend: "chroma" (HNSW via ChromaDB) or "numpy" (exact
+                in-process search); defaults to $VECTOR_BACKEND, then "chroma"
+        """
         self.db_path = db_path
         self.chroma_path = chroma_path
+        self.vector_backend = (vector_backend or os.getenv(VECTOR_BACKEND_ENV_VAR) or DEFAULT_VECTOR_BACKEND).lower()
+        if self.vector_backend not in VECTOR_BACKENDS:
+            raise ValueError(f"Unknown vector backend '{self.vector_backend}' (expected one of {', '.join(VECTOR_BACKENDS)})")
+        data_dir = os.path.dirname(os.path.abspath(chroma_path))
+        
+        # BM25 keyword index over the same documents as the vector
+        # collection (written by syncs, read-only when searching)
+        self.lexical_index = LexicalIndex(os.path.join(data_dir, "lexical_index.db"))
+        self._lexical_index_checked = False
         
         # Initialize OpenAI embeddings
         self.embeddings = OpenAIEmbeddings(
-            model="text-embedding-3-small",
-            openai_api_key=os.getenv("OPENAI_API_KEY")
+            model=EMBEDDING_MODEL,
+            openai_api_key=os.getenv("OPENAI_API_KEY"),
+            max_retries=EMBEDDING_MAX_RETRIES
+        )
+        
+        # Local store of document embeddings keyed by content hash, so
+        # unchanged text is never sent to the embedding API twice
+        self.embedding_store = EmbeddingStore(
+            os.path.join(data_dir, "embedding_store"),
+            model=EMBEDDING_MODEL
         )
         
+        # Manifest of what the collection holds (doc id -> content hash);
+        # each backend is tracked separately
+        self.manifest = SyncManifest(
+            os.path.join(data_dir, "chroma_manifest.db"),
+            collection_name="lead_conversations" if self.vector_backend == "chroma" else f"lead_conversations@{self.vector_backend}"
+        )
+        
+        if self.vector_backend == "numpy":
+            # Exact search over a memory-mapped matrix (same collection API)
+            self.chroma_client = None
+            self.collection = NumpyVectorIndex(os.path.join(data_dir, "vector_index"), name="lead_conversations")
+            collection_count = self.collection.count()
+            if collection_count == 0:
+                print("✅ Created new numpy vector index (empty)")
+                self._needs_embeddings = True
+            else:
+                print(f"✅ Loaded existing numpy vector index with {collection_count} documents")
+                self._needs_embeddings = False
+                self._backfill_lexical_index()
+            return
+        
         # Initialize ChromaDB
         self.chroma_client = chromadb.PersistentClient(path=chroma_path)
         
@@ -42,6 +174,7 @@ class LeadRAGSystem:
             else:
                 print(f"✅ Loaded existing ChromaDB collection with {collection_count} documents")
                 self._needs_embeddings = False
+                self._backfill_lexical_index()
         except:
             self.collection = self.chroma_client.create_collection(
                 name="lead_conversations",
@@ -50,374 +183,515 @@ class LeadRAGSystem:
             print("✅ Created new ChromaDB collection (empty)")
             self._needs_embeddings = True
     
-    def create_embeddings(self, include_events: bool = True, include_raw_text: bool = True):
+    def _backfill_lexical_index(self) -> int:
+        """
+        Build the lexical index from the collection if it is empty
+        
+        A collection synced before the lexical index existed (or whose index
+        file was removed) would otherwise have no BM25 results until the next
+        sync. The documents and metadata stored in the collection are indexed
+        in pages of SYNC_BATCH_SIZE; nothing is embedded. Later syncs keep the
+        index in step as usual.
+        
+        Returns:
+            Number of documents indexed
+        """
+        if self.lexical_index.count():
+            return 0
+        indexed = 0
+        offset = 0
+        try:
+            while True:
+                stored = self.collection.get(limit=SYNC_BATCH_SIZE, offset=offset, include=["documents", "metadatas"])
+                if not stored['ids']:
+                    break
+                offset += len(stored['ids'])
+                group = []
+                for doc_id, text, metadata in zip(stored['ids'], stored['documents'], stored['metadatas']):
+                    metadata = metadata or {}
+                    group.append((doc_id, text or "", metadata, document_hash(text or "", metadata)))
+                indexed += self.lexical_index.upsert(group)
+                if self.lexical_index.error is not None:
+                    break
+        except Exception as e:
+            print(f"⚠️  Lexical index not built from the collection: {str(e)}")
+        if indexed:
+            print(f"✅ Built lexical index from the collection ({indexed} documents)")
+        return indexed
+    
+    def create_embeddings(
+        self,
+        include_events: bool = True,
+        include_raw_text: bool = True,
+        chunking_report: bool = None
+    ):
         """Create embeddings for all RAG documents, timeline events, and raw text fields
         
+        Documents are streamed from SQLite straight into the sync, so memory
+        stays bounded by the embedding batches in flight and the first batch
+        is sent as soon as enough changed documents have been read.
+        
         Args:
             include_events: Whether to include timeline event documents
             include_raw_text: Whether to include raw communication_timeline and crm_conversation_details
+            chunking_report: Compare raw text chunking with the legacy character
+                slices (re-tokenizes all raw text; defaults to $CHUNKING_REPORT)
         """
         print("\n🔄 Creating vector embeddings...")
         
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
+        counts = {"summary": 0, "event": 0, "raw_timeline": 0, "raw_crm": 0, "task": 0}
+        if chunking_report is None:
+            chunking_report = os.getenv(CHUNKING_REPORT_ENV_VAR, "").lower() in ("1", "true", "yes")
+        report = ChunkingReport(model=EMBEDDING_MODEL) if chunking_report and include_raw_text else None
         
-        # Get all RAG documents (summaries)
-        cursor.execute("""
-            SELECT rd.id, rd.lead_id, rd.chunk_type, rd.content, rd.metadata,
-                   l.name, l.status
-            FROM rag_documents rd
-            JOIN leads l ON rd.lead_id = l.lead_id
-        """)
+        result = self.sync_documents(
+            self._iter_documents(include_events, include_raw_text, counts, report),
+            sources=self._included_sources(include_events, include_raw_text)
+        )
         
-        documents = cursor.fetchall()
-        print(f"   Found {len(documents)} summary documents")
+        print(f"   📊 {sum(counts.values())} documents in SQLite")
+        print(f"      - {counts['summary']} summaries")
+        print(f"      - {counts['event']} events")
+        print(f"      - {counts['raw_timeline']} raw timeline chunks")
+        print(f"      - {counts['raw_crm']} raw CRM chunks")
+        print(f"      - {counts['task']} tasks")
+        if report is not None and report.texts:
+            chunking = report.get_stats()
+            print(f"   ✂️  Raw text chunking: {chunking['legacy_chunks']} chunks / {chunking['legacy_tokens']} tokens "
+                  f"with {LEGACY_CHUNK_CHARS}-char slices -> {chunking['chunks']} chunks / {chunking['tokens']} tokens "
+                  f"on message boundaries ({chunking['token_change_percent']:+.1f}% tokens, "
+                  f"avg {chunking['avg_chunk_tokens']} tokens/chunk)")
         
-        # Get timeline events if enabled
-        event_documents = []
-        if include_events:
-            cursor.execute("""
-                SELECT rde.id, rde.lead_id, rde.document_type, rde.content, rde.metadata,
-                       l.name, l.status
-                FROM rag_documents_events rde
-                JOIN leads l ON rde.lead_id = l.lead_id
-                WHERE rde.content IS NOT NULL AND rde.content != ''
-            """)
-            event_documents = cursor.fetchall()
-            print(f"   Found {len(event_documents)} event documents")
+        if not sum(counts.values()):
+            print("   ⚠️  No documents found!")
+        return result
+    
+    def _iter_documents(
+        self,
+        include_events: bool,
+        include_raw_text: bool,
+        counts: Dict[str, int],
+        chunking_report: Optional[ChunkingReport] = None
+    ) -> Iterator[Tuple[str, str, Dict[str, Any]]]:
+        """
+        Stream (doc_id, text, metadata) for every document to embed
         
-        # Get raw communication timeline text if enabled
-        raw_timeline_documents = []
-        if include_raw_text:
-            cursor.execute("""
-                SELECT l.lead_id, l.communication_timeline, l.name, l.status
-                FROM leads l
-                WHERE l.communication_timeline IS NOT NULL 
-                  AND l.communication_timeline != ''
-                  AND LENGTH(l.communication_timeline) > 100
+        Each source is read through its own cursor and rows are turned into
+        documents one at a time; nothing is fetched in full.
+        
+        Args:
+            include_events: Whether to include timeline events and tasks
+            include_raw_text: Whether to include raw timeline / CRM text
+            counts: Per-source document counts, updated as documents are yielded
+            chunking_report: Accumulates raw text chunking totals (None = no report)
+        """
+        conn = sqlite3.connect(self.db_path)
+        try:
+            # Summary documents
+            cursor = conn.execute("""
+                SELECT rd.id, rd.lead_id, rd.chunk_type, rd.content, rd.metadata,
+                       l.name, l.status
+                FROM rag_documents rd
+                JOIN leads l ON rd.lead_id = l.lead_id
             """)
-            raw_timeline = cursor.fetchall()
-            print(f"   Found {len(raw_timeline)} leads with raw communication timeline")
+            for doc_id, lead_id, chunk_type, content, metadata_json, name, status in cursor:
+                metadata = json.loads(metadata_json) if metadata_json else {}
+                metadata.update({
+                    "doc_id": str(doc_id) if doc_id else "",
+                    "lead_id": str(lead_id) if lead_id else "",
+                    "chunk_type": str(chunk_type) if chunk_type else "",
+                    "lead_name": str(name) if name else "Unknown",
+                    "status": str(status) if status else "Unknown",
+                    "source": "summary"
+                })
+                # Remove None values (ChromaDB doesn't accept None)
+                metadata = {k: v for k, v in metadata.items() if v is not None}
+                counts["summary"] += 1
+                yield f"doc_{doc_id}", content, metadata
             
-            # Chunk large timelines (max 8000 chars per chunk for embedding efficiency)
-            max_chunk_size = 8000
-            for lead_id, timeline_text, name, status in raw_timeline:
-                if timeline_text and len(timeline_text) > max_chunk_size:
-                    # Split into chunks
-                    chunks = [timeline_text[i:i+max_chunk_size] 
-                             for i in range(0, len(timeline_text), max_chunk_size)]
-                    for chunk_idx, chunk in enumerate(chunks):
-                        raw_timeline_documents.append((
-                            f"{lead_id}_timeline_chunk_{chunk_idx}",
-                            lead_id,
-                            "raw_communication_timeline",
-                            chunk,
-                            name,
-                            status
-                        ))
-                elif timeline_text:
-                    raw_timeline_documents.append((
-                        f"{lead_id}_timeline",
-                        lead_id,
-                        "raw_communication_timeline",
-                        timeline_text,
-                        name,
-                        status
-                    ))
-            print(f"   Created {len(raw_timeline_documents)} raw timeline chunks")
-        
-        # Get raw CRM conversation details if enabled
-        raw_crm_documents = []
-        if include_raw_text:
-            cursor.execute("""
-                SELECT l.lead_id, l.crm_conversation_details, l.name, l.status
-                FROM leads l
-                WHERE l.crm_conversation_details IS NOT NULL 
-                  AND l.crm_conversation_details != ''
-                  AND LENGTH(l.crm_conversation_details) > 50
-            """)
-            raw_crm = cursor.fetchall()
-            print(f"   Found {len(raw_crm)} leads with raw CRM conversation details")
+            # Timeline events
+            if include_events:
+                cursor = conn.execute("""
+                    SELECT rde.id, rde.lead_id, rde.document_type, rde.content, rde.metadata,
+                           l.name, l.status
+                    FROM rag_documents_events rde
+                    JOIN leads l ON rde.lead_id = l.lead_id
+                    WHERE rde.content IS NOT NULL AND rde.content != ''
+                """)
+                for doc_id, lead_id, doc_type, content, metadata_json, name, status in cursor:
+                    metadata = json.loads(metadata_json) if metadata_json else {}
+                    metadata.update({
+                        "doc_id": str(doc_id) if doc_id else "",
+                        "lead_id": str(lead_id) if lead_id else "",
+                        "chunk_type": str(doc_type) if doc_type else "",
+                        "lead_name": str(name) if name else "Unknown",
+                        "status": str(status) if status else "Unknown",
+                        "source": "event"
+                    })
+                    # Remove None values (ChromaDB doesn't accept None)
+                    metadata = {k: v for k, v in metadata.items() if v is not None}
+                    counts["event"] += 1
+                    yield f"event_{doc_id}", content, metadata
             
-            # Chunk large CRM details (max 8000 chars per chunk)
-            max_chunk_size = 8000
-            for lead_id, crm_text, name, status in raw_crm:
-                if crm_text and len(crm_text) > max_chunk_size:
-                    # Split into chunks
-                    chunks = [crm_text[i:i+max_chunk_size] 
-                             for i in range(0, len(crm_text), max_chunk_size)]
-                    for chunk_idx, chunk in enumerate(chunks):
-                        raw_crm_documents.append((
-                            f"{lead_id}_crm_chunk_{chunk_idx}",
-                            lead_id,
-                            "raw_crm_conversation_details",
-                            chunk,
-                            name,
-                            status
-                        ))
-                elif crm_text:
-                    raw_crm_documents.append((
-                        f"{lead_id}_crm",
-                        lead_id,
-                        "raw_crm_conversation_details",
-                        crm_text,
-                        name,
-                        status
-                    ))
-            print(f"   Created {len(raw_crm_documents)} raw CRM chunks")
-        
-        # Get tasks if enabled
-        task_documents = []
-        if include_events:  # Use same flag as events
-            cursor.execute("""
-                SELECT lt.id, lt.lead_id, lt.description, lt.task_type, lt.status,
-                       lt.due_date, l.name, l.status as lead_status
-                FROM lead_tasks lt
-                JOIN leads l ON lt.lead_id = l.lead_id
-                WHERE lt.description IS NOT NULL 
-                  AND lt.description != ''
-                  AND LENGTH(lt.description) > 10
-            """)
-            tasks = cursor.fetchall()
-            print(f"   Found {len(tasks)} tasks to embed")
+            # Raw communication timeline and CRM conversation text
+            if include_raw_text:
+                raw_sources = [
+                    ("raw_timeline", "timeline", "raw_communication_timeline", """
+                        SELECT l.lead_id, l.communication_timeline, l.name, l.status
+                        FROM leads l
+                        WHERE l.communication_timeline IS NOT NULL 
+                          AND l.communication_timeline != ''
+                          AND LENGTH(l.communication_timeline) > 100
+                    """),
+                    ("raw_crm", "crm", "raw_crm_conversation_details", """
+                        SELECT l.lead_id, l.crm_conversation_details, l.name, l.status
+                        FROM leads l
+                        WHERE l.crm_conversation_details IS NOT NULL 
+                          AND l.crm_conversation_details != ''
+                          AND LENGTH(l.crm_conversation_details) > 50
+                    """)
+                ]
+                for source, id_suffix, chunk_type, sql in raw_sources:
+                    for chunk_id, lead_id, chunk_type, content, name, status in self._chunk_raw_text(
+                        conn.execute(sql), id_suffix, chunk_type, chunking_report
+                    ):
+                        metadata = {
+                            "chunk_id": str(chunk_id),
+                            "lead_id": str(lead_id) if lead_id else "",
+                            "chunk_type": str(chunk_type) if chunk_type else "",
+                            "lead_name": str(name) if name else "Unknown",
+                            "status": str(status) if status else "Unknown",
+                            "source": source
+                        }
+                        counts[source] += 1
+                        yield f"{source}_{chunk_id}", content, metadata
             
-            for task_id, lead_id, description, task_type, task_status, due_date, name, lead_status in tasks:
-                # Create task document with context
-                task_text = f"Task: {description}"
-                if task_type:
-                    task_text += f" | Type: {task_type}"
-                if task_status:
-                    task_text += f" | Status: {task_status}"
-                if due_date:
-                    task_text += f" | Due: {due_date}"
-                
-                task_documents.append((
-                    f"task_{task_id}",
-                    lead_id,
-                    "task",
-                    task_text,
-                    name,
-                    lead_status,
-                    task_status or "pending"
-                ))
-            print(f"   Created {len(task_documents)} task documents")
-        
-        # Combine all document types
-        all_documents = documents + event_documents
-        total_expected = len(all_documents) + len(raw_timeline_documents) + len(raw_crm_documents) + len(task_documents)
-        
-        if total_expected == 0:
-            print("   ⚠️  No documents found!")
+            # Tasks (same flag as events)
+            if include_events:
+                cursor = conn.execute("""
+                    SELECT lt.id, lt.lead_id, lt.description, lt.task_type, lt.status,
+                           lt.due_date, l.name, l.status as lead_status
+                    FROM lead_tasks lt
+                    JOIN leads l ON lt.lead_id = l.lead_id
+                    WHERE lt.description IS NOT NULL 
+                      AND lt.description != ''
+                      AND LENGTH(lt.description) > 10
+                """)
+                for task_id, lead_id, description, task_type, task_status, due_date, name, lead_status in cursor:
+                    # Create task document with context
+                    task_text = f"Task: {description}"
+                    if task_type:
+                        task_text += f" | Type: {task_type}"
+                    if task_status:
+                        task_text += f" | Status: {task_status}"
+                    if due_date:
+                        task_text += f" | Due: {due_date}"
+                    
+                    chunk_id = f"task_{task_id}"
+                    metadata = {
+                        "chunk_id": chunk_id,
+                        "lead_id": str(lead_id) if lead_id else "",
+                        "chunk_type": "task",
+                        "lead_name": str(name) if name else "Unknown",
+                        "status": str(lead_status) if lead_status else "Unknown",
+                        "task_status": str(task_status) if task_status else "pending",
+                        "source": "task"
+                    }
+                    counts["task"] += 1
+                    yield f"task_{chunk_id}", task_text, metadata
+        finally:
             conn.close()
-            return
+    
+    @staticmethod
+    def _chunk_raw_text(
+        rows: Iterable[tuple],
+        id_suffix: str,
+        chunk_type: str,
+        report: Optional[ChunkingReport] = None
+    ) -> Iterator[tuple]:
+        """
+        Chunk raw conversation text on message boundaries
         
-        # Check if already embedded
-        # If including raw text, check if we need to add it
-        existing_count = self.collection.count()
+        Args:
+            rows: (lead_id, text, name, status) tuples (e.g. a cursor)
+            id_suffix: Chunk id suffix ("timeline" or "crm")
+            chunk_type: chunk_type stored in metadata
+            report: Accumulates chunk/token totals against character slicing (optional)
         
+        Yields:
+            (chunk_id, lead_id, chunk_type, content, name, status) tuples
+        """
+        for lead_id, text, name, status in rows:
+            if not text:
+                continue
+            chunks = list(chunk_text(text, RAW_TEXT_CHUNK_TOKENS, RAW_TEXT_OVERLAP_TOKENS, EMBEDDING_MODEL))
+            if report is not None:
+                report.add(text, chunks)
+            if len(chunks) == 1:
+                yield f"{lead_id}_{id_suffix}", lead_id, chunk_type, chunks[0], name, status
+                continue
+            for chunk_idx, chunk in enumerate(chunks):
+                yield f"{lead_id}_{id_suffix}_chunk_{chunk_idx}", lead_id, chunk_type, chunk, name, status
+    
+    @staticmethod
+    def _included_sources(include_events: bool, include_raw_text: bool) -> set:
+        """Document sources (metadata 'source') covered by a sync"""
+        sources = {"summary"}
+        if include_events:
+            sources |= {"event", "task"}
         if include_raw_text:
-            # Check if raw text sources exist and are already embedded
-            # We'll proceed if embeddings are significantly less than expected
-            if existing_count < total_expected * 0.8:
-                print(f"   ℹ️  Current embeddings: {existing_count}, Expected with raw text: {total_expected}")
-                print(f"   ℹ️  Will add raw timeline ({len(raw_timeline_documents)} chunks) and CRM ({len(raw_crm_documents)} chunks)")
-            elif existing_count >= total_expected * 0.9:
-                print(f"   ✅ Already embedded {existing_count} documents (approx {total_expected} expected)")
-                conn.close()
-                return
-        else:
-            # If not including raw text, use original logic
-            if existing_count >= len(all_documents) * 0.9:  # Allow 10% variance
-                print(f"   ✅ Already embedded {existing_count} documents (approx {len(all_documents)} expected)")
-            conn.close()
+            sources |= {"raw_timeline", "raw_crm"}
+        return sources
+    
+    def _reconcile_manifest(self) -> None:
+        """
+        Make the manifest describe what is actually in the collection
+        
+        Only runs when the manifest and collection sizes differ. Manifest rows
+        whose document is gone from the collection are dropped (they will be
+        re-upserted). Collection documents the manifest doesn't know about -
+        e.g. on the first run after upgrading, or after a crash between upsert
+        and checkpoint - are hashed from their stored content and adopted, so
+        they are only re-embedded if they actually changed. Both sides are
+        walked in pages of SYNC_BATCH_SIZE ids.
+        """
+        if len(self.manifest) == self.collection.count():
             return
         
-        # Prepare batch data
-        ids = []
-        texts = []
-        metadatas = []
+        vanished = 0
+        for page in self.manifest.iter_ids(SYNC_BATCH_SIZE):
+            present = set(self.collection.get(ids=page, include=[]).get('ids') or [])
+            missing = [doc_id for doc_id in page if doc_id not in present]
+            if missing:
+                self.manifest.forget(missing)
+                vanished += len(missing)
         
-        # Process summary documents
-        for doc_id, lead_id, chunk_type, content, metadata_json, name, status in documents:
-            ids.append(f"doc_{doc_id}")
-            texts.append(content)
-            
-            metadata = json.loads(metadata_json) if metadata_json else {}
-            metadata.update({
-                "doc_id": str(doc_id) if doc_id else "",
-                "lead_id": str(lead_id) if lead_id else "",
-                "chunk_type": str(chunk_type) if chunk_type else "",
-                "lead_name": str(name) if name else "Unknown",
-                "status": str(status) if status else "Unknown",
-                "source": "summary"
-            })
-            # Remove None values (ChromaDB doesn't accept None)
-            metadata = {k: v for k, v in metadata.items() if v is not None}
-            metadatas.append(metadata)
-        
-        # Process event documents
-        for doc_id, lead_id, doc_type, content, metadata_json, name, status in event_documents:
-            ids.append(f"event_{doc_id}")
-            texts.append(content)
-            
-            metadata = json.loads(metadata_json) if metadata_json else {}
-            metadata.update({
-                "doc_id": str(doc_id) if doc_id else "",
-                "lead_id": str(lead_id) if lead_id else "",
-                "chunk_type": str(doc_type) if doc_type else "",
-                "lead_name": str(name) if name else "Unknown",
-                "status": str(status) if status else "Unknown",
-                "source": "event"
-            })
-            # Remove None values (ChromaDB doesn't accept None)
-            metadata = {k: v for k, v in metadata.items() if v is not None}
-            metadatas.append(metadata)
-        
-        # Process raw timeline documents
-        for chunk_id, lead_id, chunk_type, content, name, status in raw_timeline_documents:
-            ids.append(f"raw_timeline_{chunk_id}")
-            texts.append(content)
+        adopted = 0
+        offset = 0
+        while True:
+            stored = self.collection.get(limit=SYNC_BATCH_SIZE, offset=offset, include=["documents", "metadatas"])
+            if not stored['ids']:
+                break
+            offset += len(stored['ids'])
+            known = self.manifest.lookup(stored['ids'])
+            entries = []
+            for doc_id, text, metadata in zip(stored['ids'], stored['documents'], stored['metadatas']):
+                if doc_id in known:
+                    continue
+                metadata = metadata or {}
+                entries.append((doc_id, metadata.get("source", "unknown"), document_hash(text or "", metadata)))
+            if entries:
+                self.manifest.record(entries)
+                adopted += len(entries)
+        
+        if vanished or adopted:
+            print(f"   ℹ️  Sync manifest reconciled with the collection: "
+                  f"{adopted} documents adopted, {vanished} missing documents dropped")
+    
+    def sync_documents(
+        self,
+        documents: Iterable[Tuple[str, str, Dict[str, Any]]],
+        sources: set
+    ) -> Dict[str, int]:
+        """
+        Bring the collection in line with a stream of documents
+        
+        Documents are checked against the sync manifest in groups of
+        SYNC_BATCH_SIZE as they arrive; only new or changed ones go to the
+        embedding pipeline, and unchanged ones are stamped as seen. Each
+        upserted batch is checkpointed in the manifest, so an interrupted sync
+        resumes with the documents that were not written yet. Once the stream
+        is exhausted, manifest entries of the included sources that this run
+        did not see are deleted from the collection. The lexical index is
+        kept in step: every group is indexed there (unchanged documents are
+        skipped by content hash) and its stale documents are removed too.
+        
+        Args:
+            documents: (doc_id, text, metadata) tuples; metadata must include 'source'
+            sources: Sources this sync is authoritative for
             
-            metadata = {
-                "chunk_id": str(chunk_id),
-                "lead_id": str(lead_id) if lead_id else "",
-                "chunk_type": str(chunk_type) if chunk_type else "",
-                "lead_name": str(name) if name else "Unknown",
-                "status": str(status) if status else "Unknown",
-                "source": "raw_timeline"
-            }
-            # Remove None values
-            metadata = {k: v for k, v in metadata.items() if v is not None}
-            metadatas.append(metadata)
-        
-        # Process raw CRM documents
-        for chunk_id, lead_id, chunk_type, content, name, status in raw_crm_documents:
-            ids.append(f"raw_crm_{chunk_id}")
-            texts.append(content)
+        Returns:
+            Dict with 'upserted', 'deleted' and 'unchanged' counts
+        """
+        self._reconcile_manifest()
+        run_id = self.manifest.begin_run()
+        plan = {"changed": 0, "unchanged": 0}
+        
+        def changed_documents() -> Iterator[Tuple[tuple, str]]:
+            """Filter the stream down to new/changed documents (runs on this thread)"""
+            group = []
             
-            metadata = {
-                "chunk_id": str(chunk_id),
-                "lead_id": str(lead_id) if lead_id else "",
-                "chunk_type": str(chunk_type) if chunk_type else "",
-                "lead_name": str(name) if name else "Unknown",
-                "status": str(status) if status else "Unknown",
-                "source": "raw_crm"
-            }
-            # Remove None values
-            metadata = {k: v for k, v in metadata.items() if v is not None}
-            metadatas.append(metadata)
-        
-        # Process task documents
-        for chunk_id, lead_id, chunk_type, content, name, status, task_status in task_documents:
-            ids.append(f"task_{chunk_id}")
-            texts.append(content)
+            def flush():
+                self.lexical_index.upsert(group, run_id)
+                recorded = self.manifest.lookup([doc_id for doc_id, _, _, _ in group])
+                seen = []
+                for doc_id, text, metadata, content_hash in group:
+                    if recorded.get(doc_id) == content_hash:
+                        seen.append(doc_id)
+                    else:
+                        yield (doc_id, text, metadata, content_hash), text
+                self.manifest.mark_seen(seen, run_id)
+                plan["unchanged"] += len(seen)
+                plan["changed"] += len(group) - len(seen)
             
-            metadata = {
-                "chunk_id": str(chunk_id),
-                "lead_id": str(lead_id) if lead_id else "",
-                "chunk_type": str(chunk_type) if chunk_type else "",
-                "lead_name": str(name) if name else "Unknown",
-                "status": str(status) if status else "Unknown",
-                "task_status": str(task_status) if task_status else "pending",
-                "source": "task"
-            }
-            # Remove None values
-            metadata = {k: v for k, v in metadata.items() if v is not None}
-            metadatas.append(metadata)
-        
-        print(f"   📊 Embedding {len(texts)} documents (in batches)...")
-        print(f"      - {len(documents)} summaries")
-        print(f"      - {len(event_documents)} events")
-        print(f"      - {len(raw_timeline_documents)} raw timeline chunks")
-        print(f"      - {len(raw_crm_documents)} raw CRM chunks")
-        print(f"      - {len(task_documents)} tasks")
-        
-        # Generate embeddings in batches (to avoid API limits)
-        batch_size = 100
-        total_embedded = 0
+            for doc_id, text, metadata in documents:
+                group.append((doc_id, text, metadata, document_hash(text, metadata)))
+                if len(group) >= SYNC_BATCH_SIZE:
+                    yield from flush()
+                    group = []
+            if group:
+                yield from flush()
         
+        # Embed changed documents through the concurrent pipeline; this thread
+        # reads the stream and is the single writer, upserting and
+        # checkpointing each finished batch
+        store_before = self.embedding_store.get_stats()
+        written = 0
+        
+        def write_batch(batch: List[tuple], embeddings_list: List[List[float]]):
+            nonlocal written
+            self.collection.upsert(
+                ids=[doc_id for doc_id, _, _, _ in batch],
+                embeddings=embeddings_list,
+                documents=[text for _, text, _, _ in batch],
+                metadatas=[metadata for _, _, metadata, _ in batch]
+            )
+            # Checkpoint: these documents are now in the collection
+            self.manifest.record(
+                [(doc_id, metadata.get("source", "unknown"), content_hash) for doc_id, _, metadata, content_hash in batch],
+                run_id=run_id
+            )
+            written += len(batch)
+        
+        def report_progress(stats: Dict[str, Any]):
+            print(f"   ✅ Embedded {stats['documents']} documents "
+                  f"({stats['docs_per_second']} docs/s, {stats['tokens_per_second']} tokens/s)")
+        
+        pipeline = EmbeddingPipeline(
+            lambda batch: self.embedding_store.embed_documents(batch, self.embeddings.embed_documents),
+            model=EMBEDDING_MODEL,
+            concurrency=EMBEDDING_CONCURRENCY,
+            # Match the client's own request chunking so a batch is one API call
+            max_batch_inputs=getattr(self.embeddings, "chunk_size", None) or MAX_BATCH_INPUTS
+        )
         try:
-            for i in range(0, len(texts), batch_size):
-                batch_ids = ids[i:i+batch_size]
-                batch_texts = texts[i:i+batch_size]
-                batch_metadatas = metadatas[i:i+batch_size]
-                
-                print(f"   📦 Processing batch {i//batch_size + 1}/{(len(texts)-1)//batch_size + 1}...")
-                
-                embeddings_list = self.embeddings.embed_documents(batch_texts)
-                
-                # Check for existing IDs and update instead of add
-                existing_ids = set()
-                try:
-                    # Get existing IDs in this batch
-                    existing = self.collection.get(ids=batch_ids)
-                    if existing and existing.get('ids'):
-                        existing_ids = set(existing['ids'])
-                except:
-                    # IDs don't exist, proceed with add
-                    pass
-                
-                # Separate new and existing
-                new_ids = []
-                new_embeddings = []
-                new_documents = []
-                new_metadatas = []
-                
-                update_ids = []
-                update_embeddings = []
-                update_documents = []
-                update_metadatas = []
-                
-                for idx, doc_id in enumerate(batch_ids):
-                    if doc_id in existing_ids:
-                        update_ids.append(doc_id)
-                        update_embeddings.append(embeddings_list[idx])
-                        update_documents.append(batch_texts[idx])
-                        update_metadatas.append(batch_metadatas[idx])
-                    else:
-                        new_ids.append(doc_id)
-                        new_embeddings.append(embeddings_list[idx])
-                        new_documents.append(batch_texts[idx])
-                        new_metadatas.append(batch_metadatas[idx])
-                
-                # Add new documents
-                if new_ids:
-                    self.collection.add(
-                        ids=new_ids,
-                        embeddings=new_embeddings,
-                        documents=new_documents,
-                        metadatas=new_metadatas
-                    )
-                
-                # Update existing documents
-                if update_ids:
-                    self.collection.update(
-                        ids=update_ids,
-                        embeddings=update_embeddings,
-                        documents=update_documents,
-                        metadatas=update_metadatas
-                    )
-                
-                total_embedded += len(batch_texts)
-                print(f"   ✅ Embedded {total_embedded}/{len(texts)} documents")
-            
-            print(f"   ✅ Successfully embedded {total_embedded} documents")
-            
+            throughput = pipeline.run_stream(changed_documents(), write_batch, progress=report_progress)
         except Exception as e:
-            print(f"   ❌ Error creating embeddings: {str(e)}")
+            print(f"   ❌ Error creating embeddings: {str(e)} "
+                  f"({written} documents checkpointed; re-run to resume)")
             raise
         
-        conn.close()
+        # Remove documents whose source rows no longer exist (an empty stream
+        # more likely means a wrong database than an emptied one)
+        deleted = 0
+        if plan["changed"] or plan["unchanged"]:
+            for page in self.manifest.iter_stale(sources, run_id, SYNC_BATCH_SIZE):
+                self.collection.delete(ids=page)
+                self.manifest.forget(page)
+                deleted += len(page)
+            self.lexical_index.remove_stale(sources, run_id)
+        
+        store_after = self.embedding_store.get_stats()
+        reused = store_after['hits'] - store_before['hits']
+        via_api = store_after['misses'] - store_before['misses']
+        print(f"   📊 Sync: {plan['changed']} new/changed, {deleted} stale, {plan['unchanged']} unchanged")
+        print(f"   ✅ Sync complete: {written} upserted, {deleted} deleted "
+              f"({reused} embeddings reused from the embedding store, {via_api} via API)")
+        if written:
+            print(f"   ⏱️  {throughput['seconds']}s, {throughput['docs_per_second']} docs/s, "
+                  f"{throughput['tokens_per_second']} tokens/s over {throughput['batches']} batches")
+        
+        return {"upserted": written, "deleted": deleted, "unchanged": plan["unchanged"]}
     
-    def semantic_search(self, query: str, n_results: int = 5, filter_dict: Dict = None) -> List[Dict]:
-        """Perform semantic search on lead conversations with error handling"""
-        if not query or not isinstance(query, str) or len(query.strip()) == 0:
-            return []
+
+    def _embed_queries(self, queries: List[str], timeout: float = None) -> List[List[float]]:
+        """
+        Embed search queries, reusing cached embeddings for repeated queries
         
-        if n_results < 1 or n_results > 100:
-            n_results = min(max(1, n_results), 100)  # Clamp between 1 and 100
+        All queries missing from the cache are embedded in a single API
+        request. A single missing query goes through the cache's single-flight
+        fill, so concurrent misses on the same query share one API call. With
+        a timeout, raises TimeoutError if the embeddings are not ready in
+        time; the call keeps running in the background and fills the cache.
+        """
+        normalized = list(dict.fromkeys(normalize_search_query(query) for query in queries))
         
-        # Check if embeddings need to be created
+        def lookup() -> Dict[str, np.ndarray]:
+            if len(normalized) == 1:
+                text = normalized[0]
+                return {text: _query_embedding_cache.get_or_compute(
+                    f"embedding:{EMBEDDING_MODEL}:{text}",
+                    lambda: np.asarray(self.embeddings.embed_query(text), dtype=np.float32),
+                    namespace=EMBEDDING_MODEL
+                )}
+            
+            vectors = {text: _query_embedding_cache.get(f"embedding:{EMBEDDING_MODEL}:{text}") for text in normalized}
+            missing = [text for text, vector in vectors.items() if vector is None]
+            if missing:
+                embedded = self.embeddings.embed_documents(missing)
+                for text, vector in zip(missing, embedded):
+                    vector = np.asarray(vector, dtype=np.float32)
+                    _query_embedding_cache.set(f"embedding:{EMBEDDING_MODEL}:{text}", vector, namespace=EMBEDDING_MODEL)
+                    vectors[text] = vector
+            return vectors
+        
+        if timeout is None:
+            vectors = lookup()
+        else:
+            try:
+                vectors = _query_embedding_executor.submit(lookup).result(timeout=timeout)
+            except FutureTimeoutError:
+                raise TimeoutError(f"Query embedding took longer than {timeout}s")
+        # Embeddings promoted from the disk tier come back as lists
+        return [np.asarray(vectors[normalize_search_query(query)], dtype=np.float32).tolist() for query in queries]
+    
+    def _embed_query(self, query: str, timeout: float = None) -> List[float]:
+        """Embed one search query (see _embed_queries)"""
+        return self._embed_queries([query], timeout)[0]
+    
+    @staticmethod
+    def get_query_embedding_stats() -> Dict[str, Any]:
+        """Get query-embedding cache statistics (hits, misses, hit_rate, size)"""
+        stats = _query_embedding_cache.get_stats()
+        return {key: stats[key] for key in ("size", "max_size", "hits", "misses", "hit_rate", "bytes")}
+    
+    @staticmethod
+    def _is_keyword_query(query: str) -> bool:
+        """Whether a query looks like a keyword lookup ("wifi", "guarantor deposit") rather than a question"""
+        words = re.findall(r"\w+", query)
+        return 0 < len(words) <= AUTO_LEXICAL_MAX_WORDS and "?" not in query
+    
+    def _vector_search_many(
+        self,
+        query_embeddings: List[List[float]],
+        n_results: int,
+        filter_dict: Dict = None
+    ) -> List[List[Dict]]:
+        """Nearest neighbours of several query embeddings in one collection query"""
+        results = self.collection.query(
+            query_embeddings=query_embeddings,
+            n_results=n_results,
+            where=filter_dict if filter_dict else None
+        )
+        
+        # Format results (one list per query embedding)
+        formatted_results = []
+        for q in range(len(query_embeddings)):
+            formatted = []
+            if results and results.get('documents') and len(results['documents']) > q:
+                for i in range(len(results['documents'][q])):
+                    formatted.append({
+                        'id': results['ids'][q][i] if results.get('ids') else None,
+                        'content': results['documents'][q][i],
+                        'metadata': results['metadatas'][q][i] if results.get('metadatas') else {},
+                        'distance': results['distances'][q][i] if results.get('distances') else None,
+                        'retrieval': "vector"
+                    })
+            formatted_results.append(formatted)
+        return formatted_results
+    
+    def _ensure_collection(self) -> bool:
+        """Create embeddings if the collection is empty; False if that failed"""
         try:
             collection_count = self.collection.count()
             if collection_count == 0:
@@ -427,7 +701,7 @@ class LeadRAGSystem:
                     print("✅ Embeddings created successfully")
                 except Exception as e:
                     print(f"❌ Failed to create embeddings: {str(e)}")
-                    return []
+                    return False
         except Exception as e:
             # If count() fails, collection might be new, try to create embeddings
             print(f"⚠️  Could not check collection count: {str(e)}")
@@ -435,60 +709,159 @@ class LeadRAGSystem:
                 self.create_embeddings(include_events=True, include_raw_text=True)
             except Exception as embed_error:
                 print(f"❌ Failed to create embeddings: {str(embed_error)}")
-                return []
+                return False
+        return True
+    
+    def semantic_search(
+        self,
+        query: str,
+        n_results: int = 5,
+        filter_dict: Dict = None,
+        mode: str = None
+    ) -> List[Dict]:
+        """
+        Search lead conversations with error handling
+        
+        Args:
+            query: Search text
+            n_results: Maximum results (1-100)
+            filter_dict: Optional metadata filter (Chroma where syntax)
+            mode: "vector" (embeddings), "lexical" (BM25 only, no embedding
+                call), "hybrid" (both, fused with reciprocal rank fusion) or
+                "auto" (lexical for keyword queries with enough hits, else
+                hybrid); defaults to DEFAULT_SEARCH_MODE
+        
+        Returns:
+            List of dicts with 'id', 'content', 'metadata', 'distance' and
+            'retrieval' (plus 'bm25' / 'rrf_score' where applicable). If the
+            query embedding is unavailable or slower than
+            EMBEDDING_TIMEOUT_SECONDS, lexical results are returned instead,
+            with 'retrieval' FALLBACK_RETRIEVAL.
+        """
+        return self.semantic_search_many([query], n_results, filter_dict, mode)[0]
+    
+    def semantic_search_many(
+        self,
+        queries: List[str],
+        n_results: int = 5,
+        filter_dict: Dict = None,
+        mode: str = None
+    ) -> List[List[Dict]]:
+        """
+        Run several searches with one embedding request and one collection query
+        
+        Queries missing from the query-embedding cache are embedded together,
+        and all embeddings are searched in a single multi-embedding query.
+        Arguments and per-query results are as in semantic_search.
+        
+        Returns:
+            One result list per query, in input order (empty for blank queries)
+        """
+        results: List[List[Dict]] = [[] for _ in queries]
+        
+        if n_results < 1 or n_results > 100:
+            n_results = min(max(1, n_results), 100)  # Clamp between 1 and 100
+        
+        mode = (mode or DEFAULT_SEARCH_MODE).lower()
+        if mode not in SEARCH_MODES:
+            print(f"⚠️  Unknown search mode '{mode}', using '{DEFAULT_SEARCH_MODE}'")
+            mode = DEFAULT_SEARCH_MODE
+        depth = max(n_results, HYBRID_CANDIDATES) if mode in ("hybrid", "auto") else n_results
+        if mode != "vector" and not self._lexical_index_checked:
+            self._lexical_index_checked = True
+            if not self.lexical_index.count():
+                print(f"⚠️  Lexical index is empty: '{mode}' search has no BM25 results until embeddings are synced")
+        
+        # Lexical answers first; the rest need query embeddings
+        lexical_results: Dict[int, List[Dict]] = {}
+        pending = []
+        for position, query in enumerate(queries):
+            if not query or not isinstance(query, str) or len(query.strip()) == 0:
+                continue
+            if mode == "lexical":
+                results[position] = self.lexical_index.search(query, n_results, filter_dict)
+                continue
+            if mode == "auto" and self._is_keyword_query(query):
+                lexical_results[position] = self.lexical_index.search(query, depth, filter_dict)
+                if len(lexical_results[position]) >= n_results:
+                    results[position] = lexical_results[position][:n_results]
+                    continue
+            pending.append(position)
+        if not pending:
+            return results
+        if mode == "auto":
+            mode = "hybrid"
+        
+        def lexical_fallback() -> List[List[Dict]]:
+            for position in pending:
+                found = lexical_results.get(position)
+                if found is None:
+                    found = self.lexical_index.search(queries[position], n_results, filter_dict)
+                results[position] = [{**result, 'retrieval': FALLBACK_RETRIEVAL} for result in found[:n_results]]
+            return results
+        
+        if not self._ensure_collection():
+            return lexical_fallback()
         
+        # Validate API key
+        if not os.getenv("OPENAI_API_KEY"):
+            print("⚠️  OpenAI API key not configured. Using lexical search.")
+            return lexical_fallback()
+        
+        # Query embeddings (cached for repeated queries); lexical fast path
+        # when the embedding API is slow or failing
         try:
-            # Validate API key
-            if not os.getenv("OPENAI_API_KEY"):
-                print("⚠️  OpenAI API key not configured. Semantic search unavailable.")
-                return []
-            
-            # Generate query embedding with retry
-            max_retries = 3
-            query_embedding = None
-            for attempt in range(max_retries):
-                try:
-                    query_embedding = self.embeddings.embed_query(query)
-                    break
-                except Exception as e:
-                    if attempt < max_retries - 1:
-                        import time
-                        time.sleep(1 * (attempt + 1))  # Exponential backoff
-                        continue
-                    else:
-                        raise
-            
-            if not query_embedding:
-                return []
-            
-            # Search ChromaDB
-            results = self.collection.query(
-                query_embeddings=[query_embedding],
-                n_results=n_results,
-                where=filter_dict if filter_dict else None
+            query_embeddings = self._embed_queries(
+                [queries[position] for position in pending], timeout=EMBEDDING_TIMEOUT_SECONDS
             )
-            
-            # Format results
-            formatted_results = []
-            if results and results.get('documents') and len(results['documents']) > 0:
-                for i in range(len(results['documents'][0])):
-                    formatted_results.append({
-                        'content': results['documents'][0][i],
-                        'metadata': results['metadatas'][0][i] if results.get('metadatas') else {},
-                        'distance': results['distances'][0][i] if results.get('distances') else None
-                    })
-            
-            return formatted_results
-            
+        except TimeoutError:
+            print(f"⚠️  Query embedding exceeded {EMBEDDING_TIMEOUT_SECONDS}s. Using lexical search.")
+            return lexical_fallback()
         except Exception as e:
             error_msg = str(e).lower()
             if "rate limit" in error_msg or "429" in error_msg:
-                print("⚠️  API rate limit exceeded. Please wait a moment and try again.")
+                print("⚠️  API rate limit exceeded. Using lexical search.")
             elif "authentication" in error_msg or "401" in error_msg:
-                print("⚠️  API authentication failed. Please check your API key.")
+                print("⚠️  API authentication failed. Please check your API key. Using lexical search.")
             else:
-                print(f"❌ Error in semantic search: {str(e)}")
-            return []
+                print(f"❌ Error embedding query: {str(e)}. Using lexical search.")
+            return lexical_fallback()
+        
+        try:
+            vector_results = self._vector_search_many(query_embeddings, depth, filter_dict)
+        except Exception as e:
+            print(f"❌ Error in semantic search: {str(e)}")
+            return lexical_fallback() if mode == "hybrid" else results
+        
+        for position, found in zip(pending, vector_results):
+            if mode == "vector":
+                results[position] = found
+                continue
+            lexical = lexical_results.get(position)
+            if lexical is None:
+                lexical = self.lexical_index.search(queries[position], depth, filter_dict)
+            results[position] = reciprocal_rank_fusion([found, lexical])[:n_results]
+        return results
+    
+    async def asemantic_search(
+        self,
+        query: str,
+        n_results: int = 5,
+        filter_dict: Dict = None,
+        mode: str = None
+    ) -> List[Dict]:
+        """Async semantic_search; runs in a worker thread so the event loop stays free"""
+        return await asyncio.to_thread(self.semantic_search, query, n_results, filter_dict, mode)
+    
+    async def asemantic_search_many(
+        self,
+        queries: List[str],
+        n_results: int = 5,
+        filter_dict: Dict = None,
+        mode: str = None
+    ) -> List[List[Dict]]:
+        """Async semantic_search_many; runs in a worker thread so the event loop stays free"""
+        return await asyncio.to_thread(self.semantic_search_many, queries, n_results, filter_dict, mode)
     
     def search_by_lead_status(self, query: str, status: str, n_results: int = 5) -> List[Dict]:
         """Search within specific lead status"""
@@ -514,11 +887,16 @@ class LeadRAGSystem:
             filter_dict={"chunk_type": "objections_and_concerns"}
         )
     
+    def index_version(self) -> Optional[tuple]:
+        """Version of the indexed documents (changes whenever a sync writes or removes any)"""
+        return self.manifest.version()
+    
     def get_stats(self):
         """Get RAG system statistics"""
         return {
             "total_documents": self.collection.count(),
-            "collection_name": self.collection.name
+            "collection_name": self.collection.name,
+            "vector_backend": self.vector_backend
         }
 
 
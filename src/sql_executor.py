@@ -5,9 +5,16 @@ Safe SQL query execution with validation and error handling
 
 import sqlite3
 import json
-from typing import Dict, Any, Optional, List
+import re
+import asyncio
+from concurrent.futures import ThreadPoolExecutor, wait
+from functools import lru_cache, partial
+from typing import Dict, Any, Optional, List, Tuple
 import os
 import sys
+import time
+import threading
+from pathlib import Path
 
 # Add error handling utilities
 sys.path.insert(0, os.path.dirname(__file__))
@@ -21,9 +28,20 @@ try:
                 return func
     
     try:
-        from connection_pool import get_connection_pool
+        from connection_pool import get_connection_pool, open_read_only_connection, is_connection_error
     except (ImportError, KeyError):
-        def get_connection_pool(db_path, max_connections=5):
+        def is_connection_error(error):
+            return False
+        def get_connection_pool(db_path, max_connections=5, **kwargs):
+            return None
+        def open_read_only_connection(db_path, profile=None, **kwargs):
+            return sqlite3.connect(Path(db_path).resolve().as_uri() + "?mode=ro", uri=True, **kwargs)
+    
+    try:
+        from query_cache import QueryCache, get_disk_cache
+    except (ImportError, KeyError):
+        QueryCache = None
+        def get_disk_cache(path=None):
             return None
 except Exception:
     # Complete fallback
@@ -31,21 +49,264 @@ except Exception:
         @staticmethod
         def handle_database_error(func):
             return func
-    def get_connection_pool(db_path, max_connections=5):
+    def get_connection_pool(db_path, max_connections=5, **kwargs):
+        return None
+    def open_read_only_connection(db_path, profile=None, **kwargs):
+        return sqlite3.connect(Path(db_path).resolve().as_uri() + "?mode=ro", uri=True, **kwargs)
+    def is_connection_error(error):
+        return False
+    QueryCache = None
+    def get_disk_cache(path=None):
         return None
 
 
+# Per-connection prepared statement cache size (sqlite3 default is 128).
+# Normalized LLM SQL repeats heavily, so a larger cache keeps repeats prepared.
+STATEMENT_CACHE_SIZE = 256
+
+# Tuning profile for executor connections (see connection_pool.TUNING_PROFILES).
+# Overridden by the SQL_CONNECTION_PROFILE environment variable, e.g. with the
+# winner of "python src/connection_pool.py --benchmark".
+CONNECTION_PROFILE = "read_heavy_analytics"
+CONNECTION_PROFILE_ENV_VAR = "SQL_CONNECTION_PROFILE"
+
+# VM instructions between progress-handler callbacks. Each callback is a
+# Python call, so this is kept coarse (~0.1ms of VM work) to stay cheap.
+PROGRESS_HANDLER_INTERVAL = 10000
+
+# Budget for the EXPLAIN QUERY PLAN attached to 'budget exceeded' errors
+EXPLAIN_PROGRESS_INTERVAL = 100
+EXPLAIN_MAX_VM_STEPS = 100000
+EXPLAIN_MAX_SECONDS = 0.5
+
+# Share of the query budget after which a truncated page skips counting its
+# total and reports a lower bound (the page itself is already done)
+COUNT_BUDGET_FRACTION = 0.5
+
+# Memo size for normalization / validation results (keyed by SQL text)
+NORMALIZATION_MEMO_SIZE = 1024
+
+# Result cache defaults. Entries are invalidated by the database's data
+# version, so the TTL is only a backstop for very long-lived processes.
+RESULT_CACHE_SIZE = 256
+RESULT_CACHE_TTL = 3600
+
+# How long (seconds) a data version reading is trusted. Writes come from
+# ingestion runs, so a result may be served from cache for up to this long
+# after a commit; in exchange, hot paths skip the stat calls and PRAGMA.
+VERSION_CHECK_INTERVAL = 0.25
+
+# Tokenizer used by normalize_query. Order matters: comments and quoted
+# literals/identifiers are matched first so their contents are never rewritten.
+_SQL_TOKEN_RE = re.compile(
+    r"""
+    (?P<comment>--[^\n]*|/\*.*?\*/)
+    |(?P<string>'(?:[^']|'')*')
+    |(?P<ident>"(?:[^"]|"")*"|`[^`]*`|\[[^\]]*\])
+    |(?P<ws>\s+)
+    |(?P<other>[^\s'"`\[/-]+|.)
+    """,
+    re.VERBOSE | re.DOTALL
+)
+
+# Non-deterministic SQL: results depend on the clock or on randomness, not
+# only on the data, so they are never cached. Date/time functions read the
+# clock when given 'now' (or, for most of them, no arguments at all).
+_VOLATILE_SQL_RE = re.compile(
+    r"\b(?:random|randomblob|changes|total_changes|last_insert_rowid)\s*\("
+    r"|\b(?:date|time|datetime|julianday|unixepoch)\s*\(\s*\)"
+    r"|\bcurrent_(?:timestamp|date|time)\b",
+    re.IGNORECASE
+)
+
+# Statements the executor accepts. Safety itself is enforced by the engine:
+# executor connections are opened read-only with a read-only authorizer.
+_READ_STATEMENT_PREFIXES = ('SELECT', 'WITH')
+
+
+@lru_cache(maxsize=NORMALIZATION_MEMO_SIZE)
+def normalize_query(query: str) -> str:
+    """
+    Normalize a SQL query so trivially different texts share one cache key
+    
+    Collapses whitespace, drops comments and a trailing semicolon. Literals,
+    identifiers and keyword case are left exactly as written, so the
+    normalized statement plans and names its columns like the original
+    (literal values still reach the planner for partial indexes and the
+    LIKE prefix optimization).
+    
+    Args:
+        query: Raw SQL text
+        
+    Returns:
+        Normalized SQL text
+    """
+    parts = []
+    for match in _SQL_TOKEN_RE.finditer(query):
+        if match.lastgroup in ('ws', 'comment'):
+            if parts and parts[-1] != ' ':
+                parts.append(' ')
+            continue
+        parts.append(match.group())
+    
+    normalized = ''.join(parts).strip()
+    if normalized.endswith(';'):
+        normalized = normalized[:-1].rstrip()
+    return normalized
+
+
+@lru_cache(maxsize=NORMALIZATION_MEMO_SIZE)
+def _check_query_safety(normalized_query: str) -> Tuple[bool, Optional[str]]:
+    """
+    Cheap pre-check on normalized SQL; repeats are served from the memo
+    
+    Writes are rejected by the read-only connection and authorizer, so this
+    only turns obviously non-read statements into a friendly message before
+    they reach the database.
+    """
+    if not normalized_query.upper().startswith(_READ_STATEMENT_PREFIXES):
+        return False, "Only read-only SELECT (or WITH ... SELECT) queries are allowed"
+    return True, None
+
+
+@lru_cache(maxsize=NORMALIZATION_MEMO_SIZE)
+def is_deterministic_query(normalized_query: str) -> bool:
+    """
+    Whether a query's result depends only on the data (and so may be cached)
+    
+    False for queries calling random()/changes()-style functions, reading
+    CURRENT_TIMESTAMP/CURRENT_DATE/CURRENT_TIME, or passing 'now' to a
+    date/time function. Quoted literals and identifiers are only checked for
+    'now', so a column named "random" is not mistaken for a call.
+    """
+    code = []
+    for match in _SQL_TOKEN_RE.finditer(normalized_query):
+        if match.lastgroup == 'string':
+            if match.group()[1:-1].strip().lower() == 'now':
+                return False
+            code.append("''")
+        elif match.lastgroup == 'ident':
+            code.append('""')
+        elif match.lastgroup != 'comment':
+            code.append(match.group())
+    return _VOLATILE_SQL_RE.search(''.join(code)) is None
+
+
+class _QueryBudget:
+    """Progress-handler callback that interrupts a statement once it exceeds its budget"""
+    
+    def __init__(
+        self,
+        max_vm_steps: Optional[int],
+        max_seconds: Optional[float],
+        interval: int = PROGRESS_HANDLER_INTERVAL
+    ):
+        self.max_vm_steps = max_vm_steps
+        self.interval = interval
+        self.max_seconds = max_seconds
+        self.started = time.monotonic()
+        self.deadline = self.started + max_seconds if max_seconds is not None else None
+        self.vm_steps = 0
+        self.exceeded: Optional[str] = None  # 'vm_steps' or 'time' once interrupted
+    
+    def __call__(self) -> int:
+        self.vm_steps += self.interval
+        if self.max_vm_steps is not None and self.vm_steps > self.max_vm_steps:
+            self.exceeded = "vm_steps"
+            return 1
+        if self.deadline is not None and time.monotonic() > self.deadline:
+            self.exceeded = "time"
+            return 1
+        return 0
+    
+    def elapsed(self) -> float:
+        return time.monotonic() - self.started
+    
+    def used_fraction(self) -> float:
+        """Share of the budget used so far (the larger of VM steps and time; 0 if unlimited)"""
+        used = 0.0
+        if self.max_vm_steps:
+            used = self.vm_steps / self.max_vm_steps
+        if self.max_seconds:
+            used = max(used, self.elapsed() / self.max_seconds)
+        return used
+
+
 class SQLExecutor:
     """Safe SQL query executor with validation"""
     
-    def __init__(self, db_path: str = "data/leads.db", use_pool: bool = True):
+    def __init__(
+        self,
+        db_path: str = "data/leads.db",
+        use_pool: bool = True,
+        max_connections: int = 5,
+        max_vm_steps: Optional[int] = 1_000_000_000,
+        max_query_seconds: Optional[float] = 10.0,
+        result_cache_size: int = RESULT_CACHE_SIZE,
+        profile: Optional[str] = None,
+        version_check_interval: float = VERSION_CHECK_INTERVAL,
+        result_cache_l2: Optional[Any] = None
+    ):
+        """
+        Initialize SQL executor
+        
+        Args:
+            db_path: Path to SQLite database
+            use_pool: Whether to use the shared connection pool
+            max_connections: Pool size; also bounds concurrent async executions
+            max_vm_steps: Per-query budget of SQLite VM instructions (None = unlimited)
+            max_query_seconds: Per-query wall-clock budget in seconds (None = unlimited)
+            result_cache_size: Maximum cached results (0 disables the result cache)
+            profile: Connection tuning profile (defaults to $SQL_CONNECTION_PROFILE,
+                then CONNECTION_PROFILE)
+            version_check_interval: Seconds a data version reading is reused
+                before the database is checked again (0 = check on every call)
+            result_cache_l2: Persistent tier for the result cache (default: the
+                shared disk cache from $QUERY_CACHE_DISK_PATH, if set)
+        """
         self.db_path = db_path
         self.use_pool = use_pool
+        self.max_connections = max_connections
+        self.max_vm_steps = max_vm_steps
+        self.max_query_seconds = max_query_seconds
+        self.profile = profile or os.environ.get(CONNECTION_PROFILE_ENV_VAR) or CONNECTION_PROFILE
+        
+        # Worker threads for the async API (created on first use)
+        self._workers: Optional[ThreadPoolExecutor] = None
+        self._workers_lock = threading.Lock()
+        
+        # Thread id -> connection currently executing on it (see execute_multi)
+        self._active: Dict[int, sqlite3.Connection] = {}
+        self._active_lock = threading.Lock()
+        
+        # Result cache keyed by the database's data version. With a disk tier,
+        # results survive restarts for as long as the database is unchanged.
+        self.result_cache = None
+        if result_cache_size and QueryCache is not None:
+            self.result_cache = QueryCache(
+                max_size=result_cache_size,
+                default_ttl=RESULT_CACHE_TTL,
+                l2=result_cache_l2 if result_cache_l2 is not None else get_disk_cache()
+            )
+        # The data version is re-read at most once per version_check_interval;
+        # _version_lock only guards that refresh, not cache reads and writes
+        self.version_check_interval = version_check_interval
+        self._version_lock = threading.Lock()
+        self._cached_version = None
+        self._version_valid_until = 0.0
+        self._version_conn = None
+        self._version_file_id = None
         
         # Initialize connection pool if enabled
         if use_pool:
             try:
-                self.pool = get_connection_pool(db_path, max_connections=5)
+                self.pool = get_connection_pool(
+                    db_path,
+                    max_connections=max_connections,
+                    statement_cache_size=STATEMENT_CACHE_SIZE,
+                    read_only=True,
+                    profile=self.profile
+                )
             except ImportError:
                 self.use_pool = False
                 self.pool = None
@@ -53,7 +314,14 @@ class SQLExecutor:
             self.pool = None
     
     def _get_connection(self):
-        """Get database connection"""
+        """Get database connection (registered as the calling thread's active connection)"""
+        conn = self._open_connection()
+        with self._active_lock:
+            self._active[threading.get_ident()] = conn
+        return conn
+    
+    def _open_connection(self):
+        """Check out a pooled connection or open a new read-only one"""
         if self.use_pool and self.pool:
             return self.pool.get_connection()
         
@@ -70,14 +338,21 @@ class SQLExecutor:
                         f"Tried: {self.db_path} and {alt_path}\n"
                         f"Please ensure the database is initialized by running ensure_databases_exist()"
                     )
-            return sqlite3.connect(self.db_path)
+            return open_read_only_connection(
+                self.db_path,
+                profile=self.profile,
+                cached_statements=STATEMENT_CACHE_SIZE
+            )
         except sqlite3.Error as e:
             raise RuntimeError(f"Failed to connect to database: {str(e)}")
     
-    def _return_connection(self, conn):
-        """Return connection to pool"""
+    def _return_connection(self, conn, broken: bool = False):
+        """Return connection to pool (broken connections are closed, not reused)"""
+        with self._active_lock:
+            if self._active.get(threading.get_ident()) is conn:
+                del self._active[threading.get_ident()]
         if self.use_pool and self.pool and conn:
-            self.pool.return_connection(conn)
+            self.pool.return_connection(conn, broken=broken)
         elif conn:
             conn.close()
     
@@ -88,57 +363,287 @@ class SQLExecutor:
         Returns:
             (is_valid, error_message)
         """
-        query_upper = query.strip().upper()
+        return _check_query_safety(normalize_query(query))
+    
+    def _prepare_query(
+        self,
+        query: str,
+        params: Optional[tuple] = None
+    ) -> Tuple[str, Optional[tuple], Optional[str]]:
+        """
+        Normalize and validate a query before execution
         
-        # Only allow SELECT queries
-        if not query_upper.startswith('SELECT'):
-            return False, "Only SELECT queries are allowed for safety"
+        Returns:
+            (normalized_sql, params, error_message)
+        """
+        normalized = normalize_query(query)
+        is_valid, error_msg = _check_query_safety(normalized)
+        return normalized, params, error_msg
+    
+    @staticmethod
+    def _error_result(error_msg: str) -> Dict[str, Any]:
+        """Build an empty result dict carrying an error message"""
+        return {
+            "error": error_msg,
+            "columns": [],
+            "rows": [],
+            "row_count": 0
+        }
+    
+    @staticmethod
+    def _sql_error_result(error: sqlite3.Error) -> Dict[str, Any]:
+        """Build an error result for a database error raised during execution"""
+        error_text = str(error)
+        if "not authorized" in error_text or "readonly" in error_text:
+            return SQLExecutor._error_result(
+                "SQL Error: not authorized - only read-only queries are allowed on this connection"
+            )
+        return SQLExecutor._error_result(f"SQL Error: {error_text}")
+    
+    def _install_budget(self, conn, time_budget: Optional[float] = None) -> _QueryBudget:
+        """Install a progress handler enforcing the per-query budget on conn"""
+        max_seconds = self.max_query_seconds
+        if time_budget is not None:
+            max_seconds = time_budget if max_seconds is None else min(max_seconds, time_budget)
+        budget = _QueryBudget(self.max_vm_steps, max_seconds)
+        if budget.max_vm_steps is not None or budget.deadline is not None:
+            conn.set_progress_handler(budget, PROGRESS_HANDLER_INTERVAL)
+        return budget
+    
+    @staticmethod
+    def _clear_budget(conn) -> None:
+        """Remove the progress handler before the connection goes back to the pool"""
+        try:
+            conn.set_progress_handler(None, 0)
+        except sqlite3.Error:
+            pass
+    
+    def _budget_exceeded_result(
+        self,
+        conn,
+        query: str,
+        params: Optional[tuple],
+        budget: _QueryBudget
+    ) -> Dict[str, Any]:
+        """Build a structured 'budget exceeded' error including the query plan"""
+        # Planning is cheap, but it gets its own small budget so a pathological
+        # statement cannot run unbounded here either
+        plan_budget = _QueryBudget(EXPLAIN_MAX_VM_STEPS, EXPLAIN_MAX_SECONDS, EXPLAIN_PROGRESS_INTERVAL)
+        conn.set_progress_handler(plan_budget, plan_budget.interval)
+        try:
+            plan_rows = conn.execute(f"EXPLAIN QUERY PLAN {query}", params or ()).fetchall()
+            query_plan = [row[-1] for row in plan_rows]
+        except sqlite3.Error:
+            query_plan = []
+        finally:
+            self._clear_budget(conn)
         
-        # Block dangerous operations (only as standalone keywords, not in column names)
-        # Use word boundaries to avoid false positives (e.g., "created_at" should be allowed)
-        dangerous_keywords = [
-            'DROP', 'DELETE', 'UPDATE', 'INSERT', 'ALTER', 
-            'CREATE', 'TRUNCATE', 'EXEC', 'EXECUTE', 'REPLACE'
-        ]
+        if budget.exceeded == "time":
+            reason = f"ran longer than {budget.max_seconds:.3g}s"
+        else:
+            reason = f"exceeded {budget.max_vm_steps:,} SQLite VM steps"
+        
+        result = self._error_result(
+            f"Query budget exceeded: the query {reason} and was interrupted. "
+            f"Check the query plan for full scans of large tables or a missing JOIN "
+            f"condition (accidental cross join), then add join keys, filters or LIMIT."
+        )
+        result.update({
+            "budget_exceeded": True,
+            "budget": {
+                "reason": budget.exceeded,
+                "vm_steps": budget.vm_steps,
+                "elapsed_seconds": round(budget.elapsed(), 3),
+                "max_vm_steps": budget.max_vm_steps,
+                "max_seconds": budget.max_seconds
+            },
+            "query_plan": query_plan
+        })
+        return result
+    
+    def _file_state(self) -> Optional[tuple]:
+        """Identity and size/mtime of the database file and its WAL (None if missing)"""
+        try:
+            stat = os.stat(self.db_path)
+        except OSError:
+            return None
+        try:
+            wal = os.stat(f"{self.db_path}-wal")
+            wal_state = (wal.st_mtime_ns, wal.st_size)
+        except OSError:
+            wal_state = None
+        return (stat.st_dev, stat.st_ino, stat.st_mtime_ns, stat.st_size, wal_state)
+    
+    def _data_version(self) -> Optional[tuple]:
+        """
+        Current data version of the database (None if it cannot be determined)
+        
+        PRAGMA data_version changes whenever another connection commits, but
+        only relative to the connection asking, so a dedicated probe connection
+        is kept open. It is reopened when the file is replaced (e.g. a
+        re-ingest that deletes and recreates the database). Because a fresh
+        probe starts counting again, the version also includes the file's
+        identity, size and mtime (and its WAL's): that part is what tells
+        another process, reading the disk cache, whether the data changed.
+        If the probe fails, the file state alone is used.
         
-        import re
-        for keyword in dangerous_keywords:
-            # Match only as standalone word (not part of column names like "created_at")
-            pattern = r'\b' + keyword + r'\b'
-            if re.search(pattern, query_upper):
-                return False, f"Query contains forbidden keyword: {keyword}"
+        Must be called with _version_lock held.
+        """
+        file_state = self._file_state()
+        if file_state is None:
+            return None
+        file_id = file_state[:2]
         
-        # Block comments that might hide malicious code
-        if '--' in query or '/*' in query:
-            return False, "Comments are not allowed in queries"
+        try:
+            if self._version_conn is None or self._version_file_id != file_id:
+                if self._version_conn is not None:
+                    self._version_conn.close()
+                self._version_conn = sqlite3.connect(
+                    Path(self.db_path).resolve().as_uri() + "?mode=ro",
+                    uri=True,
+                    check_same_thread=False
+                )
+                self._version_file_id = file_id
+            data_version = self._version_conn.execute("PRAGMA data_version").fetchone()[0]
+            return (file_state, data_version)
+        except sqlite3.Error:
+            self._version_conn = None
+            return file_state
+    
+    def _current_version(self) -> Optional[tuple]:
+        """
+        Data version, re-read at most once per version_check_interval
+        
+        Within the interval the last reading is returned without taking any
+        lock. When a refresh finds a new version, the in-memory results are
+        dropped (their keys carry the old version; disk entries age out).
+        """
+        if time.monotonic() < self._version_valid_until:
+            return self._cached_version
+        with self._version_lock:
+            if time.monotonic() < self._version_valid_until:
+                # Another thread refreshed while we waited
+                return self._cached_version
+            version = self._data_version()
+            if version is not None and version != self._cached_version:
+                if self.result_cache is not None and self._cached_version is not None:
+                    self.result_cache.clear(include_l2=False)
+                self._cached_version = version
+            self._version_valid_until = time.monotonic() + self.version_check_interval
+            return version
+    
+    def _result_cache_key(self, kind: str, query: str, params: Optional[tuple], *options) -> Optional[str]:
+        """
+        Cache key for a normalized query at the current data version
+        
+        Returns None when caching is disabled, the data version is unknown,
+        or the result would also depend on the clock or randomness.
+        """
+        if self.result_cache is None:
+            return None
+        if not is_deterministic_query(query) or any(
+            isinstance(param, str) and param.strip().lower() == 'now' for param in params or ()
+        ):
+            return None
+        version = self._current_version()
+        if version is None:
+            return None
+        return "sql:" + json.dumps([kind, query, list(params or ()), list(options), version], default=str)
+    
+    @staticmethod
+    def _copy_result(result: Dict[str, Any], **extra) -> Dict[str, Any]:
+        """Copy a result down to its row dicts, so the cache and callers never share rows"""
+        return {**result, "rows": [dict(row) for row in result["rows"]], **extra}
+    
+    def _cache_get(self, key: Optional[str]) -> Optional[Dict[str, Any]]:
+        """Look up a cached result (returns a copy so callers can't mutate the cache)"""
+        if key is None:
+            return None
+        result = self.result_cache.get(key)
+        if result is None:
+            return None
+        return self._copy_result(result, cached=True)
+    
+    def _cache_set(self, key: Optional[str], result: Dict[str, Any]) -> None:
+        """Cache a copy of a successful result"""
+        if key is None or result.get('error'):
+            return
+        self.result_cache.set(key, self._copy_result(result))
+    
+    def clear_result_cache(self) -> None:
+        """Drop all cached results"""
+        if self.result_cache is not None:
+            self.result_cache.clear()
+    
+    def data_version(self) -> Optional[tuple]:
+        """
+        Current data version of the database
         
-        return True, None
+        Opaque value that changes whenever the database's data does (commits
+        from any connection, or the file being replaced), at most
+        version_check_interval seconds after the change. None if unknown.
+        """
+        return self._current_version()
+    
+    def get_cache_stats(self) -> Dict[str, Any]:
+        """Get result cache statistics"""
+        stats = self.result_cache.get_stats() if self.result_cache is not None else {}
+        return {
+            "enabled": self.result_cache is not None,
+            "size": stats.get("size", 0),
+            "hits": stats.get("hits", 0),
+            "misses": stats.get("misses", 0),
+            "data_version": self._cached_version
+        }
+    
+    @staticmethod
+    def _rows_to_dicts(columns: List[str], rows: List[tuple]) -> List[Dict[str, Any]]:
+        """Convert fetched rows to a list of dicts keyed by column name"""
+        return [dict(zip(columns, row)) for row in rows]
     
     @ErrorHandler.handle_database_error
-    def execute(self, query: str, params: Optional[tuple] = None) -> Dict[str, Any]:
+    def execute(
+        self,
+        query: str,
+        params: Optional[tuple] = None,
+        time_budget: Optional[float] = None
+    ) -> Dict[str, Any]:
         """
         Execute a SQL SELECT query safely
         
+        Runaway statements are interrupted once they exceed max_vm_steps or
+        max_query_seconds; the result then carries 'budget_exceeded': True and
+        the statement's 'query_plan' so the caller can rewrite it.
+        
+        Successful results are cached per normalized query and parameters
+        until the database's data version changes; cache hits carry
+        'cached': True.
+        
         Args:
             query: SQL SELECT query string
             params: Optional tuple of parameters for parameterized queries
+            time_budget: Optional wall-clock limit in seconds for this call
+                (the lower of this and max_query_seconds applies)
             
         Returns:
             Dict with 'columns', 'rows' (list of dicts), 'row_count', and 'error' (if any)
         """
-        # Validate query
-        is_valid, error_msg = self._validate_query(query)
-        if not is_valid:
-            return {
-                "error": error_msg,
-                "columns": [],
-                "rows": [],
-                "row_count": 0
-            }
+        # Normalize and validate query (memoized by query text)
+        query, params, error_msg = self._prepare_query(query, params)
+        if error_msg:
+            return self._error_result(error_msg)
+        
+        cache_key = self._result_cache_key("execute", query, params)
+        cached = self._cache_get(cache_key)
+        if cached is not None:
+            return cached
         
         conn = None
+        broken = False
+        budget = None
         try:
             conn = self._get_connection()
+            budget = self._install_budget(conn, time_budget)
             cursor = conn.cursor()
             
             # Execute query
@@ -150,51 +655,324 @@ class SQLExecutor:
             # Get column names
             columns = [desc[0] for desc in cursor.description] if cursor.description else []
             
-            # Fetch results
-            rows = cursor.fetchall()
-            
-            # Convert rows to list of dicts
-            result_rows = []
-            for row in rows:
-                result_rows.append(dict(zip(columns, row)))
+            # Fetch results and convert rows to list of dicts
+            result_rows = self._rows_to_dicts(columns, cursor.fetchall())
             
-            return {
+            result = {
                 "columns": columns,
                 "rows": result_rows,
                 "row_count": len(result_rows),
                 "error": None
             }
+            self._cache_set(cache_key, result)
+            return result
         except sqlite3.Error as e:
-            return {
-                "error": f"SQL Error: {str(e)}",
-                "columns": [],
-                "rows": [],
-                "row_count": 0
-            }
+            if budget is not None and budget.exceeded:
+                return self._budget_exceeded_result(conn, query, params, budget)
+            broken = is_connection_error(e)
+            return self._sql_error_result(e)
         except Exception as e:
-            return {
-                "error": f"Error executing query: {str(e)}",
-                "columns": [],
-                "rows": [],
-                "row_count": 0
+            return self._error_result(f"Error executing query: {str(e)}")
+        finally:
+            if conn:
+                self._clear_budget(conn)
+                self._return_connection(conn, broken)
+    
+    @ErrorHandler.handle_database_error
+    def execute_page(
+        self,
+        query: str,
+        params: Optional[tuple] = None,
+        max_rows: int = 50,
+        time_budget: Optional[float] = None,
+        preview_rows: Optional[int] = None
+    ) -> Dict[str, Any]:
+        """
+        Execute a SQL SELECT query and return at most max_rows rows
+        
+        The statement runs exactly as written and only max_rows + 1 rows are
+        fetched from the cursor, so column names and ORDER BY are untouched
+        and no rows past the cap are converted to dicts. When the cap is hit,
+        the total comes from SELECT COUNT(*) over the same statement, within
+        what is left of the query budget; if the budget runs out first, the
+        total is reported as a lower bound.
+        Pages with an exact total are cached like execute results.
+        
+        Args:
+            query: SQL SELECT query string
+            params: Optional tuple of parameters for parameterized queries
+            max_rows: Maximum number of rows to return
+            time_budget: Optional wall-clock limit in seconds for this call
+            preview_rows: If set, a truncated page is cut down to this many rows
+                before conversion to dicts (untruncated pages are returned whole)
+            
+        Returns:
+            Dict with 'columns', 'rows' (list of dicts), 'row_count' (rows returned),
+            'total_count', 'total_is_exact', 'truncated', and 'error' (if any)
+        """
+        query, params, error_msg = self._prepare_query(query, params)
+        if error_msg:
+            return self._error_result(error_msg)
+        
+        cache_key = self._result_cache_key("page", query, params, max_rows, preview_rows)
+        cached = self._cache_get(cache_key)
+        if cached is not None:
+            return cached
+        
+        conn = None
+        broken = False
+        budget = None
+        try:
+            conn = self._get_connection()
+            budget = self._install_budget(conn, time_budget)
+            cursor = conn.cursor()
+            cursor.execute(query, params or ())
+            
+            columns = [desc[0] for desc in cursor.description] if cursor.description else []
+            
+            # Fetch one extra row to detect truncation without reading the rest
+            rows = cursor.fetchmany(max_rows + 1)
+            truncated = len(rows) > max_rows
+            rows = rows[:max_rows]
+            
+            total_count = len(rows)
+            total_is_exact = True
+            if truncated:
+                cursor.close()
+                total_count, total_is_exact = self._count_rows(conn, query, params, budget, len(rows) + 1)
+                if preview_rows is not None:
+                    rows = rows[:preview_rows]
+            
+            result = {
+                "columns": columns,
+                "rows": self._rows_to_dicts(columns, rows),
+                "row_count": len(rows),
+                "total_count": total_count,
+                "total_is_exact": total_is_exact,
+                "truncated": truncated,
+                "error": None
             }
+            # A lower-bound total depends on the budget, so only exact pages are cached
+            if total_is_exact:
+                self._cache_set(cache_key, result)
+            return result
+        except sqlite3.Error as e:
+            if budget is not None and budget.exceeded:
+                return self._budget_exceeded_result(conn, query, params, budget)
+            broken = is_connection_error(e)
+            return self._sql_error_result(e)
+        except Exception as e:
+            return self._error_result(f"Error executing query: {str(e)}")
         finally:
             if conn:
-                self._return_connection(conn)
+                self._clear_budget(conn)
+                self._return_connection(conn, broken)
+    
+    def _count_rows(
+        self,
+        conn,
+        query: str,
+        params: Optional[tuple],
+        budget: _QueryBudget,
+        seen: int
+    ) -> Tuple[int, bool]:
+        """
+        Total row count for a truncated page
+        
+        Runs SELECT COUNT(*) over the statement on the same connection, so no
+        rows are built in Python (column names and ORDER BY don't matter to a
+        count, unlike the page itself). The count gets what is left of the
+        query budget; it is skipped once the page used COUNT_BUDGET_FRACTION
+        of the budget, and a count that runs out of budget reports the rows
+        seen so far as a lower bound.
+        
+        Returns:
+            (total_count, total_is_exact)
+        """
+        if budget.used_fraction() >= COUNT_BUDGET_FRACTION:
+            return seen, False
+        count_budget = _QueryBudget(
+            None if budget.max_vm_steps is None else max(budget.max_vm_steps - budget.vm_steps, 0),
+            None if budget.max_seconds is None else max(budget.max_seconds - budget.elapsed(), 0.0)
+        )
+        if count_budget.max_vm_steps is not None or count_budget.deadline is not None:
+            conn.set_progress_handler(count_budget, PROGRESS_HANDLER_INTERVAL)
+        try:
+            total_count = conn.execute(f"SELECT COUNT(*) FROM ({query})", params or ()).fetchone()[0]
+            return max(total_count, seen), True
+        except sqlite3.Error:
+            # Out of budget while counting: keep the page, report a lower bound
+            if not count_budget.exceeded:
+                raise
+            return seen, False
+    
+    def _get_workers(self) -> ThreadPoolExecutor:
+        """Bounded worker pool used by the async API (one worker per connection)"""
+        with self._workers_lock:
+            if self._workers is None:
+                self._workers = ThreadPoolExecutor(
+                    max_workers=self.max_connections,
+                    thread_name_prefix="sql-executor"
+                )
+            return self._workers
+    
+    def close(self) -> None:
+        """
+        Shut down the async worker pool and close idle pooled connections
+        
+        Waits for running queries to finish. The executor stays usable:
+        workers and connections are recreated on the next call.
+        """
+        with self._workers_lock:
+            workers, self._workers = self._workers, None
+        if workers is not None:
+            workers.shutdown(wait=True)
+        if self.use_pool and self.pool:
+            self.pool.close_all()
+        with self._version_lock:
+            if self._version_conn is not None:
+                self._version_conn.close()
+                self._version_conn = None
+    
+    async def aexecute(
+        self,
+        query: str,
+        params: Optional[tuple] = None,
+        max_rows: Optional[int] = None,
+        preview_rows: Optional[int] = None
+    ) -> Dict[str, Any]:
+        """
+        Async version of execute (or execute_page when max_rows is given)
+        
+        The query runs on the executor's bounded worker pool, so the event
+        loop is never blocked and at most max_connections queries run at once.
+        
+        Args:
+            query: SQL SELECT query string
+            params: Optional tuple of parameters for parameterized queries
+            max_rows: If set, return a page of at most max_rows rows
+            preview_rows: Passed to execute_page for truncated pages
+            
+        Returns:
+            Same result dict as execute / execute_page
+        """
+        if max_rows is None:
+            call = partial(self.execute, query, params)
+        else:
+            call = partial(
+                self.execute_page, query, params, max_rows=max_rows, preview_rows=preview_rows
+            )
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._get_workers(), call)
     
-    def execute_multi(self, queries: List[str]) -> List[Dict[str, Any]]:
+    async def aexecute_many(
+        self,
+        queries: List[str],
+        params_list: Optional[List[Optional[tuple]]] = None,
+        max_rows: Optional[int] = None
+    ) -> List[Dict[str, Any]]:
         """
-        Execute multiple SQL queries
+        Run several queries concurrently and return results in input order
         
         Args:
             queries: List of SQL SELECT query strings
+            params_list: Optional parameters for each query (same length as queries)
+            max_rows: If set, each result is a page of at most max_rows rows
             
         Returns:
             List of result dicts
         """
+        params_list = params_list or [None] * len(queries)
+        return await asyncio.gather(*[
+            self.aexecute(query, params, max_rows=max_rows)
+            for query, params in zip(queries, params_list)
+        ])
+    
+    def _execute_until(
+        self,
+        query: str,
+        params: Optional[tuple],
+        batch_end: Optional[float],
+        task: Dict[str, Any]
+    ) -> Dict[str, Any]:
+        """
+        Run execute() with whatever is left of a batch deadline as its time budget
+        
+        task['thread'] is set while the query runs, so execute_multi can find
+        (and interrupt) the connection it is using.
+        """
+        with self._active_lock:
+            task['thread'] = threading.get_ident()
+        try:
+            if batch_end is None:
+                return self.execute(query, params)
+            return self.execute(query, params, time_budget=max(0.0, batch_end - time.monotonic()))
+        finally:
+            with self._active_lock:
+                task['thread'] = None
+    
+    def _interrupt_task(self, task: Dict[str, Any]) -> None:
+        """Interrupt the statement a still-running execute_multi task is executing"""
+        with self._active_lock:
+            thread = task.get('thread')
+            conn = self._active.get(thread) if thread is not None else None
+            if conn is not None:
+                conn.interrupt()
+    
+    def execute_multi(
+        self,
+        queries: List[str],
+        deadline: Optional[float] = None,
+        params_list: Optional[List[Optional[tuple]]] = None
+    ) -> List[Dict[str, Any]]:
+        """
+        Execute multiple independent SQL queries in parallel
+        
+        Queries fan out across pool connections via the executor's worker
+        pool. Results come back in input order. If the batch deadline passes,
+        finished results are returned as-is and every unfinished query gets an
+        error result with 'timed_out': True. Queries still running at the
+        deadline are interrupted with Connection.interrupt() (their time
+        budget would stop them shortly after anyway), so their connections go
+        back to the pool right away. Queries still waiting for a pool
+        connection cannot be interrupted; they run with an exhausted time
+        budget and fail as soon as they start.
+        
+        Args:
+            queries: List of SQL SELECT query strings
+            deadline: Optional time budget in seconds for the whole batch
+            params_list: Optional parameters for each query (same length as queries)
+            
+        Returns:
+            List of result dicts
+        """
+        params_list = params_list or [None] * len(queries)
+        batch_end = time.monotonic() + deadline if deadline is not None else None
+        tasks = [{'thread': None} for _ in queries]
+        futures = [
+            self._get_workers().submit(self._execute_until, query, params, batch_end, task)
+            for query, params, task in zip(queries, params_list, tasks)
+        ]
+        wait(futures, timeout=deadline)
+        
         results = []
-        for query in queries:
-            result = self.execute(query)
+        for future, task in zip(futures, tasks):
+            if not future.done():
+                if not future.cancel():
+                    self._interrupt_task(task)
+                result = self._error_result(
+                    f"Batch deadline of {deadline}s exceeded before this query finished"
+                )
+                result["timed_out"] = True
+            else:
+                try:
+                    result = future.result()
+                except Exception as e:
+                    result = self._error_result(f"Error executing query: {str(e)}")
+                # Stopped by its time budget because the batch deadline passed
+                if (batch_end is not None and time.monotonic() >= batch_end
+                        and result.get('budget', {}).get('reason') == "time"):
+                    result["timed_out"] = True
             results.append(result)
         return results
 
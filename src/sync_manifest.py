@@ -0,0 +1,191 @@
+"""
+Sync Manifest
+Tracks which documents are in the vector collection and with what content
+"""
+
+import hashlib
+import json
+import os
+import sqlite3
+import time
+import uuid
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Sequence, Set, Tuple
+
+
+DEFAULT_MANIFEST_PATH = "data/chroma_manifest.db"
+
+# Ids per IN (...) query (below SQLite's default host-parameter limit)
+MAX_SQL_PARAMS = 900
+
+
+def document_hash(text: str, metadata: Optional[Dict[str, Any]] = None) -> str:
+    """
+    Content hash of a document as stored in the collection
+
+    Covers the text and its metadata, so a status change on a lead (which
+    only affects metadata) is also picked up as a change.
+    """
+    payload = json.dumps([text, metadata or {}], sort_keys=True, default=str, ensure_ascii=False)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class SyncManifest:
+    """
+    doc id -> (source, content hash, embedded_at) for a vector collection
+
+    A row is written only after the document has been upserted into the
+    collection, in the same batch, so the manifest is a checkpoint: after an
+    interrupted sync, the next run re-embeds exactly the documents that were
+    not yet written.
+
+    Syncs are streamed: each run gets a run id, and every document seen in the
+    sources is stamped with it (record or mark_seen). Rows of the included
+    sources left with an older run id afterwards are stale. No set of all
+    document ids is ever held in memory.
+    """
+
+    def __init__(self, path: str = DEFAULT_MANIFEST_PATH, collection_name: str = "lead_conversations"):
+        """
+        Initialize manifest
+
+        Args:
+            path: SQLite file holding the manifest (created if missing)
+            collection_name: Collection the manifest describes
+        """
+        self.path = path
+        self.collection_name = collection_name
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        self._conn = sqlite3.connect(path)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS sync_manifest (
+                collection TEXT NOT NULL,
+                doc_id TEXT NOT NULL,
+                source TEXT NOT NULL,
+                content_hash TEXT NOT NULL,
+                embedded_at REAL NOT NULL,
+                run_id TEXT,
+                PRIMARY KEY (collection, doc_id)
+            ) WITHOUT ROWID
+        """)
+        columns = {row[1] for row in self._conn.execute("PRAGMA table_info(sync_manifest)")}
+        if "run_id" not in columns:
+            # Manifest written before streamed syncs
+            self._conn.execute("ALTER TABLE sync_manifest ADD COLUMN run_id TEXT")
+        self._conn.commit()
+
+    def __len__(self) -> int:
+        return self._conn.execute(
+            "SELECT COUNT(*) FROM sync_manifest WHERE collection = ?", (self.collection_name,)
+        ).fetchone()[0]
+
+    def lookup(self, doc_ids: Sequence[str]) -> Dict[str, str]:
+        """Recorded content hashes for some documents: doc_id -> content_hash (unknown ids omitted)"""
+        found = {}
+        for start in range(0, len(doc_ids), MAX_SQL_PARAMS):
+            chunk = list(doc_ids[start:start + MAX_SQL_PARAMS])
+            placeholders = ",".join("?" * len(chunk))
+            found.update(self._conn.execute(
+                f"SELECT doc_id, content_hash FROM sync_manifest WHERE collection = ? AND doc_id IN ({placeholders})",
+                [self.collection_name, *chunk]
+            ))
+        return found
+
+    def iter_ids(self, page_size: int = 500) -> Iterator[List[str]]:
+        """Yield recorded doc ids in pages (keyset pagination, safe to modify rows between pages)"""
+        last = ""
+        while True:
+            page = [row[0] for row in self._conn.execute(
+                "SELECT doc_id FROM sync_manifest WHERE collection = ? AND doc_id > ? ORDER BY doc_id LIMIT ?",
+                (self.collection_name, last, page_size)
+            )]
+            if not page:
+                return
+            yield page
+            last = page[-1]
+
+    def version(self) -> Optional[Tuple[int, float]]:
+        """
+        Version of the collection's contents: (documents, last embedded_at)
+
+        Changes whenever a sync writes or removes documents. Read on a fresh
+        connection, so it can be called from any thread. None if unreadable.
+        """
+        try:
+            conn = sqlite3.connect(self.path)
+            try:
+                count, last = conn.execute(
+                    "SELECT COUNT(*), MAX(embedded_at) FROM sync_manifest WHERE collection = ?",
+                    (self.collection_name,)
+                ).fetchone()
+            finally:
+                conn.close()
+        except sqlite3.Error:
+            return None
+        return (count, last)
+
+    def begin_run(self) -> str:
+        """Start a streamed sync; returns the run id to stamp seen documents with"""
+        return uuid.uuid4().hex
+
+    def record(self, entries: Iterable[Tuple[str, str, str]], run_id: Optional[str] = None) -> None:
+        """
+        Record documents as embedded (one transaction = one checkpoint)
+
+        Args:
+            entries: (doc_id, source, content_hash) tuples
+            run_id: Sync run that saw these documents
+        """
+        now = time.time()
+        with self._conn:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO sync_manifest (collection, doc_id, source, content_hash, embedded_at, run_id) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                [
+                    (self.collection_name, doc_id, source, content_hash, now, run_id)
+                    for doc_id, source, content_hash in entries
+                ]
+            )
+
+    def mark_seen(self, doc_ids: Iterable[str], run_id: str) -> None:
+        """Stamp unchanged documents as present in the sources for a run"""
+        with self._conn:
+            self._conn.executemany(
+                "UPDATE sync_manifest SET run_id = ? WHERE collection = ? AND doc_id = ?",
+                [(run_id, self.collection_name, doc_id) for doc_id in doc_ids]
+            )
+
+    def iter_stale(self, sources: Set[str], run_id: str, page_size: int = 500) -> Iterator[List[str]]:
+        """
+        Yield, in pages, recorded documents of the given sources not seen in a run
+
+        Documents of other sources are never returned. Pages may be forgotten
+        while iterating.
+        """
+        sources = sorted(sources)
+        placeholders = ",".join("?" * len(sources))
+        last = ""
+        while True:
+            page = [row[0] for row in self._conn.execute(
+                f"SELECT doc_id FROM sync_manifest WHERE collection = ? AND doc_id > ? "
+                f"AND source IN ({placeholders}) AND (run_id IS NULL OR run_id != ?) "
+                f"ORDER BY doc_id LIMIT ?",
+                [self.collection_name, last, *sources, run_id, page_size]
+            )]
+            if not page:
+                return
+            yield page
+            last = page[-1]
+
+    def forget(self, doc_ids: Iterable[str]) -> None:
+        """Remove documents from the manifest"""
+        with self._conn:
+            self._conn.executemany(
+                "DELETE FROM sync_manifest WHERE collection = ? AND doc_id = ?",
+                [(self.collection_name, doc_id) for doc_id in doc_ids]
+            )
+
+    def close(self) -> None:
+        """Close the manifest database"""
+        self._conn.close()
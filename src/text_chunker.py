@@ -0,0 +1,265 @@
+"""
+Text Chunker
+Splits long conversation text into token-bounded chunks on message boundaries
+"""
+
+import json
+import re
+from typing import Any, Dict, Iterable, Iterator, List, Tuple
+
+from token_counter import count_tokens
+from tool_output import compact_dumps
+
+
+# Token budget per chunk. Small enough that a retrieved chunk is a focused
+# excerpt (about half a legacy 8,000-character slice), large enough to keep
+# several messages of context together.
+DEFAULT_CHUNK_TOKENS = 1024
+
+# Tokens of trailing messages repeated at the start of the next chunk. Overlap
+# is the only text embedded twice, so it costs at most
+# overlap / (chunk - overlap) extra embedding tokens: 3% at 1024/32, where
+# 512/64 could cost 14%.
+DEFAULT_OVERLAP_TOKENS = 32
+
+# Tokenizer used for budgeting (matches the document embedding model)
+DEFAULT_TOKENIZER_MODEL = "text-embedding-3-small"
+
+# Character slice size used before message-boundary chunking (kept for reports)
+LEGACY_CHUNK_CHARS = 8000
+
+# Set to 1 to compare chunking against character slicing during a sync (this
+# tokenizes every text a second time, so it is off by default)
+CHUNKING_REPORT_ENV_VAR = "CHUNKING_REPORT"
+
+# Keys holding the message text in timeline / CRM event objects
+_MESSAGE_TEXT_KEYS = ("content", "message", "text", "body", "note", "notes", "summary")
+
+# Keys rendered as a short header in front of the message text
+_MESSAGE_HEADER_KEYS = ("timestamp", "date", "created_at", "event_type", "type", "source", "direction", "sender", "from")
+
+# Line that starts a new turn in plain text: a date/time or "Speaker:" prefix
+_TURN_START = re.compile(
+    r"^\s*(?:\[?\d{1,4}[-/.]\d{1,2}[-/.]\d{1,4}|\[?\d{1,2}:\d{2}|[A-Z][\w .'-]{0,40}:\s)"
+)
+
+# Sentence boundary used to split a single message that exceeds the budget
+_SENTENCE_END = re.compile(r"(?<=[.!?])\s+")
+
+
+def _render_event(event: Dict[str, Any]) -> str:
+    """Render one timeline/CRM event as '[header] text'"""
+    text_key = next((key for key in _MESSAGE_TEXT_KEYS if event.get(key)), None)
+    if text_key is None:
+        return compact_dumps(event)
+    header = " | ".join(str(event[key]) for key in _MESSAGE_HEADER_KEYS if event.get(key))
+    text = str(event[text_key]).strip()
+    return f"[{header}] {text}" if header else text
+
+
+def _json_messages(data: Any) -> Iterator[str]:
+    """Yield the messages of a parsed JSON timeline (lists of events, possibly nested in objects)"""
+    if isinstance(data, list):
+        for item in data:
+            if isinstance(item, (list, dict)):
+                yield from _json_messages(item)
+            elif item not in (None, ""):
+                yield str(item)
+    elif isinstance(data, dict):
+        if any(data.get(key) for key in _MESSAGE_TEXT_KEYS):
+            yield _render_event(data)
+            return
+        for key, value in data.items():
+            if isinstance(value, (list, dict)):
+                yield from _json_messages(value)
+            elif value not in (None, ""):
+                yield f"{key}: {value}"
+    elif data not in (None, ""):
+        yield str(data)
+
+
+def _text_messages(text: str) -> Iterator[str]:
+    """Yield turns of plain text: a new turn starts at a blank line or a timestamp/speaker prefix"""
+    turn: List[str] = []
+    for line in text.splitlines():
+        if not line.strip():
+            if turn:
+                yield "\n".join(turn)
+                turn = []
+            continue
+        if turn and _TURN_START.match(line):
+            yield "\n".join(turn)
+            turn = []
+        turn.append(line.rstrip())
+    if turn:
+        yield "\n".join(turn)
+
+
+def split_messages(text: str) -> Iterator[str]:
+    """
+    Split conversation text into messages
+
+    JSON timelines (a list of events, or an object holding such lists) yield
+    one message per event; anything else is split into turns on blank lines
+    and timestamp/speaker prefixes.
+    """
+    stripped = text.strip()
+    if stripped[:1] in ("[", "{"):
+        try:
+            data = json.loads(stripped)
+        except ValueError:
+            pass
+        else:
+            yield from _json_messages(data)
+            return
+    yield from _text_messages(text)
+
+
+def _split_oversized(message: str, max_tokens: int, model: str) -> Iterator[str]:
+    """Split a single message over the budget at sentence boundaries (hard-cut as a last resort)"""
+    piece = ""
+    for sentence in _SENTENCE_END.split(message):
+        candidate = f"{piece} {sentence}" if piece else sentence
+        if count_tokens(candidate, model) <= max_tokens:
+            piece = candidate
+            continue
+        if piece:
+            yield piece
+        if count_tokens(sentence, model) <= max_tokens:
+            piece = sentence
+            continue
+        # One sentence longer than the budget: cut it by characters, sizing
+        # each cut so it fits
+        start = 0
+        while start < len(sentence):
+            size = max_tokens * 4
+            while size > 1 and count_tokens(sentence[start:start + size], model) > max_tokens:
+                size //= 2
+            yield sentence[start:start + size]
+            start += size
+        piece = ""
+    if piece:
+        yield piece
+
+
+def chunk_messages(
+    messages: Iterable[str],
+    max_tokens: int = DEFAULT_CHUNK_TOKENS,
+    overlap_tokens: int = DEFAULT_OVERLAP_TOKENS,
+    model: str = DEFAULT_TOKENIZER_MODEL
+) -> Iterator[str]:
+    """
+    Pack messages into chunks of at most max_tokens tokens
+
+    Messages are never split unless a single message exceeds the budget on
+    its own. Each new chunk starts with the trailing messages of the previous
+    chunk that fit in overlap_tokens, so context spanning a boundary is not
+    lost.
+
+    Args:
+        messages: Messages in conversation order (consumed lazily)
+        max_tokens: Token budget per chunk
+        overlap_tokens: Token budget for messages repeated from the previous chunk (0 = none)
+        model: Model whose tokenizer is used for counting
+
+    Yields:
+        Chunk texts (messages joined by newlines)
+    """
+    chunk: List[str] = []
+    chunk_tokens: List[int] = []
+    total = 0  # sum(chunk_tokens)
+    fresh = False  # Whether the chunk holds anything not already emitted
+
+    def pieces() -> Iterator[Tuple[str, int]]:
+        """Messages (split if over the budget) with their token counts, counted once"""
+        for message in messages:
+            message = message.strip()
+            if not message:
+                continue
+            tokens = count_tokens(message, model)
+            if tokens <= max_tokens:
+                yield message, tokens
+            else:
+                for piece in _split_oversized(message, max_tokens, model):
+                    yield piece, count_tokens(piece, model)
+
+    for message, tokens in pieces():
+        tokens += 1  # Newline separators cost about one token each
+        if chunk and total + tokens > max_tokens:
+            if fresh:
+                yield "\n".join(chunk)
+            # Carry trailing messages into the next chunk as overlap
+            carried, carried_tokens, carried_total = [], [], 0
+            for previous, previous_tokens in zip(reversed(chunk), reversed(chunk_tokens)):
+                if carried_total + previous_tokens > overlap_tokens:
+                    break
+                carried.insert(0, previous)
+                carried_tokens.insert(0, previous_tokens)
+                carried_total += previous_tokens
+            while carried and carried_total + tokens > max_tokens:
+                carried.pop(0)
+                carried_total -= carried_tokens.pop(0)
+            chunk, chunk_tokens, total = carried, carried_tokens, carried_total
+        chunk.append(message)
+        chunk_tokens.append(tokens)
+        total += tokens
+        fresh = True
+
+    if chunk and fresh:
+        yield "\n".join(chunk)
+
+
+def chunk_text(
+    text: str,
+    max_tokens: int = DEFAULT_CHUNK_TOKENS,
+    overlap_tokens: int = DEFAULT_OVERLAP_TOKENS,
+    model: str = DEFAULT_TOKENIZER_MODEL
+) -> Iterator[str]:
+    """Split conversation text into token-bounded chunks on message boundaries (generator)"""
+    return chunk_messages(split_messages(text), max_tokens, overlap_tokens, model)
+
+
+def legacy_char_chunks(text: str, size: int = LEGACY_CHUNK_CHARS) -> List[str]:
+    """Fixed-size character slices, as raw text used to be chunked"""
+    return [text[i:i + size] for i in range(0, len(text), size)]
+
+
+class ChunkingReport:
+    """
+    Chunk and embedding-token totals for message chunking vs. character slicing
+
+    Counting tokens for the report re-tokenizes every text and chunk, so it is
+    only built on demand (see CHUNKING_REPORT_ENV_VAR).
+    """
+
+    def __init__(self, model: str = DEFAULT_TOKENIZER_MODEL):
+        self.model = model
+        self.texts = 0
+        self.legacy_chunks = 0
+        self.legacy_tokens = 0
+        self.chunks = 0
+        self.tokens = 0
+
+    def add(self, text: str, chunks: List[str]) -> None:
+        """Record one source text and the chunks produced for it"""
+        legacy = legacy_char_chunks(text)
+        self.texts += 1
+        self.legacy_chunks += len(legacy)
+        self.legacy_tokens += sum(count_tokens(chunk, self.model) for chunk in legacy)
+        self.chunks += len(chunks)
+        self.tokens += sum(count_tokens(chunk, self.model) for chunk in chunks)
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Get before/after totals"""
+        return {
+            "texts": self.texts,
+            "legacy_chunks": self.legacy_chunks,
+            "legacy_tokens": self.legacy_tokens,
+            "chunks": self.chunks,
+            "tokens": self.tokens,
+            "avg_chunk_tokens": round(self.tokens / self.chunks, 1) if self.chunks else 0.0,
+            "token_change_percent": (
+                round(100 * (self.tokens - self.legacy_tokens) / self.legacy_tokens, 1)
+                if self.legacy_tokens else 0.0
+            )
+        }
@@ -0,0 +1,46 @@
+"""
+Token Counting
+Shared tiktoken-based token counts for tool outputs, chunking and embedding batches
+"""
+
+from functools import lru_cache
+
+try:
+    import tiktoken
+except ImportError:
+    tiktoken = None
+
+
+# Model whose tokenizer is used when none is given
+DEFAULT_TOKENIZER_MODEL = "gpt-4o"
+
+
+@lru_cache(maxsize=8)
+def _get_encoding(model: str):
+    """Load (once) the tiktoken encoding for a model"""
+    if tiktoken is None:
+        return None
+    try:
+        return tiktoken.encoding_for_model(model)
+    except KeyError:
+        return tiktoken.get_encoding("o200k_base")
+    except Exception:
+        # Encoding files could not be loaded (e.g. offline); fall back to estimates
+        return None
+
+
+def count_tokens(text: str, model: str = DEFAULT_TOKENIZER_MODEL) -> int:
+    """
+    Count the tokens a model will spend on text
+
+    Uses tiktoken when available, otherwise a ~4 characters/token estimate.
+    """
+    encoding = _get_encoding(model)
+    if encoding is None:
+        return (len(text) + 3) // 4
+    return len(encoding.encode(text, disallowed_special=()))
+
+
+def tokenizer_name(model: str = DEFAULT_TOKENIZER_MODEL) -> str:
+    """How count_tokens counts for a model: 'tiktoken' or 'estimate'"""
+    return "tiktoken" if _get_encoding(model) is not None else "estimate"
@@ -0,0 +1,152 @@
+"""
+Tool Output Encoding
+Compact, token-efficient serialization of agent tool results
+"""
+
+import json
+import os
+import threading
+from collections import deque
+from typing import Dict, Any, List, Optional, Sequence
+
+from token_counter import count_tokens, tokenizer_name
+
+
+# Model whose tokenizer is used to measure tool output size
+TOKENIZER_MODEL = "gpt-4o"
+
+# Number of recent per-call measurements kept for reporting
+RECENT_CALLS_KEPT = 100
+
+# Set to 1 to measure every tool output against the legacy encoding (this
+# tokenizes each output twice, so it is off outside benchmarks)
+TRACK_SAVINGS_ENV_VAR = "TOOL_OUTPUT_TRACK_SAVINGS"
+
+
+def compact_dumps(obj: Any) -> str:
+    """Serialize to JSON without indentation or padding whitespace"""
+    return json.dumps(obj, separators=(',', ':'), ensure_ascii=False, default=str)
+
+
+def verbose_dumps(obj: Any) -> str:
+    """Serialize to JSON the way tool outputs used to be (indent=2)"""
+    return json.dumps(obj, indent=2, default=str)
+
+
+def to_columnar(rows: Sequence[Dict[str, Any]], columns: Optional[List[str]] = None) -> Dict[str, Any]:
+    """
+    Convert a list of dicts into {'columns': [...], 'rows': [[...], ...]}
+
+    Column names are emitted once instead of once per row. When columns are
+    not given they are collected from the rows in first-seen order; missing
+    values become null.
+    """
+    if columns is None:
+        columns = []
+        seen = set()
+        for row in rows:
+            for key in row:
+                if key not in seen:
+                    seen.add(key)
+                    columns.append(key)
+
+    return {
+        "columns": list(columns),
+        "rows": [[row.get(column) for column in columns] for row in rows]
+    }
+
+
+class ToolOutputEncoder:
+    """
+    Encodes tool results compactly and records the token savings per call
+
+    When savings tracking is on, each call is measured against the legacy
+    encoding (indent=2 JSON with per-row dicts) so the saving can be
+    reported. It is off by default because it tokenizes both renderings of
+    every output.
+    """
+
+    def __init__(self, model: str = TOKENIZER_MODEL, track_savings: Optional[bool] = None):
+        """
+        Initialize encoder
+
+        Args:
+            model: Model whose tokenizer is used for counting
+            track_savings: Whether to measure each call against the legacy
+                encoding (defaults to the TOOL_OUTPUT_TRACK_SAVINGS env var)
+        """
+        self.model = model
+        if track_savings is None:
+            track_savings = os.environ.get(TRACK_SAVINGS_ENV_VAR, "").lower() in ("1", "true", "yes")
+        self.track_savings = track_savings
+        self._lock = threading.Lock()
+        self._recent = deque(maxlen=RECENT_CALLS_KEPT)
+        self._totals: Dict[str, Dict[str, int]] = {}
+
+    def encode(self, tool_name: str, payload: Any, legacy_payload: Any = None) -> str:
+        """
+        Serialize a tool payload compactly
+
+        Args:
+            tool_name: Tool the output belongs to (for per-tool stats)
+            payload: Compact payload (typically using to_columnar rows)
+            legacy_payload: Equivalent payload in the old shape, used as the
+                savings baseline (defaults to payload itself)
+
+        Returns:
+            Compact JSON string
+        """
+        text = compact_dumps(payload)
+        if self.track_savings:
+            baseline = verbose_dumps(payload if legacy_payload is None else legacy_payload)
+            self._record(tool_name, count_tokens(baseline, self.model), count_tokens(text, self.model))
+        return text
+
+    def _record(self, tool_name: str, baseline_tokens: int, tokens: int):
+        """Record one call's token counts"""
+        with self._lock:
+            self._recent.append({
+                "tool": tool_name,
+                "baseline_tokens": baseline_tokens,
+                "tokens": tokens,
+                "saved_tokens": baseline_tokens - tokens
+            })
+            totals = self._totals.setdefault(tool_name, {"calls": 0, "baseline_tokens": 0, "tokens": 0})
+            totals["calls"] += 1
+            totals["baseline_tokens"] += baseline_tokens
+            totals["tokens"] += tokens
+
+    def last_call(self) -> Optional[Dict[str, Any]]:
+        """Get the measurement for the most recent call"""
+        with self._lock:
+            return dict(self._recent[-1]) if self._recent else None
+
+    def get_stats(self) -> Dict[str, Any]:
+        """
+        Get token savings statistics
+
+        Returns:
+            Dict with per-tool totals, overall savings and recent calls
+        """
+        with self._lock:
+            by_tool = {}
+            for tool_name, totals in self._totals.items():
+                saved = totals["baseline_tokens"] - totals["tokens"]
+                by_tool[tool_name] = {
+                    **totals,
+                    "saved_tokens": saved,
+                    "saved_percent": round(100 * saved / totals["baseline_tokens"], 1) if totals["baseline_tokens"] else 0.0
+                }
+            baseline = sum(t["baseline_tokens"] for t in self._totals.values())
+            tokens = sum(t["tokens"] for t in self._totals.values())
+            return {
+                "tracking": self.track_savings,
+                "tokenizer": tokenizer_name(self.model),
+                "calls": sum(t["calls"] for t in self._totals.values()),
+                "baseline_tokens": baseline,
+                "tokens": tokens,
+                "saved_tokens": baseline - tokens,
+                "saved_percent": round(100 * (baseline - tokens) / baseline, 1) if baseline else 0.0,
+                "by_tool": by_tool,
+                "recent_calls": list(self._recent)
+            }
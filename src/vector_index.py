@@ -0,0 +1,486 @@
+"""
+Vector Index
+Exact in-process vector search over a memory-mapped matrix
+"""
+
+import json
+import os
+import re
+import sqlite3
+import threading
+import time
+from typing import Any, Dict, List, Optional, Sequence
+
+import numpy as np
+
+
+DEFAULT_INDEX_PATH = "data/vector_index"
+
+# Rows allocated when the matrix file is first created (doubles when full)
+INITIAL_CAPACITY = 1024
+
+# Metadata fields whose columns are built when the index is opened; any
+# other field used in a where filter gets a column on first use
+INDEXED_FIELDS = ("lead_id", "chunk_type", "source", "status")
+
+# Missing value in a metadata code column
+_MISSING = -1
+
+
+class _Column:
+    """Dictionary-encoded metadata field: one int32 code per row plus the value vocabulary"""
+
+    def __init__(self, capacity: int):
+        self.codes = np.full(capacity, _MISSING, dtype=np.int32)
+        self.values: List[Any] = []
+        self._lookup: Dict[Any, int] = {}
+
+    def code_for(self, value: Any) -> int:
+        key = (type(value).__name__, value)
+        code = self._lookup.get(key)
+        if code is None:
+            code = len(self.values)
+            self._lookup[key] = code
+            self.values.append(value)
+        return code
+
+    def grow(self, capacity: int) -> None:
+        codes = np.full(capacity, _MISSING, dtype=np.int32)
+        codes[:len(self.codes)] = self.codes
+        self.codes = codes
+
+
+def _matches(value: Any, operator: str, operand: Any) -> bool:
+    """Evaluate one Chroma where operator against a single metadata value"""
+    if operator == "$eq":
+        return value == operand
+    if operator == "$ne":
+        return value != operand
+    if operator == "$in":
+        return value in operand
+    if operator == "$nin":
+        return value not in operand
+    if not isinstance(value, (int, float)) or isinstance(value, bool):
+        return False
+    if operator == "$gt":
+        return value > operand
+    if operator == "$gte":
+        return value >= operand
+    if operator == "$lt":
+        return value < operand
+    if operator == "$lte":
+        return value <= operand
+    raise ValueError(f"Unsupported where operator: {operator}")
+
+
+def matches_where(metadata: Dict[str, Any], where: Optional[Dict[str, Any]]) -> bool:
+    """Evaluate a Chroma where clause against one document's metadata"""
+    if not where:
+        return True
+    for key, condition in where.items():
+        if key == "$and":
+            if not all(matches_where(metadata, clause) for clause in condition):
+                return False
+        elif key == "$or":
+            if not any(matches_where(metadata, clause) for clause in condition):
+                return False
+        else:
+            if not isinstance(condition, dict):
+                condition = {"$eq": condition}
+            for operator, operand in condition.items():
+                if key not in metadata:
+                    if operator not in ("$ne", "$nin"):
+                        return False
+                elif not _matches(metadata[key], operator, operand):
+                    return False
+    return True
+
+
+class NumpyVectorIndex:
+    """
+    Exact cosine search over normalized float32 vectors, Chroma-collection compatible
+
+    Implements the subset of the chromadb Collection API used by
+    LeadRAGSystem (count, get, upsert, delete, query), so it can replace the
+    Chroma collection without changes to syncing or semantic_search.
+
+    Storage (one directory per collection):
+      - vectors.npy:  unit-length float32 matrix, memory-mapped; rows of
+                      deleted documents are zeroed and reused
+      - documents.db: SQLite rows (row, doc_id, document, metadata)
+
+    Filtering uses dictionary-encoded metadata columns (int32 codes per row),
+    so a Chroma `where` clause becomes a boolean mask over the rows before a
+    single matrix-vector product and an argpartition top-k.
+    """
+
+    def __init__(self, path: str = DEFAULT_INDEX_PATH, name: str = "lead_conversations"):
+        """
+        Initialize index
+
+        Args:
+            path: Root directory of vector indexes
+            name: Collection name
+        """
+        self.name = name
+        self.directory = os.path.join(path, re.sub(r'[^A-Za-z0-9._-]+', '_', name))
+        self._matrix_path = os.path.join(self.directory, "vectors.npy")
+        self._lock = threading.RLock()
+        os.makedirs(self.directory, exist_ok=True)
+
+        self._conn = sqlite3.connect(os.path.join(self.directory, "documents.db"), check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS documents (
+                row INTEGER PRIMARY KEY,
+                doc_id TEXT NOT NULL UNIQUE,
+                document TEXT,
+                metadata TEXT
+            )
+        """)
+        self._conn.commit()
+
+        self._matrix: Optional[np.memmap] = None
+        self._rows: Dict[str, int] = {}
+        self._alive = np.zeros(0, dtype=bool)
+        self._columns: Dict[str, _Column] = {}
+        self._load()
+
+    def _load(self) -> None:
+        """Open the matrix and rebuild row ids and metadata columns from documents.db"""
+        if os.path.exists(self._matrix_path):
+            self._matrix = np.load(self._matrix_path, mmap_mode="r+")
+        capacity = self._matrix.shape[0] if self._matrix is not None else 0
+        self._alive = np.zeros(capacity, dtype=bool)
+        self._columns = {field: _Column(capacity) for field in INDEXED_FIELDS}
+
+        for row, doc_id, metadata_json in self._conn.execute("SELECT row, doc_id, metadata FROM documents"):
+            if row >= capacity:
+                continue  # Vector write never completed; the row is rewritten on next upsert
+            self._rows[doc_id] = row
+            self._alive[row] = True
+            metadata = json.loads(metadata_json) if metadata_json else {}
+            for field, column in self._columns.items():
+                if field in metadata:
+                    column.codes[row] = column.code_for(metadata[field])
+
+    def _ensure_capacity(self, rows: int, dimensions: int) -> None:
+        """Create or grow the matrix file to hold at least `rows` rows (lock held)"""
+        if self._matrix is not None and self._matrix.shape[1] != dimensions:
+            raise ValueError(
+                f"Embedding has {dimensions} dimensions, index {self.name} expects {self._matrix.shape[1]}"
+            )
+        capacity = self._matrix.shape[0] if self._matrix is not None else 0
+        if rows <= capacity:
+            return
+
+        new_capacity = max(INITIAL_CAPACITY, capacity)
+        while new_capacity < rows:
+            new_capacity *= 2
+        tmp_path = self._matrix_path + ".tmp"
+        grown = np.lib.format.open_memmap(tmp_path, mode="w+", dtype=np.float32, shape=(new_capacity, dimensions))
+        if self._matrix is not None:
+            grown[:capacity] = self._matrix
+        grown.flush()
+        del grown
+        self._matrix = None
+        os.replace(tmp_path, self._matrix_path)
+        self._matrix = np.load(self._matrix_path, mmap_mode="r+")
+
+        alive = np.zeros(new_capacity, dtype=bool)
+        alive[:capacity] = self._alive
+        self._alive = alive
+        for column in self._columns.values():
+            column.grow(new_capacity)
+
+    def _column(self, field: str) -> _Column:
+        """Get (building on first use) the code column for a metadata field (lock held)"""
+        column = self._columns.get(field)
+        if column is None:
+            column = _Column(len(self._alive))
+            for row, metadata_json in self._conn.execute("SELECT row, metadata FROM documents"):
+                metadata = json.loads(metadata_json) if metadata_json else {}
+                if row < len(self._alive) and field in metadata:
+                    column.codes[row] = column.code_for(metadata[field])
+            self._columns[field] = column
+        return column
+
+    def count(self) -> int:
+        """Number of documents in the index"""
+        with self._lock:
+            return len(self._rows)
+
+    def upsert(
+        self,
+        ids: Sequence[str],
+        embeddings: Sequence[Sequence[float]],
+        documents: Optional[Sequence[str]] = None,
+        metadatas: Optional[Sequence[Dict[str, Any]]] = None
+    ) -> None:
+        """Insert or replace documents"""
+        if not ids:
+            return
+        vectors = np.asarray(embeddings, dtype=np.float32)
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        vectors = vectors / np.where(norms == 0, 1, norms)
+        documents = documents if documents is not None else [None] * len(ids)
+        metadatas = metadatas if metadatas is not None else [{}] * len(ids)
+
+        with self._lock:
+            # Existing ids keep their row; new ids take free rows, then rows past the end
+            free_rows = iter(np.flatnonzero(~self._alive).tolist())
+            next_row = len(self._alive)
+            assigned: Dict[str, int] = {}
+            rows = []
+            for doc_id in ids:
+                row = self._rows.get(doc_id, assigned.get(doc_id))
+                if row is None:
+                    row = next(free_rows, None)
+                    if row is None:
+                        row, next_row = next_row, next_row + 1
+                    assigned[doc_id] = row
+                rows.append(row)
+            self._ensure_capacity(max(rows) + 1, vectors.shape[1])
+
+            # Vectors first: documents.db decides which rows exist
+            self._matrix[rows] = vectors
+            self._matrix.flush()
+            with self._conn:
+                self._conn.executemany("DELETE FROM documents WHERE doc_id = ?", [(doc_id,) for doc_id in ids])
+                self._conn.executemany(
+                    "INSERT OR REPLACE INTO documents (row, doc_id, document, metadata) VALUES (?, ?, ?, ?)",
+                    [
+                        (row, doc_id, document, json.dumps(metadata or {}))
+                        for row, doc_id, document, metadata in zip(rows, ids, documents, metadatas)
+                    ]
+                )
+
+            for row, doc_id, metadata in zip(rows, ids, metadatas):
+                self._rows[doc_id] = row
+                self._alive[row] = True
+                metadata = metadata or {}
+                for field, column in self._columns.items():
+                    column.codes[row] = column.code_for(metadata[field]) if field in metadata else _MISSING
+
+    def add(self, ids, embeddings, documents=None, metadatas=None) -> None:
+        """Add documents (same as upsert)"""
+        self.upsert(ids, embeddings, documents, metadatas)
+
+    def delete(self, ids: Sequence[str]) -> None:
+        """Delete documents by id (unknown ids are ignored)"""
+        with self._lock:
+            rows = [self._rows.pop(doc_id) for doc_id in ids if doc_id in self._rows]
+            if not rows:
+                return
+            with self._conn:
+                self._conn.executemany("DELETE FROM documents WHERE row = ?", [(row,) for row in rows])
+            self._alive[rows] = False
+            self._matrix[rows] = 0.0
+            for column in self._columns.values():
+                column.codes[rows] = _MISSING
+
+    def get(
+        self,
+        ids: Optional[Sequence[str]] = None,
+        include: Optional[Sequence[str]] = None,
+        limit: Optional[int] = None,
+        offset: int = 0,
+        where: Optional[Dict[str, Any]] = None
+    ) -> Dict[str, Any]:
+        """
+        Get documents by id, or page through all documents
+
+        Returns:
+            Dict with 'ids' and, per include (default documents + metadatas),
+            'documents', 'metadatas' and 'embeddings'
+        """
+        include = ["documents", "metadatas"] if include is None else list(include)
+        with self._lock:
+            if ids is not None:
+                rows = [self._rows[doc_id] for doc_id in ids if doc_id in self._rows]
+            else:
+                mask = self._alive.copy() if where is None else self._mask(where)
+                rows = np.flatnonzero(mask).tolist()
+                rows = rows[offset:offset + limit] if limit is not None else rows[offset:]
+            result = self._fetch(rows, include)
+            result.pop("rows")
+            return result
+
+    def query(
+        self,
+        query_embeddings: Sequence[Sequence[float]],
+        n_results: int = 10,
+        where: Optional[Dict[str, Any]] = None,
+        include: Optional[Sequence[str]] = None
+    ) -> Dict[str, List[List[Any]]]:
+        """
+        Exact nearest neighbours by cosine distance
+
+        Returns:
+            Chroma-shaped dict: 'ids', 'documents', 'metadatas' and
+            'distances', each a list (one per query embedding) of lists
+        """
+        include = ["documents", "metadatas", "distances"] if include is None else list(include)
+        queries = np.asarray(query_embeddings, dtype=np.float32)
+        norms = np.linalg.norm(queries, axis=1, keepdims=True)
+        queries = queries / np.where(norms == 0, 1, norms)
+
+        results = {"ids": [], "documents": [], "metadatas": [], "distances": []}
+        # Scoring and fetching hold the lock: upsert can replace the matrix
+        # file (growth) and delete zeroes rows, so the matrix is only read
+        # while no writer can change it
+        with self._lock:
+            candidates = np.flatnonzero(self._alive if where is None else self._mask(where))
+            if self._matrix is None or len(candidates) == 0:
+                for key in results:
+                    results[key] = [[] for _ in range(len(queries))]
+                return results
+
+            # One matrix product for all queries. Scoring the whole matrix is
+            # cheaper than gathering rows unless the filter is selective
+            if len(candidates) * 4 < len(self._alive):
+                scores = queries @ np.asarray(self._matrix[candidates]).T
+            else:
+                scores = (queries @ np.asarray(self._matrix).T)[:, candidates]
+
+            k = min(n_results, len(candidates))
+            for query_scores in scores:
+                top = np.argpartition(-query_scores, k - 1)[:k]
+                top = top[np.argsort(-query_scores[top])]
+                fetched = self._fetch(candidates[top].tolist(), include)
+                results["ids"].append(fetched["ids"])
+                results["documents"].append(fetched.get("documents", []))
+                results["metadatas"].append(fetched.get("metadatas", []))
+                results["distances"].append((1.0 - query_scores[top]).astype(float).tolist())
+        return results
+
+    def _mask(self, where: Dict[str, Any]) -> np.ndarray:
+        """Evaluate a Chroma where clause as a boolean row mask (lock held)"""
+        mask = self._alive.copy()
+        for key, condition in where.items():
+            if key == "$and":
+                for clause in condition:
+                    mask &= self._mask(clause)
+            elif key == "$or":
+                either = np.zeros_like(mask)
+                for clause in condition:
+                    either |= self._mask(clause)
+                mask &= either
+            else:
+                if not isinstance(condition, dict):
+                    condition = {"$eq": condition}
+                column = self._column(key)
+                for operator, operand in condition.items():
+                    # Evaluate on the (small) vocabulary, then select rows by code
+                    codes = [code for code, value in enumerate(column.values) if _matches(value, operator, operand)]
+                    field_mask = np.isin(column.codes, codes)
+                    if operator in ("$ne", "$nin"):
+                        field_mask |= column.codes == _MISSING
+                    mask &= field_mask
+        return mask
+
+    def _fetch(self, rows: List[int], include: Sequence[str]) -> Dict[str, Any]:
+        """Read ids, rows (plus included fields) for rows still stored, preserving order (lock held)"""
+        stored = {}
+        for start in range(0, len(rows), 900):
+            chunk = rows[start:start + 900]
+            placeholders = ",".join("?" * len(chunk))
+            for row, doc_id, document, metadata_json in self._conn.execute(
+                f"SELECT row, doc_id, document, metadata FROM documents WHERE row IN ({placeholders})", chunk
+            ):
+                stored[row] = (doc_id, document, metadata_json)
+        rows = [row for row in rows if row in stored]
+
+        result: Dict[str, Any] = {"ids": [stored[row][0] for row in rows], "rows": rows}
+        if "documents" in include:
+            result["documents"] = [stored[row][1] for row in rows]
+        if "metadatas" in include:
+            result["metadatas"] = [json.loads(stored[row][2]) if stored[row][2] else {} for row in rows]
+        if "embeddings" in include:
+            result["embeddings"] = [np.asarray(self._matrix[row]).tolist() for row in rows]
+        return result
+
+    def close(self) -> None:
+        """Close the index files"""
+        with self._lock:
+            self._matrix = None
+            self._conn.close()
+
+
+def copy_collection(source: Any, target: NumpyVectorIndex, batch_size: int = 500) -> int:
+    """
+    Copy every document (with its embedding) from a Chroma collection into an index
+
+    Returns:
+        Number of documents copied
+    """
+    copied = 0
+    offset = 0
+    while True:
+        page = source.get(limit=batch_size, offset=offset, include=["documents", "metadatas", "embeddings"])
+        if not len(page["ids"]):
+            return copied
+        target.upsert(page["ids"], page["embeddings"], page["documents"], page["metadatas"])
+        offset += len(page["ids"])
+        copied += len(page["ids"])
+
+
+def compare_latency(
+    backends: Dict[str, Any],
+    query_embeddings: Sequence[Sequence[float]],
+    n_results: int = 5,
+    where: Optional[Dict[str, Any]] = None,
+    warmup: int = 3
+) -> Dict[str, Dict[str, float]]:
+    """
+    Time single-query search latency on several collection-like backends
+
+    Args:
+        backends: Name -> object with a Chroma-style query() method
+        query_embeddings: Query vectors (one timed query each)
+        n_results: Results per query
+        where: Optional metadata filter
+        warmup: Untimed queries per backend before measuring
+
+    Returns:
+        Name -> {'p50_ms', 'p95_ms', 'mean_ms'}
+    """
+    report = {}
+    for name, backend in backends.items():
+        for embedding in list(query_embeddings)[:warmup]:
+            backend.query(query_embeddings=[embedding], n_results=n_results, where=where)
+        timings = []
+        for embedding in query_embeddings:
+            started = time.perf_counter()
+            backend.query(query_embeddings=[embedding], n_results=n_results, where=where)
+            timings.append((time.perf_counter() - started) * 1000)
+        timings = np.asarray(timings)
+        report[name] = {
+            "p50_ms": round(float(np.percentile(timings, 50)), 3),
+            "p95_ms": round(float(np.percentile(timings, 95)), 3),
+            "mean_ms": round(float(timings.mean()), 3)
+        }
+    return report
+
+
+if __name__ == "__main__":
+    # Latency comparison against the existing Chroma collection
+    import tempfile
+    import chromadb
+
+    chroma_path = os.getenv("CHROMA_PATH", "data/chroma_db")
+    collection = chromadb.PersistentClient(path=chroma_path).get_collection("lead_conversations")
+    index = NumpyVectorIndex(tempfile.mkdtemp(), name="lead_conversations")
+
+    print(f"📦 Copying {collection.count()} documents from {chroma_path}...")
+    copy_collection(collection, index)
+
+    sample = collection.get(limit=200, include=["embeddings"])["embeddings"]
+    rng = np.random.default_rng(0)
+    queries = [np.asarray(vector) + rng.normal(0, 0.01, len(vector)) for vector in sample]
+
+    for label, where in [("no filter", None), ("status filter", {"status": "Won"}),
+                         ("source filter", {"source": {"$in": ["raw_timeline", "raw_crm"]}})]:
+        print(f"\n⏱️  Query latency ({label}, {len(queries)} queries, top 5)")
+        for name, timing in compare_latency({"chroma": collection, "numpy": index}, queries, where=where).items():
+            print(f"   {name:<6} p50 {timing['p50_ms']:.2f} ms | p95 {timing['p95_ms']:.2f} ms | mean {timing['mean_ms']:.2f} ms")
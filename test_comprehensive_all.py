@@ -4,15 +4,21 @@ Comprehensive Test Suite - ALL Query Types
 Tests the complete system with all queries from all test files
 """
 
+import os
 import sys
 import time
 import json
 from datetime import datetime
+
+# Measure tool output tokens against the legacy encoding for the summary
+os.environ.setdefault("TOOL_OUTPUT_TRACK_SAVINGS", "1")
+
 from src.ai_agent_simple import SimpleLeadIntelligenceAgent
 
 class ComprehensiveTestSuite:
-    def __init__(self):
+    def __init__(self, baseline_file=None):
         self.agent = SimpleLeadIntelligenceAgent(db_path="data/leads.db")
+        self.baseline_file = baseline_file
         self.results = []
         self.start_time = time.time()
         
@@ -42,6 +48,7 @@ class ComprehensiveTestSuite:
         
         print(f"\nStatus: {status}")
         print(f"Time: {elapsed:.2f}s")
+        print(f"Iterations: {result.get('iterations')}")
         if success:
             print(f"Answer Length: {len(answer)} chars")
             print(f"Has Keywords: {has_keywords}")
@@ -56,6 +63,7 @@ class ComprehensiveTestSuite:
             'has_keywords': has_keywords,
             'sufficient_length': sufficient_length,
             'time': elapsed,
+            'iterations': result.get('iterations'),
             'answer': answer[:1000] if answer else None,
             'error': result.get('error')
         })
@@ -289,6 +297,10 @@ class ComprehensiveTestSuite:
         successful_times = [r['time'] for r in self.results if r['success']]
         avg_time = sum(successful_times) / len(successful_times) if successful_times else 0
         
+        # Agent iterations per query (fewer SQL retries → fewer GPT-4o round trips)
+        iteration_counts = [r['iterations'] for r in self.results if r.get('iterations') is not None]
+        avg_iterations = sum(iteration_counts) / len(iteration_counts) if iteration_counts else 0
+        
         print("\n\n" + "="*80)
         print("📊 COMPREHENSIVE TEST SUMMARY")
         print("="*80)
@@ -298,6 +310,12 @@ class ComprehensiveTestSuite:
         print(f"✅ Passed: {passed} ({passed/total_tests*100:.1f}%)")
         print(f"❌ Failed: {failed} ({failed/total_tests*100:.1f}%)")
         print(f"⚡ Average Response Time: {avg_time:.2f}s")
+        print(f"🔁 Average Agent Iterations: {avg_iterations:.2f} ({sum(iteration_counts)} total)")
+        if self.baseline_file:
+            self.compare_iterations(self.baseline_file)
+        output_stats = self.agent.get_tool_output_stats()
+        print(f"🪙 Tool Output Tokens: {output_stats['tokens']} "
+              f"(saved {output_stats['saved_tokens']}, {output_stats['saved_percent']}% vs indented JSON)")
         
         print(f"\n\n{'='*80}")
         print("📋 RESULTS BY CATEGORY")
@@ -359,6 +377,27 @@ class ComprehensiveTestSuite:
         # Save detailed results
         self.save_results()
     
+    def compare_iterations(self, baseline_file):
+        """Compare agent iterations per query with a saved results file (e.g. from before a change)"""
+        with open(baseline_file) as f:
+            baseline = {r['query']: r.get('iterations') for r in json.load(f)}
+        
+        pairs = [
+            (baseline[r['query']], r['iterations']) for r in self.results
+            if r.get('iterations') is not None and baseline.get(r['query']) is not None
+        ]
+        if not pairs:
+            print(f"⚠️  No comparable queries with iteration counts in {baseline_file}")
+            return
+        
+        before = sum(b for b, _ in pairs)
+        after = sum(a for _, a in pairs)
+        fewer = sum(1 for b, a in pairs if a < b)
+        more = sum(1 for b, a in pairs if a > b)
+        print(f"\n🔁 Iterations vs {baseline_file} ({len(pairs)} queries): "
+              f"{before / len(pairs):.2f} → {after / len(pairs):.2f} per query "
+              f"({fewer} fewer, {more} more, {len(pairs) - fewer - more} unchanged)")
+    
     def save_results(self):
         """Save detailed results to file"""
         timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
@@ -371,7 +410,9 @@ class ComprehensiveTestSuite:
 
 
 def main():
-    suite = ComprehensiveTestSuite()
+    # Optional: path to an earlier results JSON to compare agent iterations against
+    baseline_file = sys.argv[1] if len(sys.argv) > 1 else None
+    suite = ComprehensiveTestSuite(baseline_file=baseline_file)
     suite.run_all_tests()
 
 
@@ -0,0 +1,161 @@
+"""
+Answer Cache Tests
+Literal guards, scoping and persistence of the semantic answer cache
+"""
+
+import unittest
+import os
+import shutil
+import sys
+import tempfile
+
+# Add src to path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+from answer_cache import SemanticAnswerCache, entity_terms, question_literals
+from query_cache import DiskCache
+
+
+class FakeEmbedder:
+    """Embeds every question to the same vector (worst case for a similarity-only cache)"""
+    
+    def __init__(self):
+        self.calls = []
+    
+    def __call__(self, question):
+        self.calls.append(question)
+        return [1.0, 0.0, 0.0]
+
+
+TERMS = entity_terms(["Won", "Lost", "India", "China", "Ensuite"])
+
+
+class TestQuestionLiterals(unittest.TestCase):
+    """Signatures of the literals a question names"""
+    
+    def test_entities_numbers_and_quotes(self):
+        """Capitalized words, numbers and quoted strings are literals; question words are not"""
+        self.assertEqual(question_literals("How many Won leads are in India?"), "india|won")
+        self.assertEqual(question_literals("Show the top 1,000 leads"), "1000")
+        self.assertEqual(question_literals('Which leads mentioned "late checkout"?'), "late checkout")
+    
+    def test_entity_terms_match_lowercase(self):
+        """Known entity values count even when not capitalized"""
+        self.assertEqual(question_literals("how many won leads in india", TERMS), "india|won")
+        self.assertEqual(question_literals("count lost leads in china", TERMS), "china|lost")
+    
+    def test_comparisons_and_negations(self):
+        """Comparison and negation wording is part of the signature; synonyms share one qualifier"""
+        self.assertEqual(question_literals("leads with more than 5 tasks"), "5|op:>")
+        self.assertEqual(question_literals("leads with over 5 tasks"), "5|op:>")
+        self.assertEqual(question_literals("leads with at least 5 tasks"), "5|op:>=")
+        self.assertEqual(question_literals("leads with no more than 5 tasks"), "5|op:<=")
+        self.assertEqual(question_literals("leads with budget < 500"), "500|op:<")
+        self.assertEqual(question_literals("leads that haven't paid the deposit"), "op:not")
+        self.assertEqual(question_literals("no. of leads with a deposit"), "")
+
+
+class TestAnswerCacheLiteralGuard(unittest.TestCase):
+    """Near-duplicate questions naming different literals never hit"""
+    
+    def setUp(self):
+        """Cache with one answer about won leads in India"""
+        self.cache = SemanticAnswerCache()
+        self.embed = FakeEmbedder()
+        self.cache.add("How many Won leads are in India?", "12", self.embed, "leads.db", 1, TERMS)
+    
+    def test_different_entities_miss(self):
+        """Same embedding, different entities: no hit"""
+        self.assertIsNone(self.cache.lookup("How many Lost leads are in China?", self.embed, "leads.db", 1, TERMS))
+        self.assertIsNone(self.cache.lookup("how many won leads are in china", self.embed, "leads.db", 1, TERMS))
+    
+    def test_different_numbers_miss(self):
+        """Same embedding, different numbers: no hit"""
+        self.cache.add("Show the top 5 leads", "...", self.embed, "leads.db", 1, TERMS)
+        self.assertIsNone(self.cache.lookup("Show the top 10 leads", self.embed, "leads.db", 1, TERMS))
+    
+    def test_different_comparisons_and_negations_miss(self):
+        """Same embedding and literals, opposite comparison or negation: no hit"""
+        pairs = [
+            ("How many leads have more than 5 tasks?", "How many leads have less than 5 tasks?"),
+            ("How many leads have at least 5 tasks?", "How many leads have at most 5 tasks?"),
+            ("Leads with budget above 500", "Leads with budget below 500"),
+            ("Leads with budget > 500", "Leads with budget < 500"),
+            ("won leads in india with a guarantor", "won leads in india without a guarantor"),
+            ("won leads in india", "won leads not in india"),
+            ("won leads in india", "won leads excluding india"),
+        ]
+        for cached, asked in pairs:
+            with self.subTest(cached=cached, asked=asked):
+                self.cache.add(cached, "...", self.embed, "leads.db", 1, TERMS)
+                self.assertIsNone(self.cache.lookup(asked, self.embed, "leads.db", 1, TERMS))
+        hit = self.cache.lookup("Leads with budget over 500", self.embed, "leads.db", 1, TERMS)
+        self.assertEqual(hit["answer"], "...")
+    
+    def test_paraphrase_with_same_literals_hits(self):
+        """A paraphrase naming the same entities is served from the cache"""
+        hit = self.cache.lookup("count won leads in india", self.embed, "leads.db", 1, TERMS)
+        self.assertEqual(hit["answer"], "12")
+    
+    def test_embedding_only_when_needed(self):
+        """Exact repeats and questions without same-literal answers are not embedded"""
+        calls = len(self.embed.calls)
+        self.assertEqual(self.cache.lookup("how many won leads are in India", self.embed, "leads.db", 1, TERMS)["similarity"], 1.0)
+        self.assertIsNone(self.cache.lookup("How many Lost leads are in China?", self.embed, "leads.db", 1, TERMS))
+        self.assertEqual(len(self.embed.calls), calls)
+    
+    def test_scope_namespace_and_version(self):
+        """Answers are not shared across namespaces (e.g. modes) or versions"""
+        self.assertIsNone(self.cache.lookup("How many Won leads are in India?", self.embed, "other", 1, TERMS))
+        self.assertIsNone(self.cache.lookup("How many Won leads are in India?", self.embed, "leads.db", 2, TERMS))
+
+
+class TestAnswerCacheDiskTier(unittest.TestCase):
+    """Answers persist across restarts while the data version is unchanged"""
+    
+    def setUp(self):
+        """Temporary disk cache file"""
+        self.directory = tempfile.mkdtemp()
+        self.disk_path = os.path.join(self.directory, "cache.db")
+        self.embed = FakeEmbedder()
+    
+    def tearDown(self):
+        """Remove the temporary directory"""
+        shutil.rmtree(self.directory, ignore_errors=True)
+    
+    def test_cold_start_hit(self):
+        """A new cache instance answers from the disk tier, literal guard included"""
+        SemanticAnswerCache(l2=DiskCache(self.disk_path)).add(
+            "How many Won leads?", "42 leads", self.embed, "leads.db", ("v", 1)
+        )
+        
+        restarted = SemanticAnswerCache(l2=DiskCache(self.disk_path))
+        hit = restarted.lookup("Number of Won leads", self.embed, "leads.db", ("v", 1))
+        self.assertIsNotNone(hit)
+        self.assertEqual(hit["answer"], "42 leads")
+        self.assertIsNone(restarted.lookup("Number of Lost leads", self.embed, "leads.db", ("v", 1)))
+        self.assertEqual(restarted.get_stats()["entries"], 1)
+    
+    def test_cold_start_other_version_misses(self):
+        """Answers stored for another data version are never loaded"""
+        SemanticAnswerCache(l2=DiskCache(self.disk_path)).add(
+            "How many leads?", "42 leads", self.embed, "leads.db", ("v", 1)
+        )
+        
+        restarted = SemanticAnswerCache(l2=DiskCache(self.disk_path))
+        self.assertIsNone(restarted.lookup("How many leads?", self.embed, "leads.db", ("v", 2)))
+    
+    def test_new_version_drops_disk_answers(self):
+        """Moving to a new version removes the old version's answers from disk"""
+        disk = DiskCache(self.disk_path)
+        cache = SemanticAnswerCache(l2=disk)
+        cache.add("How many leads?", "42 leads", self.embed, "leads.db", ("v", 1))
+        cache.add("How many won?", "7 won", self.embed, "leads.db", ("v", 2))
+        self.assertEqual(disk.get_stats()["size"], 1)
+        
+        restarted = SemanticAnswerCache(l2=DiskCache(self.disk_path))
+        self.assertIsNone(restarted.lookup("How many leads?", self.embed, "leads.db", ("v", 1)))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,150 @@
+"""
+Connection Pool Tests
+Tuning profiles, benchmarking and pool bookkeeping
+"""
+
+import unittest
+import sqlite3
+import os
+import sys
+import tempfile
+import threading
+
+# Add src to path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+from connection_pool import (
+    INGEST_PROFILE, SQLiteConnectionPool, benchmark_profiles, open_ingest_connection
+)
+from sql_executor import CONNECTION_PROFILE, CONNECTION_PROFILE_ENV_VAR, SQLExecutor
+
+
+class TestTuningProfiles(unittest.TestCase):
+    """Profiles are applied where they can take effect"""
+    
+    def setUp(self):
+        """Create a small leads database"""
+        self.test_db = tempfile.mktemp(suffix='.db')
+        conn = sqlite3.connect(self.test_db)
+        conn.execute("CREATE TABLE leads (lead_id INTEGER PRIMARY KEY, status TEXT)")
+        conn.executemany("INSERT INTO leads VALUES (?, ?)", [(i, "Won") for i in range(20)])
+        conn.commit()
+        conn.close()
+    
+    def tearDown(self):
+        """Clean up test database"""
+        for suffix in ('', '-wal', '-shm'):
+            if os.path.exists(self.test_db + suffix):
+                os.remove(self.test_db + suffix)
+    
+    def test_ingest_connection_uses_wal(self):
+        """The ingest profile's journal mode and sync level apply on writable connections"""
+        conn = open_ingest_connection(self.test_db)
+        try:
+            self.assertEqual(conn.execute("PRAGMA journal_mode").fetchone()[0].lower(), "wal")
+            self.assertEqual(conn.execute("PRAGMA synchronous").fetchone()[0], 1)  # NORMAL
+        finally:
+            conn.close()
+    
+    def test_benchmark_skips_ingest_profile(self):
+        """Read benchmarks compare read profiles only"""
+        report = benchmark_profiles(self.test_db, queries=["SELECT COUNT(*) FROM leads"], iterations=2)
+        self.assertNotIn(INGEST_PROFILE, report["timings"])
+        self.assertIn("default", report["timings"])
+        self.assertIn(report["best_profile"], report["timings"])
+        self.assertEqual(report["queries"], 1)
+    
+    def test_benchmark_drops_failing_queries(self):
+        """Queries this database cannot run are skipped"""
+        report = benchmark_profiles(
+            self.test_db, queries=["SELECT COUNT(*) FROM leads", "SELECT * FROM missing"], iterations=1
+        )
+        self.assertEqual(report["queries"], 1)
+    
+    def test_executor_profile_configurable(self):
+        """The executor profile comes from the argument, then the environment, then the default"""
+        previous = os.environ.pop(CONNECTION_PROFILE_ENV_VAR, None)
+        try:
+            self.assertEqual(SQLExecutor(self.test_db, use_pool=False).profile, CONNECTION_PROFILE)
+            os.environ[CONNECTION_PROFILE_ENV_VAR] = "default"
+            self.assertEqual(SQLExecutor(self.test_db, use_pool=False).profile, "default")
+            executor = SQLExecutor(self.test_db, use_pool=False, profile="read_heavy_analytics")
+            self.assertEqual(executor.profile, "read_heavy_analytics")
+            self.assertIsNone(executor.execute("SELECT COUNT(*) FROM leads")['error'])
+        finally:
+            os.environ.pop(CONNECTION_PROFILE_ENV_VAR, None)
+            if previous is not None:
+                os.environ[CONNECTION_PROFILE_ENV_VAR] = previous
+
+
+class TestConnectionPool(unittest.TestCase):
+    """Checkout, recycling and metrics"""
+    
+    def setUp(self):
+        """Create an empty database"""
+        self.test_db = tempfile.mktemp(suffix='.db')
+        sqlite3.connect(self.test_db).close()
+    
+    def tearDown(self):
+        """Clean up test database"""
+        if os.path.exists(self.test_db):
+            os.remove(self.test_db)
+    
+    def test_connection_pool_timeout_when_exhausted(self):
+        """Test checkout times out (and is counted) only when the pool is at capacity"""
+        pool = SQLiteConnectionPool(self.test_db, max_connections=1, timeout=0.2)
+        conn = pool.get_connection()
+        
+        with self.assertRaises(TimeoutError):
+            pool.get_connection()
+        
+        metrics = pool.get_metrics()
+        self.assertEqual(metrics['timeouts'], 1)
+        self.assertEqual(metrics['checkouts'], 1)
+        
+        pool.return_connection(conn)
+        pool.close_all()
+    
+    def test_idle_connection_recycled(self):
+        """Connections idle longer than max_idle are replaced on checkout"""
+        pool = SQLiteConnectionPool(self.test_db, max_connections=1, max_idle=0)
+        conn = pool.get_connection()
+        pool.return_connection(conn)
+        
+        replacement = pool.get_connection()
+        self.assertEqual(pool.get_metrics()['recycled'], 1)
+        self.assertEqual(replacement.execute("SELECT 1").fetchone()[0], 1)
+        pool.return_connection(replacement)
+        pool.close_all()
+    
+    def test_stats_under_concurrent_checkouts(self):
+        """Concurrent checkouts never exceed capacity and leave consistent stats"""
+        pool = SQLiteConnectionPool(self.test_db, max_connections=3, timeout=5)
+        errors = []
+        
+        def worker():
+            try:
+                for _ in range(50):
+                    conn = pool.get_connection()
+                    conn.execute("SELECT 1").fetchone()
+                    stats = pool.get_stats()
+                    self.assertLessEqual(stats['created_connections'], 3)
+                    pool.return_connection(conn)
+            except Exception as e:
+                errors.append(e)
+        
+        threads = [threading.Thread(target=worker) for _ in range(6)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        
+        self.assertEqual(errors, [])
+        stats = pool.get_stats()
+        self.assertEqual(stats['in_use_connections'], 0)
+        self.assertEqual(stats['metrics']['checkouts'], 300)
+        pool.close_all()
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,121 @@
+"""
+Embedding Pipeline Tests
+Batching limits, single-writer ordering and failure handling with a fake embed_fn
+"""
+
+import unittest
+import os
+import sys
+import threading
+import time
+
+# Add src to path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+from embedding_pipeline import EmbeddingPipeline
+from token_counter import count_tokens
+
+
+MODEL = "text-embedding-3-small"
+
+
+class FakeEmbedder:
+    """embed_fn returning one [len(text)] vector per text, optionally failing or slow"""
+    
+    def __init__(self, fail_on=None, delays=None):
+        self.fail_on = fail_on
+        self.delays = delays or {}
+        self.batches = []
+        self.lock = threading.Lock()
+    
+    def __call__(self, texts):
+        with self.lock:
+            self.batches.append(list(texts))
+        time.sleep(self.delays.get(texts[0], 0))
+        if self.fail_on is not None and self.fail_on in texts:
+            raise RuntimeError("embedding request failed")
+        return [[float(len(text))] for text in texts]
+
+
+def items(count, words=5):
+    """(key, text) items with distinct texts of a few words each"""
+    return [(i, " ".join(f"word{i}" for _ in range(words))) for i in range(count)]
+
+
+class TestEmbeddingPipeline(unittest.TestCase):
+    """Batches respect limits, writes stay on one thread, failures stop the run"""
+    
+    def test_token_limit_per_batch(self):
+        """Batches stay under the token limit (a single oversized text goes alone)"""
+        embedder = FakeEmbedder()
+        texts = items(20) + [(99, "long " * 200)]
+        limit = 3 * count_tokens(texts[0][1], MODEL)
+        pipeline = EmbeddingPipeline(embedder, model=MODEL, concurrency=1, max_batch_tokens=limit)
+        pipeline.run_stream(iter(texts), lambda keys, embeddings: None)
+        
+        for batch in embedder.batches:
+            tokens = sum(count_tokens(text, MODEL) for text in batch)
+            self.assertTrue(tokens <= limit or len(batch) == 1)
+        self.assertIn(["long " * 200], embedder.batches)
+        self.assertEqual(sum(len(batch) for batch in embedder.batches), 21)
+    
+    def test_input_limit_per_batch(self):
+        """No batch has more inputs than max_batch_inputs"""
+        embedder = FakeEmbedder()
+        pipeline = EmbeddingPipeline(embedder, model=MODEL, concurrency=2, max_batch_inputs=3)
+        stats = pipeline.run_stream(iter(items(10)), lambda keys, embeddings: None)
+        self.assertEqual(sorted(len(batch) for batch in embedder.batches), [1, 3, 3, 3])
+        self.assertEqual((stats["documents"], stats["batches"]), (10, 4))
+    
+    def test_writes_on_calling_thread_with_matching_embeddings(self):
+        """Every batch is written once, on the calling thread, with its own embeddings"""
+        texts = items(12, words=1) + [(12, "x" * 40)]
+        # The first batch finishes last, so writes follow completion order
+        embedder = FakeEmbedder(delays={texts[0][1]: 0.2})
+        written = []
+        caller = threading.get_ident()
+        
+        def write_fn(keys, embeddings):
+            self.assertEqual(threading.get_ident(), caller)
+            written.append(keys)
+            for key, embedding in zip(keys, embeddings):
+                self.assertEqual(embedding, [float(len(dict(texts)[key]))])
+        
+        pipeline = EmbeddingPipeline(embedder, model=MODEL, concurrency=4, max_batch_inputs=2)
+        pipeline.run_stream(iter(texts), write_fn)
+        self.assertEqual(sorted(key for keys in written for key in keys), list(range(13)))
+        self.assertEqual(written[-1], [0, 1])
+    
+    def test_failure_stops_new_batches(self):
+        """A failed batch is sent once, stops the run, and earlier batches stay written"""
+        texts = items(20, words=1)
+        embedder = FakeEmbedder(fail_on=texts[4][1])
+        written = []
+        pipeline = EmbeddingPipeline(embedder, model=MODEL, concurrency=1, max_batch_inputs=2)
+        
+        with self.assertRaises(RuntimeError):
+            pipeline.run_stream(iter(texts), lambda keys, embeddings: written.append(keys))
+        
+        failing = [batch for batch in embedder.batches if texts[4][1] in batch]
+        self.assertEqual(len(failing), 1)  # No retries on top of embed_fn's own
+        self.assertEqual(written[:2], [[0, 1], [2, 3]])
+        self.assertLess(len(embedder.batches), 10)
+    
+    def test_stream_pulled_lazily(self):
+        """Only a bounded number of items is read ahead of the writer"""
+        pulled = []
+        
+        def stream():
+            for item in items(100, words=1):
+                pulled.append(item[0])
+                yield item
+        
+        pipeline = EmbeddingPipeline(FakeEmbedder(), model=MODEL, concurrency=1, max_batch_inputs=1)
+        seen_at_first_write = []
+        pipeline.run_stream(stream(), lambda keys, embeddings: seen_at_first_write.append(len(pulled)))
+        self.assertLessEqual(seen_at_first_write[0], 4)
+        self.assertEqual(len(pulled), 100)
+
+
+if __name__ == '__main__':
+    unittest.main()
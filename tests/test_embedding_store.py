@@ -0,0 +1,116 @@
+"""
+Embedding Store Tests
+Persistence, crash recovery and deduplication of the local embedding store
+"""
+
+import unittest
+import os
+import shutil
+import sys
+import tempfile
+
+# Add src to path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+from embedding_store import EmbeddingStore
+
+
+def fake_vector(text, dimensions=4):
+    """Deterministic embedding for a text"""
+    return [float(len(text)), float(sum(map(ord, text)) % 97), float(text.count("a")), 1.0][:dimensions]
+
+
+class CountingEmbedder:
+    """embed_fn that records every batch it is asked to embed"""
+    
+    def __init__(self):
+        self.batches = []
+    
+    def __call__(self, texts):
+        self.batches.append(list(texts))
+        return [fake_vector(text) for text in texts]
+
+
+class TestEmbeddingStore(unittest.TestCase):
+    """Append, reload, crash recovery and dedup"""
+    
+    def setUp(self):
+        """Empty store directory"""
+        self.path = tempfile.mkdtemp()
+    
+    def tearDown(self):
+        """Remove the store directory"""
+        shutil.rmtree(self.path, ignore_errors=True)
+    
+    def test_append_and_reload(self):
+        """Vectors appended over several calls are all found after reopening"""
+        store = EmbeddingStore(self.path, model="test-model")
+        store.put_many(["alpha", "beta"], [fake_vector("alpha"), fake_vector("beta")])
+        store.put_many(["gamma"], [fake_vector("gamma")])
+        
+        reopened = EmbeddingStore(self.path, model="test-model")
+        self.assertEqual(len(reopened), 3)
+        self.assertEqual(reopened.dimensions, 4)
+        for text in ("alpha", "beta", "gamma"):
+            self.assertEqual(reopened.get(text), fake_vector(text))
+        self.assertIsNone(reopened.get("delta"))
+    
+    def test_models_are_kept_apart(self):
+        """A store for another model does not see these vectors"""
+        EmbeddingStore(self.path, model="test-model").put_many(["alpha"], [fake_vector("alpha")])
+        self.assertIsNone(EmbeddingStore(self.path, model="other-model").get("alpha"))
+    
+    def test_orphan_rows_truncated(self):
+        """Vectors written without their digests (a crash in between) are dropped on open"""
+        store = EmbeddingStore(self.path, model="test-model")
+        store.put_many(["alpha", "beta"], [fake_vector("alpha"), fake_vector("beta")])
+        vectors_path = os.path.join(store.directory, "vectors.f32")
+        size = os.path.getsize(vectors_path)
+        with open(vectors_path, "ab") as f:
+            f.write(b"\x00" * (4 * 4 * 3 + 2))  # Three orphan rows and a torn one
+        
+        reopened = EmbeddingStore(self.path, model="test-model")
+        self.assertEqual(len(reopened), 2)
+        self.assertEqual(os.path.getsize(vectors_path), size)
+        self.assertEqual(reopened.get("beta"), fake_vector("beta"))
+        
+        # Appending after recovery keeps rows and digests aligned
+        reopened.put_many(["gamma"], [fake_vector("gamma")])
+        self.assertEqual(EmbeddingStore(self.path, model="test-model").get("gamma"), fake_vector("gamma"))
+    
+    def test_digests_without_vectors_dropped(self):
+        """Index lines past the end of the vectors file are ignored and removed"""
+        store = EmbeddingStore(self.path, model="test-model")
+        store.put_many(["alpha"], [fake_vector("alpha")])
+        with open(os.path.join(store.directory, "index.txt"), "a") as f:
+            f.write("0" * 64 + "\n")
+        
+        reopened = EmbeddingStore(self.path, model="test-model")
+        self.assertEqual(len(reopened), 1)
+        with open(os.path.join(store.directory, "index.txt")) as f:
+            self.assertEqual(len(f.read().split()), 1)
+    
+    def test_repeated_texts_embedded_once(self):
+        """Duplicate texts in a batch and texts already stored are not re-embedded"""
+        store = EmbeddingStore(self.path, model="test-model")
+        embedder = CountingEmbedder()
+        
+        first = store.embed_documents(["alpha", "beta", "alpha"], embedder)
+        self.assertEqual(embedder.batches, [["alpha", "beta"]])
+        self.assertEqual(first, [fake_vector("alpha"), fake_vector("beta"), fake_vector("alpha")])
+        
+        second = store.embed_documents(["beta", "gamma", "gamma"], embedder)
+        self.assertEqual(embedder.batches[1], ["gamma"])
+        self.assertEqual(second, [fake_vector("beta"), fake_vector("gamma"), fake_vector("gamma")])
+        self.assertEqual(len(store), 3)
+    
+    def test_dimension_mismatch_rejected(self):
+        """Vectors of a different size cannot be mixed into a store"""
+        store = EmbeddingStore(self.path, model="test-model")
+        store.put_many(["alpha"], [fake_vector("alpha")])
+        with self.assertRaises(ValueError):
+            store.put_many(["beta"], [[1.0, 2.0]])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,150 @@
+"""
+Lexical Search Tests
+Indexing, incremental sync, BM25 search and rank fusion of the lexical index
+"""
+
+import unittest
+import os
+import shutil
+import sqlite3
+import sys
+import tempfile
+from unittest import mock
+
+# Add src to path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+import lexical_search
+from connection_pool import fts_read_only_authorizer, open_read_only_connection
+from lexical_search import LexicalIndex, fts_query, reciprocal_rank_fusion
+from sync_manifest import document_hash
+
+
+def entry(doc_id, text, source="summary", **metadata):
+    """(doc_id, text, metadata, content_hash) tuple as passed by a sync"""
+    metadata = {"source": source, **metadata}
+    return doc_id, text, metadata, document_hash(text, metadata)
+
+
+class TestLexicalIndex(unittest.TestCase):
+    """Documents are indexed by sync runs and searched read-only"""
+    
+    def setUp(self):
+        """Index with a few documents from one sync run"""
+        self.directory = tempfile.mkdtemp()
+        self.index = LexicalIndex(os.path.join(self.directory, "lexical_index.db"))
+        self.documents = [
+            entry("doc_1", "Asked whether the studio has wifi and a desk", status="Won", lead_id="L1"),
+            entry("doc_2", "Wants the deposit refunded after the visa was rejected", status="Lost", lead_id="L2"),
+            entry("raw_timeline_L3_timeline", "Guarantor form sent, waiting on the deposit", "raw_timeline",
+                  status="Won", lead_id="L3"),
+        ]
+        self.assertEqual(self.index.upsert(self.documents, run_id="run-1"), 3)
+    
+    def tearDown(self):
+        """Close and remove the index"""
+        self.index.close()
+        shutil.rmtree(self.directory, ignore_errors=True)
+    
+    def ids(self, query, **kwargs):
+        return [result['id'] for result in self.index.search(query, **kwargs)]
+    
+    def test_search_returns_document_ids(self):
+        """Results carry the synced document id, text and metadata"""
+        results = self.index.search("wifi")
+        self.assertEqual(len(results), 1)
+        self.assertEqual(results[0]['id'], "doc_1")
+        self.assertEqual(results[0]['content'], self.documents[0][1])
+        self.assertEqual(results[0]['metadata']['status'], "Won")
+        self.assertEqual(results[0]['retrieval'], "lexical")
+        self.assertGreater(results[0]['bm25'], 0)
+    
+    def test_ranking_stemming_and_filters(self):
+        """Stemmed terms match, more matching terms rank first, filters apply to metadata"""
+        self.assertEqual(self.ids("refund"), ["doc_2"])
+        self.assertEqual(self.ids("deposit visa")[0], "doc_2")
+        self.assertEqual(sorted(self.ids("deposit")), ["doc_2", "raw_timeline_L3_timeline"])
+        self.assertEqual(self.ids("deposit", filter_dict={"source": "raw_timeline"}), ["raw_timeline_L3_timeline"])
+        self.assertEqual(self.ids("deposit", n_results=1, filter_dict={"status": {"$in": ["Won"]}}),
+                         ["raw_timeline_L3_timeline"])
+        self.assertEqual(self.ids("what is the"), [])
+        self.assertEqual(self.ids('wifi" OR NEAR(desk'), ["doc_1"])  # FTS5 syntax is inert
+    
+    def test_unchanged_documents_not_rewritten(self):
+        """A second sync of the same documents writes nothing"""
+        self.assertEqual(self.index.upsert(self.documents, run_id="run-2"), 0)
+        self.assertEqual(self.index.count(), 3)
+    
+    def test_changed_document_reindexed(self):
+        """A changed text replaces the old one in the index"""
+        changed = entry("doc_1", "Asked about parking spaces", status="Won", lead_id="L1")
+        self.assertEqual(self.index.upsert([changed, *self.documents[1:]], run_id="run-2"), 1)
+        self.assertEqual(self.ids("wifi"), [])
+        self.assertEqual(self.ids("parking"), ["doc_1"])
+        self.assertEqual(self.index.count(), 3)
+    
+    def test_remove_stale_only_for_synced_sources(self):
+        """Documents a run did not see are removed, but only for the sources it covers"""
+        self.index.upsert(self.documents[1:2], run_id="run-2")
+        self.assertEqual(self.index.remove_stale({"summary"}, "run-2"), 1)
+        self.assertEqual(self.ids("wifi"), [])
+        self.assertEqual(sorted(self.ids("deposit")), ["doc_2", "raw_timeline_L3_timeline"])
+    
+    def test_search_never_creates_the_index(self):
+        """Searching a missing index returns nothing and leaves no file behind"""
+        path = os.path.join(self.directory, "missing", "lexical_index.db")
+        index = LexicalIndex(path)
+        self.assertEqual(index.search("wifi"), [])
+        self.assertEqual(index.count(), 0)
+        self.assertFalse(os.path.exists(path))
+        self.assertFalse(os.path.exists(os.path.dirname(path)))
+    
+    def test_search_connection_cannot_write(self):
+        """The authorizer used for searching lets FTS5 read but still denies writes and DDL"""
+        conn = open_read_only_connection(self.index.path, authorizer=fts_read_only_authorizer)
+        try:
+            self.assertEqual(conn.execute("SELECT COUNT(*) FROM lexical_fts WHERE lexical_fts MATCH 'wifi'").fetchone()[0], 1)
+            for statement in ("INSERT INTO lexical_fts (content) VALUES ('x')", "DELETE FROM lexical_documents",
+                              "UPDATE sqlite_master SET sql = ''", "CREATE TABLE t (x)", "PRAGMA journal_mode = DELETE"):
+                with self.assertRaises(sqlite3.Error, msg=statement):
+                    conn.execute(statement)
+        finally:
+            conn.close()
+        self.assertEqual(self.index.count(), 3)
+    
+    def test_unavailable_index_does_not_fail_writes(self):
+        """If the FTS table cannot be created (e.g. no FTS5), writes are skipped instead of raising"""
+        index = LexicalIndex(os.path.join(self.directory, "broken.db"))
+        with mock.patch.object(lexical_search, "FTS_TABLE", "not a valid name"):
+            self.assertEqual(index.upsert(self.documents, run_id="run-1"), 0)
+            self.assertEqual(index.remove_stale({"summary"}, "run-1"), 0)
+        self.assertIsNotNone(index.error)
+        self.assertEqual(index.search("wifi"), [])
+
+
+class TestFusion(unittest.TestCase):
+    """Query parsing and reciprocal rank fusion"""
+    
+    def test_fts_query(self):
+        """Stopwords are dropped, words quoted and de-duplicated"""
+        self.assertEqual(fts_query("Show me the WiFi and wifi speed"), '"wifi" OR "speed"')
+        self.assertIsNone(fts_query("what is the"))
+    
+    def test_fusion_merges_by_document_id(self):
+        """A document found by both retrievers is merged and ranked first"""
+        vector = [
+            {'id': "doc_1", 'content': "a", 'distance': 0.2, 'retrieval': "vector"},
+            {'id': "raw_crm_L1_crm_chunk_0", 'content': "b", 'distance': 0.3, 'retrieval': "vector"},
+        ]
+        lexical = [
+            {'id': "raw_crm_L1_crm_chunk_0", 'content': "b", 'bm25': 4.2, 'retrieval': "lexical"},
+            {'id': "doc_9", 'content': "c", 'bm25': 1.0, 'retrieval': "lexical"},
+        ]
+        fused = reciprocal_rank_fusion([vector, lexical])
+        self.assertEqual([result['id'] for result in fused], ["raw_crm_L1_crm_chunk_0", "doc_1", "doc_9"])
+        self.assertEqual(fused[0]['retrieval'], "hybrid")
+        self.assertEqual((fused[0]['distance'], fused[0]['bm25']), (0.3, 4.2))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,287 @@
+"""
+Query Cache Tests
+TTL, byte budget, invalidation and concurrency of the in-memory query cache
+"""
+
+import unittest
+import os
+import shutil
+import sqlite3
+import stat
+import sys
+import tempfile
+import threading
+import time
+
+# Add src to path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+from query_cache import DiskCache, QueryCache, cached
+from sql_executor import SQLExecutor
+
+
+class FakeClock:
+    """Manually advanced time source"""
+    
+    def __init__(self, start=1000.0):
+        self.now = start
+    
+    def __call__(self):
+        return self.now
+    
+    def advance(self, seconds):
+        self.now += seconds
+
+
+class TestQueryCache(unittest.TestCase):
+    """TTL, byte budget and invalidation"""
+    
+    def setUp(self):
+        """Cache on a fake clock"""
+        self.clock = FakeClock()
+        self.cache = QueryCache(max_size=10, default_ttl=100, clock=self.clock)
+    
+    def test_cache_per_entry_ttl(self):
+        """Test per-entry TTL overrides the default"""
+        self.cache.set('short', 'value1', ttl=1)
+        self.cache.set('long', 'value2')
+        
+        self.clock.advance(1.5)
+        self.assertIsNone(self.cache.get('short'))
+        self.assertEqual(self.cache.get('long'), 'value2')
+        self.assertEqual(self.cache.get_stats()['expirations'], 1)
+        
+        self.clock.advance(100)
+        self.assertIsNone(self.cache.get('long'))
+    
+    def test_no_expiry(self):
+        """default_ttl=None keeps entries until evicted"""
+        cache = QueryCache(max_size=10, default_ttl=None, clock=self.clock)
+        cache.set('key', 'value')
+        self.clock.advance(10 ** 9)
+        self.assertEqual(cache.get('key'), 'value')
+    
+    def test_byte_budget(self):
+        """Large values are weighed by size, and values over the whole budget are not cached"""
+        cache = QueryCache(max_size=100, default_ttl=60, max_bytes=50_000, clock=self.clock)
+        cache.set('big', [{'id': i, 'name': f'lead {i}'} for i in range(2000)])
+        self.assertIsNone(cache.get('big'))
+        for i in range(20):
+            cache.set(f'rows{i}', [{'id': j} for j in range(50)])
+        stats = cache.get_stats()
+        self.assertLessEqual(stats['bytes'], 50_000)
+        self.assertGreater(stats['evictions'], 0)
+        self.assertIsNotNone(cache.get('rows19'))
+    
+    def test_invalidate_tag_and_namespace(self):
+        """Tags and namespaces drop exactly their entries"""
+        self.cache.set('a', 1, tags=['leads'], namespace='report')
+        self.cache.set('b', 2, tags=['leads'])
+        self.cache.set('c', 3, namespace='report')
+        self.cache.set('d', 4)
+        self.assertEqual(self.cache.invalidate_tag('leads'), 2)
+        self.assertEqual(self.cache.invalidate_namespace('report'), 1)
+        self.assertEqual(self.cache.get('d'), 4)
+        self.assertEqual(len(self.cache), 1)
+    
+    def test_cached_decorator_cache_clear(self):
+        """Test cache_clear only drops the decorated function's entries"""
+        self.cache.set('unrelated', 'value')
+        
+        @cached(cache_instance=self.cache)
+        def double(x):
+            return x * 2
+        
+        double(1)
+        double(2)
+        self.assertEqual(double.cache_clear(), 2)
+        self.assertEqual(self.cache.get('unrelated'), 'value')
+
+
+class TestQueryCacheStripes(unittest.TestCase):
+    """Capacity and LRU order span all stripes; single-flight coalescing"""
+    
+    def test_max_size_is_global(self):
+        """A striped cache holds exactly max_size entries, evicting the globally oldest"""
+        cache = QueryCache(max_size=8, default_ttl=None, stripes=4)
+        for i in range(8):
+            cache.set(f'key{i}', i)
+        cache.get('key0')  # Most recently used now
+        cache.set('key8', 8)
+        
+        self.assertEqual(len(cache), 8)
+        self.assertNotIn('key1', cache)
+        self.assertIn('key0', cache)
+        self.assertEqual(cache.get_stats()['evictions'], 1)
+        
+        for i in range(9, 100):
+            cache.set(f'key{i}', i)
+        self.assertEqual(len(cache), 8)
+        self.assertEqual(sorted(int(item['key'][3:]) for item in cache.get_stats()['items']), list(range(92, 100)))
+    
+    def test_max_bytes_is_global(self):
+        """The byte budget covers all stripes together"""
+        cache = QueryCache(max_size=1000, default_ttl=None, max_bytes=20_000, stripes=8)
+        for i in range(200):
+            cache.set(f'rows{i}', [{'id': j} for j in range(10)])
+        self.assertLessEqual(cache.get_stats()['bytes'], 20_000)
+        self.assertIn('rows199', cache)
+    
+    def test_cache_single_flight(self):
+        """Test concurrent misses on one key share a single computation"""
+        cache = QueryCache(max_size=10, default_ttl=100, stripes=4)
+        calls = []
+        
+        @cached(cache_instance=cache, single_flight=True)
+        def top_concerns(week):
+            calls.append(week)
+            time.sleep(0.2)
+            return ['budget', 'location']
+        
+        threads = [threading.Thread(target=top_concerns, args=(1,)) for _ in range(5)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        
+        self.assertEqual(len(calls), 1)
+        self.assertEqual(top_concerns(1), ['budget', 'location'])
+    
+    def test_single_flight_error_shared(self):
+        """Waiters receive the leader's exception and nothing is cached"""
+        cache = QueryCache(max_size=10, default_ttl=100)
+        started = threading.Event()
+        errors = []
+        
+        def compute():
+            started.set()
+            time.sleep(0.1)
+            raise ValueError("boom")
+        
+        def call():
+            try:
+                cache.get_or_compute('key', compute)
+            except ValueError as e:
+                errors.append(e)
+        
+        leader = threading.Thread(target=call)
+        leader.start()
+        started.wait()
+        follower = threading.Thread(target=call)
+        follower.start()
+        leader.join()
+        follower.join()
+        self.assertEqual(len(errors), 2)
+        self.assertNotIn('key', cache)
+    
+    def test_nested_same_key_raises(self):
+        """A compute function asking for its own key fails instead of deadlocking"""
+        cache = QueryCache(max_size=10, default_ttl=100)
+        outcome = []
+        
+        def compute():
+            return cache.get_or_compute('key', lambda: 'inner')
+        
+        def call():
+            try:
+                cache.get_or_compute('key', compute)
+            except RuntimeError as e:
+                outcome.append(e)
+        
+        thread = threading.Thread(target=call, daemon=True)
+        thread.start()
+        thread.join(timeout=2)
+        self.assertFalse(thread.is_alive())
+        self.assertEqual(len(outcome), 1)
+        # The failed flight is cleaned up, so the key can be computed again
+        self.assertEqual(cache.get_or_compute('key', lambda: 'value'), 'value')
+
+
+
+class TestDiskTierColdStart(unittest.TestCase):
+    """The persistent tier serves a fresh process (new cache objects on the same file)"""
+    
+    def setUp(self):
+        """Temporary directory for the cache file and a small database"""
+        self.directory = tempfile.mkdtemp()
+        self.disk_path = os.path.join(self.directory, "cache.db")
+        self.test_db = os.path.join(self.directory, "leads.db")
+        conn = sqlite3.connect(self.test_db)
+        conn.execute("CREATE TABLE leads (lead_id INTEGER PRIMARY KEY, status TEXT)")
+        conn.executemany("INSERT INTO leads VALUES (?, ?)", [(i, "Won" if i % 2 else "Lost") for i in range(10)])
+        conn.commit()
+        conn.close()
+    
+    def tearDown(self):
+        """Remove the temporary directory"""
+        shutil.rmtree(self.directory, ignore_errors=True)
+    
+    def test_file_is_owner_only(self):
+        """The cache file is created without group/other access"""
+        DiskCache(self.disk_path).close()
+        self.assertEqual(stat.S_IMODE(os.stat(self.disk_path).st_mode) & 0o077, 0)
+    
+    def test_values_round_trip_as_json(self):
+        """JSON values survive a restart; values JSON can't hold are not stored"""
+        disk = DiskCache(self.disk_path)
+        self.assertTrue(disk.set("rows", {"rows": [{"id": 1, "name": "Acme"}], "truncated": False}))
+        self.assertTrue(disk.set("pair", (1, 2)))
+        self.assertFalse(disk.set("blob", b"\x00\x01"))
+        self.assertFalse(disk.set("object", object()))
+        disk.close()
+        
+        restarted = DiskCache(self.disk_path)
+        self.assertEqual(restarted.get("rows"), {"rows": [{"id": 1, "name": "Acme"}], "truncated": False})
+        self.assertEqual(restarted.get("pair"), [1, 2])
+        self.assertIsNone(restarted.get("blob"))
+        restarted.close()
+    
+    def test_query_cache_cold_start(self):
+        """An empty in-memory cache is filled from disk and keeps the entry's TTL"""
+        clock = FakeClock()
+        QueryCache(max_size=5, default_ttl=60, l2=DiskCache(self.disk_path, clock=clock), clock=clock).set(
+            "report", {"total": 3}
+        )
+        
+        restarted = QueryCache(max_size=5, default_ttl=60, l2=DiskCache(self.disk_path, clock=clock), clock=clock)
+        self.assertEqual(len(restarted), 0)
+        self.assertEqual(restarted.get("report"), {"total": 3})
+        self.assertEqual(len(restarted), 1)  # Promoted into memory
+        clock.advance(61)
+        self.assertIsNone(restarted.get("report"))
+    
+    def test_executor_results_survive_restart(self):
+        """A new executor on an unchanged database serves results from disk"""
+        query = "SELECT status, COUNT(*) AS n FROM leads GROUP BY status ORDER BY status"
+        first = SQLExecutor(self.test_db, use_pool=False, result_cache_l2=DiskCache(self.disk_path))
+        self.assertFalse(first.execute(query).get('cached', False))
+        self.assertTrue(first.execute(query)['cached'])
+        first.close()
+        
+        restarted = SQLExecutor(self.test_db, use_pool=False, result_cache_l2=DiskCache(self.disk_path))
+        result = restarted.execute(query)
+        self.assertTrue(result['cached'])
+        self.assertEqual(result['rows'], [{"status": "Lost", "n": 5}, {"status": "Won", "n": 5}])
+        restarted.close()
+    
+    def test_executor_ignores_disk_results_after_data_change(self):
+        """Results cached before the database changed are not served to a new process"""
+        query = "SELECT COUNT(*) AS n FROM leads"
+        first = SQLExecutor(self.test_db, use_pool=False, result_cache_l2=DiskCache(self.disk_path))
+        self.assertEqual(first.execute(query)['rows'], [{"n": 10}])
+        first.close()
+        
+        conn = sqlite3.connect(self.test_db)
+        conn.execute("INSERT INTO leads VALUES (10, 'Won')")
+        conn.commit()
+        conn.close()
+        
+        restarted = SQLExecutor(self.test_db, use_pool=False, result_cache_l2=DiskCache(self.disk_path))
+        result = restarted.execute(query)
+        self.assertFalse(result.get('cached', False))
+        self.assertEqual(result['rows'], [{"n": 11}])
+        restarted.close()
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,187 @@
+"""
+RAG Search Tests
+Query-embedding cache, lexical fallback and batched searches with a stub embedder
+"""
+
+import unittest
+import asyncio
+import os
+import shutil
+import sys
+import tempfile
+import threading
+import time
+from unittest import mock
+
+# Add src to path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+try:
+    import rag_system
+    from rag_system import LeadRAGSystem
+except ImportError:  # chromadb / langchain not installed
+    rag_system = None
+
+try:
+    from ai_agent_simple import SimpleLeadIntelligenceAgent
+except ImportError:
+    SimpleLeadIntelligenceAgent = None
+
+
+# Stub embedding space: each topic word maps to its own axis
+TOPICS = ["wifi", "deposit", "visa", "parking"]
+
+
+def topic_vector(text):
+    """Embedding of a text: one axis per topic word it mentions (plus a small constant)"""
+    words = text.lower().split()
+    return [1.0 if topic in words else 0.0 for topic in TOPICS] + [0.1]
+
+
+class StubEmbeddings:
+    """Stand-in for OpenAIEmbeddings that records calls and can be slowed down"""
+    
+    def __init__(self, delay=0.0):
+        self.delay = delay
+        self.query_calls = []
+        self.document_calls = []
+        self.lock = threading.Lock()
+    
+    def embed_query(self, text):
+        with self.lock:
+            self.query_calls.append(text)
+        time.sleep(self.delay)
+        return topic_vector(text)
+    
+    def embed_documents(self, texts):
+        with self.lock:
+            self.document_calls.append(list(texts))
+        time.sleep(self.delay)
+        return [topic_vector(text) for text in texts]
+
+
+class StubLexicalIndex:
+    """Lexical retriever returning one marker result per query"""
+    
+    def __init__(self):
+        self.queries = []
+    
+    def search(self, query, n_results=5, filter_dict=None):
+        self.queries.append(query)
+        return [{
+            'id': f"lexical:{query}",
+            'content': query,
+            'metadata': {},
+            'distance': None,
+            'bm25': 1.0,
+            'retrieval': "lexical"
+        }]
+
+
+@unittest.skipUnless(rag_system is not None, "rag_system dependencies not installed")
+class TestRAGSearch(unittest.TestCase):
+    """Embedding cache, timeout fallback and multi-query search"""
+    
+    def setUp(self):
+        """RAG system on a temporary numpy index holding one document per topic"""
+        self.directory = tempfile.mkdtemp()
+        self.env = mock.patch.dict(os.environ, {"OPENAI_API_KEY": "test-key"})
+        self.env.start()
+        rag_system._query_embedding_cache.clear(include_l2=False)
+        
+        self.rag = LeadRAGSystem(
+            db_path=os.path.join(self.directory, "leads.db"),
+            chroma_path=os.path.join(self.directory, "chroma_db"),
+            vector_backend="numpy"
+        )
+        self.rag.embeddings = StubEmbeddings()
+        self.rag.lexical_index = StubLexicalIndex()
+        self.rag.collection.upsert(
+            ids=[f"doc_{topic}" for topic in TOPICS],
+            embeddings=[topic_vector(topic) for topic in TOPICS],
+            documents=[f"Conversation about {topic}" for topic in TOPICS],
+            metadatas=[{"lead_id": str(i), "chunk_type": "summary"} for i in range(len(TOPICS))]
+        )
+    
+    def tearDown(self):
+        """Restore the environment and remove temporary files"""
+        self.env.stop()
+        rag_system._query_embedding_cache.clear(include_l2=False)
+        shutil.rmtree(self.directory, ignore_errors=True)
+    
+    def test_query_embedding_cache_hits(self):
+        """Repeated queries (after whitespace normalization) are embedded once"""
+        embeddings = self.rag.embeddings
+        first = self.rag._embed_queries(["wifi issues", "visa  help", "wifi issues"])
+        self.assertEqual(embeddings.document_calls, [["wifi issues", "visa help"]])
+        self.assertEqual(first[0], first[2])
+        
+        second = self.rag._embed_queries([" visa help ", "wifi   issues"])
+        self.assertEqual(len(embeddings.document_calls), 1)
+        self.assertEqual(second, [first[1], first[0]])
+        
+        self.rag._embed_query("wifi issues")
+        self.assertEqual(embeddings.query_calls, [])
+        stats = LeadRAGSystem.get_query_embedding_stats()
+        self.assertGreaterEqual(stats["hits"], 3)
+    
+    def test_single_missing_query_uses_embed_query(self):
+        """One missing query goes through embed_query (single-flight fill)"""
+        self.rag._embed_queries(["parking"])
+        self.assertEqual(self.rag.embeddings.query_calls, ["parking"])
+        self.assertEqual(self.rag.embeddings.document_calls, [])
+    
+    def test_embedding_timeout_falls_back_to_lexical(self):
+        """A slow embedding returns lexical results, and still fills the cache"""
+        self.rag.embeddings = StubEmbeddings(delay=0.3)
+        with mock.patch.object(rag_system, "EMBEDDING_TIMEOUT_SECONDS", 0.05):
+            results = self.rag.semantic_search_many(["wifi router", "deposit refund"], n_results=2, mode="vector")
+        self.assertEqual([r[0]['retrieval'] for r in results], [rag_system.FALLBACK_RETRIEVAL] * 2)
+        self.assertEqual([r[0]['content'] for r in results], ["wifi router", "deposit refund"])
+        
+        time.sleep(0.5)  # The timed-out call keeps running in the background
+        calls = len(self.rag.embeddings.document_calls)
+        self.rag._embed_queries(["wifi router", "deposit refund"])
+        self.assertEqual(len(self.rag.embeddings.document_calls), calls)
+    
+    def test_many_results_in_input_order(self):
+        """Each query gets its own results, in input order; blank queries get none"""
+        with mock.patch.object(self.rag.collection, "query", wraps=self.rag.collection.query) as query:
+            results = self.rag.semantic_search_many(["visa", "", "wifi", "parking"], n_results=1, mode="vector")
+        self.assertEqual(query.call_count, 1)
+        self.assertEqual(len(self.rag.embeddings.document_calls), 1)
+        self.assertEqual([r[0]['id'] if r else None for r in results], ["doc_visa", None, "doc_wifi", "doc_parking"])
+    
+    def test_async_many_matches_sync(self):
+        """asemantic_search_many returns the same results as semantic_search_many"""
+        queries = ["deposit", "wifi", "visa"]
+        expected = self.rag.semantic_search_many(queries, n_results=2, mode="vector")
+        actual = asyncio.run(self.rag.asemantic_search_many(queries, n_results=2, mode="vector"))
+        self.assertEqual(actual, expected)
+        self.assertEqual([r[0]['id'] for r in actual], ["doc_deposit", "doc_wifi", "doc_visa"])
+
+
+@unittest.skipUnless(SimpleLeadIntelligenceAgent is not None, "agent dependencies not installed")
+class TestParseSearchQueries(unittest.TestCase):
+    """Multi-query tool input parsing"""
+    
+    def test_json_list(self):
+        """A JSON list string gives its queries in order, dropping blanks"""
+        parse = SimpleLeadIntelligenceAgent._parse_search_queries
+        self.assertEqual(parse('["wifi", "visa", "deposit"]'), ["wifi", "visa", "deposit"])
+        self.assertEqual(parse('  [ "wifi", " ", "visa" ]'), ["wifi", "visa"])
+    
+    def test_list_input(self):
+        """A list (e.g. from structured tool input) is used as is"""
+        self.assertEqual(SimpleLeadIntelligenceAgent._parse_search_queries(["a", "b"]), ["a", "b"])
+    
+    def test_single_query(self):
+        """Plain text, or text that only looks like a list, is a single query"""
+        parse = SimpleLeadIntelligenceAgent._parse_search_queries
+        self.assertIsNone(parse("wifi problems"))
+        self.assertIsNone(parse("[draft] wifi problems"))
+        self.assertIsNone(parse({"query": "wifi"}))
+
+
+if __name__ == '__main__':
+    unittest.main()
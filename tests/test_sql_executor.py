@@ -0,0 +1,472 @@
+"""
+SQL Executor Tests
+Paging, budgets, caching and concurrency of the read-only SQL executor
+"""
+
+import unittest
+import sqlite3
+import os
+import sys
+import tempfile
+import asyncio
+import threading
+import time
+
+# Add src to path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+from sql_executor import COUNT_BUDGET_FRACTION, SQLExecutor, _QueryBudget, normalize_query
+
+
+class TestNormalizeQuery(unittest.TestCase):
+    """normalize_query only touches whitespace, comments and a trailing semicolon"""
+    
+    def test_whitespace_and_semicolon(self):
+        """Whitespace runs collapse and a trailing semicolon is dropped"""
+        self.assertEqual(
+            normalize_query("SELECT  *\n\tFROM leads\n WHERE status = 'Won' ;"),
+            "SELECT * FROM leads WHERE status = 'Won'"
+        )
+    
+    def test_comments_dropped(self):
+        """Line and block comments are removed"""
+        self.assertEqual(
+            normalize_query("SELECT * -- all columns\nFROM /* the table */ leads"),
+            "SELECT * FROM leads"
+        )
+    
+    def test_string_literals_untouched(self):
+        """Quotes, doubled quotes and comment markers inside strings are kept verbatim"""
+        query = "SELECT * FROM leads WHERE name = 'O''Brien  --  x' OR note = '/* a  b */'"
+        self.assertEqual(normalize_query(query), query)
+    
+    def test_quoted_identifiers_untouched(self):
+        """Whitespace inside quoted identifiers is kept"""
+        query = 'SELECT "lead  name", [room  type] FROM leads'
+        self.assertEqual(normalize_query(query), query)
+    
+    def test_literals_not_lifted(self):
+        """IN lists, BETWEEN, negative numbers and LIKE prefixes stay literal"""
+        queries = [
+            "SELECT * FROM leads WHERE status IN ('Won', 'Lost')",
+            "SELECT * FROM leads WHERE budget BETWEEN 100 AND 200",
+            "SELECT * FROM leads WHERE balance > -5.5",
+            "SELECT * FROM leads WHERE name LIKE 'x%'",
+            "WITH won AS (SELECT * FROM leads WHERE status = 'Won') SELECT COUNT(*) FROM won LIMIT 10",
+        ]
+        for query in queries:
+            self.assertEqual(normalize_query(query), query)
+    
+    def test_equivalent_texts_share_key(self):
+        """Queries differing only in layout normalize to the same text"""
+        self.assertEqual(
+            normalize_query("select count(*)\nfrom leads -- total\n"),
+            normalize_query("select count(*) from leads;")
+        )
+
+
+class TestReadOnlyExecution(unittest.TestCase):
+    """Writes are rejected by the engine; valid reads are never rejected by keyword"""
+    
+    def setUp(self):
+        """Create a small leads database"""
+        self.test_db = tempfile.mktemp(suffix='.db')
+        conn = sqlite3.connect(self.test_db)
+        conn.execute("CREATE TABLE leads (lead_id INTEGER PRIMARY KEY, name TEXT, status TEXT)")
+        conn.executemany(
+            "INSERT INTO leads VALUES (?, ?, ?)",
+            [(1, "Ana-Update", "Won"), (2, "Bo", "Lost")]
+        )
+        conn.commit()
+        conn.close()
+        self.executor = SQLExecutor(db_path=self.test_db, use_pool=False)
+    
+    def tearDown(self):
+        """Clean up test database"""
+        if os.path.exists(self.test_db):
+            os.remove(self.test_db)
+    
+    def test_reads_once_rejected_by_keywords(self):
+        """CTEs, comments and REPLACE() run instead of costing the agent a retry"""
+        queries = [
+            "WITH won AS (SELECT * FROM leads WHERE status = 'Won') SELECT COUNT(*) AS n FROM won",
+            "SELECT COUNT(*) AS n FROM leads -- all leads",
+            "SELECT REPLACE(name, '-Update', '') AS name FROM leads WHERE lead_id = 1",
+        ]
+        for query in queries:
+            result = self.executor.execute(query)
+            self.assertIsNone(result['error'], query)
+            self.assertEqual(result['row_count'], 1)
+    
+    def test_writes_rejected(self):
+        """Writes, DDL and PRAGMA fail and leave the database untouched"""
+        queries = [
+            "DELETE FROM leads",
+            "WITH x AS (SELECT 1) DELETE FROM leads",
+            "SELECT * FROM leads; DROP TABLE leads",
+            "PRAGMA journal_mode = DELETE",
+        ]
+        for query in queries:
+            self.assertTrue(self.executor.execute(query)['error'], query)
+        conn = sqlite3.connect(self.test_db)
+        self.assertEqual(conn.execute("SELECT COUNT(*) FROM leads").fetchone()[0], 2)
+        conn.close()
+
+
+class TestSQLExecutorPaging(unittest.TestCase):
+    """execute_page truncation and row counting"""
+    
+    def setUp(self):
+        """Create a small leads database"""
+        self.test_db = tempfile.mktemp(suffix='.db')
+        conn = sqlite3.connect(self.test_db)
+        conn.execute("CREATE TABLE leads (lead_id INTEGER PRIMARY KEY, name TEXT, status TEXT)")
+        conn.execute("CREATE TABLE notes (lead_id INTEGER, note TEXT)")
+        conn.executemany(
+            "INSERT INTO leads VALUES (?, ?, ?)",
+            [(i, f"Lead {i}", "Won" if i % 2 else "Lost") for i in range(1, 101)]
+        )
+        conn.executemany("INSERT INTO notes VALUES (?, ?)", [(i, f"note {i}") for i in range(1, 11)])
+        conn.commit()
+        conn.close()
+        self.executor = SQLExecutor(db_path=self.test_db, use_pool=False)
+    
+    def tearDown(self):
+        """Clean up test database"""
+        if os.path.exists(self.test_db):
+            os.remove(self.test_db)
+    
+    def test_page_truncation(self):
+        """A page holds max_rows rows and reports the exact total"""
+        result = self.executor.execute_page("SELECT * FROM leads ORDER BY lead_id DESC", max_rows=10)
+        self.assertIsNone(result['error'])
+        self.assertTrue(result['truncated'])
+        self.assertEqual(result['row_count'], 10)
+        self.assertEqual(result['total_count'], 100)
+        self.assertTrue(result['total_is_exact'])
+        # ORDER BY of the statement is kept
+        self.assertEqual([row['lead_id'] for row in result['rows']], list(range(100, 90, -1)))
+    
+    def test_page_not_truncated(self):
+        """A result within max_rows is returned whole"""
+        result = self.executor.execute_page("SELECT * FROM leads WHERE lead_id <= 5", max_rows=10)
+        self.assertFalse(result['truncated'])
+        self.assertEqual(result['row_count'], 5)
+        self.assertEqual(result['total_count'], 5)
+        self.assertTrue(result['total_is_exact'])
+    
+    def test_page_exactly_max_rows(self):
+        """Exactly max_rows rows is not a truncation"""
+        result = self.executor.execute_page("SELECT * FROM leads WHERE lead_id <= 10", max_rows=10)
+        self.assertFalse(result['truncated'])
+        self.assertEqual(result['total_count'], 10)
+    
+    def test_page_preview_rows(self):
+        """preview_rows cuts a truncated page down without changing the total"""
+        result = self.executor.execute_page("SELECT * FROM leads", max_rows=20, preview_rows=3)
+        self.assertEqual(result['row_count'], 3)
+        self.assertEqual(result['total_count'], 100)
+    
+    def test_page_duplicate_column_names(self):
+        """Column names come from the statement as written"""
+        result = self.executor.execute_page(
+            "SELECT l.lead_id, n.lead_id FROM leads l JOIN notes n ON n.lead_id = l.lead_id",
+            max_rows=5
+        )
+        self.assertIsNone(result['error'])
+        self.assertEqual(result['columns'], ['lead_id', 'lead_id'])
+    
+    def test_large_total_is_exact(self):
+        """Large results are counted exactly with COUNT(*), also with duplicate names and ORDER BY"""
+        conn = sqlite3.connect(self.test_db)
+        conn.execute("CREATE TABLE big (n INTEGER, note TEXT)")
+        conn.executemany("INSERT INTO big VALUES (?, ?)", [(i, "x" * 200) for i in range(50000)])
+        conn.commit()
+        conn.close()
+        result = self.executor.execute_page(
+            "SELECT b.n, b.note, l.lead_id AS n FROM big b LEFT JOIN leads l ON l.lead_id = b.n ORDER BY b.n DESC",
+            max_rows=10
+        )
+        self.assertIsNone(result['error'])
+        self.assertEqual(result['total_count'], 50000)
+        self.assertTrue(result['total_is_exact'])
+        self.assertEqual(result['row_count'], 10)
+        self.assertEqual(result['columns'], ['n', 'note', 'n'])
+    
+    def test_parameterized_total(self):
+        """The count runs with the statement's parameters"""
+        result = self.executor.execute_page("SELECT * FROM leads WHERE status = ?", ("Won",), max_rows=5)
+        self.assertEqual((result['total_count'], result['total_is_exact']), (50, True))
+    
+    def test_total_is_lower_bound_when_budget_runs_out(self):
+        """A count that runs into the VM-step budget keeps the page and reports a lower bound"""
+        conn = sqlite3.connect(self.test_db)
+        conn.execute("CREATE TABLE big (n INTEGER)")
+        conn.executemany("INSERT INTO big VALUES (?)", [(i,) for i in range(50000)])
+        conn.commit()
+        conn.close()
+        executor = SQLExecutor(
+            db_path=self.test_db, use_pool=False, max_vm_steps=100000, result_cache_size=0
+        )
+        result = executor.execute_page("SELECT n FROM big WHERE n % 3 = 0", max_rows=10)
+        self.assertIsNone(result['error'])
+        self.assertEqual(result['row_count'], 10)
+        self.assertTrue(result['truncated'])
+        self.assertFalse(result['total_is_exact'])
+        self.assertEqual(result['total_count'], 11)
+    
+    def test_count_skipped_when_budget_mostly_used(self):
+        """No rows are counted once the first pass used most of the budget"""
+        conn = sqlite3.connect(self.test_db)
+        budget = _QueryBudget(max_vm_steps=1000, max_seconds=None)
+        budget.vm_steps = int(1000 * COUNT_BUDGET_FRACTION)
+        self.assertEqual(self.executor._count_rows(conn, "SELECT * FROM leads", None, budget, 11), (11, False))
+        budget.vm_steps = 0
+        self.assertEqual(self.executor._count_rows(conn, "SELECT * FROM leads", None, budget, 11), (100, True))
+        conn.close()
+
+
+class TestQueryBudget(unittest.TestCase):
+    """Runaway statements are interrupted with a structured error"""
+    
+    CROSS_JOIN = "SELECT COUNT(*) FROM leads a, leads b, leads c, leads d"
+    
+    def setUp(self):
+        """Create a small leads database"""
+        self.test_db = tempfile.mktemp(suffix='.db')
+        conn = sqlite3.connect(self.test_db)
+        conn.execute("CREATE TABLE leads (lead_id INTEGER PRIMARY KEY, status TEXT)")
+        conn.executemany("INSERT INTO leads VALUES (?, ?)", [(i, "Won") for i in range(1, 101)])
+        conn.commit()
+        conn.close()
+    
+    def tearDown(self):
+        """Clean up test database"""
+        if os.path.exists(self.test_db):
+            os.remove(self.test_db)
+    
+    def test_vm_step_budget_exceeded(self):
+        """An accidental cross join stops at the VM-step budget and reports its plan"""
+        executor = SQLExecutor(db_path=self.test_db, use_pool=False, max_vm_steps=200000)
+        result = executor.execute(self.CROSS_JOIN)
+        self.assertTrue(result['budget_exceeded'])
+        self.assertIn("Query budget exceeded", result['error'])
+        self.assertEqual(result['budget']['reason'], "vm_steps")
+        self.assertGreater(result['budget']['vm_steps'], 200000)
+        self.assertTrue(result['query_plan'])
+        self.assertTrue(any("SCAN" in step for step in result["query_plan"]))
+    
+    def test_time_budget_exceeded(self):
+        """The per-call time budget interrupts the statement"""
+        executor = SQLExecutor(db_path=self.test_db, use_pool=False, max_vm_steps=None)
+        result = executor.execute(self.CROSS_JOIN, time_budget=0.05)
+        self.assertTrue(result['budget_exceeded'])
+        self.assertEqual(result['budget']['reason'], "time")
+        self.assertLess(result['budget']['elapsed_seconds'], 1)
+    
+    def test_pooled_connection_usable_after_budget(self):
+        """The progress handler is removed before the connection is reused"""
+        executor = SQLExecutor(db_path=self.test_db, max_connections=1, max_vm_steps=200000)
+        self.assertTrue(executor.execute(self.CROSS_JOIN)['budget_exceeded'])
+        result = executor.execute("SELECT COUNT(*) AS n FROM leads")
+        self.assertIsNone(result['error'])
+        self.assertEqual(result['rows'], [{'n': 100}])
+        executor.close()
+
+
+class TestResultCache(unittest.TestCase):
+    """Results are cached per data version and handed out as copies"""
+    
+    def setUp(self):
+        """Create a small leads database"""
+        self.test_db = tempfile.mktemp(suffix='.db')
+        conn = sqlite3.connect(self.test_db)
+        conn.execute("CREATE TABLE leads (lead_id INTEGER PRIMARY KEY, status TEXT)")
+        conn.executemany("INSERT INTO leads VALUES (?, ?)", [(i, "Won") for i in range(1, 11)])
+        conn.commit()
+        conn.close()
+        self.executor = SQLExecutor(db_path=self.test_db, use_pool=False, version_check_interval=0)
+    
+    def tearDown(self):
+        """Close the executor and clean up test database"""
+        self.executor.close()
+        if os.path.exists(self.test_db):
+            os.remove(self.test_db)
+    
+    def _insert_lead(self, lead_id):
+        conn = sqlite3.connect(self.test_db)
+        conn.execute("INSERT INTO leads VALUES (?, 'Lost')", (lead_id,))
+        conn.commit()
+        conn.close()
+    
+    def test_repeat_is_cached(self):
+        """The second identical query is served from the cache"""
+        first = self.executor.execute("SELECT COUNT(*) AS n FROM leads")
+        second = self.executor.execute("SELECT  COUNT(*) AS n\nFROM leads;")
+        self.assertNotIn('cached', first)
+        self.assertTrue(second['cached'])
+        self.assertEqual(second['rows'], [{'n': 10}])
+        self.assertEqual(self.executor.get_cache_stats()['hits'], 1)
+    
+    def test_write_invalidates_cache(self):
+        """A commit from another connection invalidates cached results"""
+        self.executor.execute("SELECT COUNT(*) AS n FROM leads")
+        self._insert_lead(11)
+        result = self.executor.execute("SELECT COUNT(*) AS n FROM leads")
+        self.assertNotIn('cached', result)
+        self.assertEqual(result['rows'], [{'n': 11}])
+    
+    def test_time_dependent_queries_not_cached(self):
+        """Queries reading the clock or randomness run every time, whatever their data version"""
+        for query, params in [
+            ("SELECT date('now') AS today", None),
+            ("SELECT COUNT(*) AS n FROM leads WHERE datetime(lead_id, 'unixepoch') < datetime('NOW', '-1 day')", None),
+            ("SELECT CURRENT_TIMESTAMP AS ts", None),
+            ("select current_date as d", None),
+            ("SELECT lead_id FROM leads ORDER BY RANDOM() LIMIT 3", None),
+            ("SELECT julianday() AS jd", None),
+            ("SELECT date(?) AS today", ('now',)),
+        ]:
+            with self.subTest(query=query):
+                self.assertIsNone(self.executor.execute(query, params)['error'])
+                self.assertNotIn('cached', self.executor.execute(query, params))
+                self.assertNotIn('cached', self.executor.execute_page(query, params, max_rows=2))
+        self.assertEqual(self.executor.get_cache_stats()['hits'], 0)
+    
+    def test_volatile_names_in_literals_still_cached(self):
+        """Function names inside string literals or quoted identifiers do not block caching"""
+        for query in ("SELECT COUNT(*) AS n FROM leads WHERE status != 'random()'",
+                      'SELECT lead_id AS "current_date" FROM leads',
+                      "SELECT date('2024-01-01') AS d"):
+            with self.subTest(query=query):
+                self.executor.execute(query)
+                self.assertTrue(self.executor.execute(query)['cached'])
+    
+    def test_version_checked_once_per_interval(self):
+        """Within the check interval the version is reused; afterwards a write is seen"""
+        executor = SQLExecutor(db_path=self.test_db, use_pool=False, version_check_interval=0.2)
+        try:
+            reads = []
+            data_version = executor._data_version
+            executor._data_version = lambda: reads.append(1) or data_version()
+            for _ in range(5):
+                executor.execute("SELECT COUNT(*) AS n FROM leads")
+            self.assertEqual(len(reads), 1)
+            
+            self._insert_lead(11)
+            time.sleep(0.25)
+            result = executor.execute("SELECT COUNT(*) AS n FROM leads")
+            self.assertEqual(result['rows'], [{'n': 11}])
+            self.assertEqual(len(reads), 2)
+        finally:
+            executor.close()
+    
+    def test_hit_returns_copy(self):
+        """Mutating a returned result never changes what the cache hands out"""
+        query = "SELECT lead_id, status FROM leads WHERE lead_id = 1"
+        first = self.executor.execute(query)
+        first['rows'][0]['status'] = "changed"
+        first['rows'].append({'lead_id': 99})
+        
+        hit = self.executor.execute(query)
+        self.assertTrue(hit['cached'])
+        self.assertEqual(hit['rows'], [{'lead_id': 1, 'status': 'Won'}])
+        hit['rows'][0]['status'] = "changed again"
+        self.assertEqual(self.executor.execute(query)['rows'], [{'lead_id': 1, 'status': 'Won'}])
+
+
+class TestSQLExecutorAsync(unittest.TestCase):
+    """aexecute / aexecute_many on the bounded worker pool"""
+    
+    def setUp(self):
+        """Create a small leads database"""
+        self.test_db = tempfile.mktemp(suffix='.db')
+        conn = sqlite3.connect(self.test_db)
+        conn.execute("CREATE TABLE leads (lead_id INTEGER PRIMARY KEY, status TEXT)")
+        conn.executemany("INSERT INTO leads VALUES (?, ?)", [(i, "Won") for i in range(1, 31)])
+        conn.commit()
+        conn.close()
+        self.executor = SQLExecutor(db_path=self.test_db, use_pool=False, max_connections=3)
+    
+    def tearDown(self):
+        """Shut down workers and clean up test database"""
+        self.executor.close()
+        if os.path.exists(self.test_db):
+            os.remove(self.test_db)
+    
+    def test_aexecute_many_concurrent_and_ordered(self):
+        """Queries overlap (up to max_connections) and results keep input order"""
+        lock = threading.Lock()
+        state = {"active": 0, "peak": 0}
+        execute = self.executor.execute
+        
+        def tracked_execute(query, params=None, time_budget=None):
+            with lock:
+                state["active"] += 1
+                state["peak"] = max(state["peak"], state["active"])
+            try:
+                time.sleep(0.05)
+                return execute(query, params, time_budget)
+            finally:
+                with lock:
+                    state["active"] -= 1
+        
+        self.executor.execute = tracked_execute
+        queries = [f"SELECT {i} AS n FROM leads WHERE lead_id = {i}" for i in range(1, 9)]
+        results = asyncio.run(self.executor.aexecute_many(queries))
+        
+        self.assertEqual([r['rows'][0]['n'] for r in results], list(range(1, 9)))
+        self.assertGreater(state["peak"], 1)
+        self.assertLessEqual(state["peak"], 3)
+    
+    def test_aexecute_page(self):
+        """aexecute with max_rows returns a page"""
+        result = asyncio.run(self.executor.aexecute("SELECT * FROM leads", max_rows=5))
+        self.assertEqual(result['row_count'], 5)
+        self.assertEqual(result['total_count'], 30)
+    
+    def test_execute_multi_deadline(self):
+        """A slow query times out and is interrupted; the fast one returns in order"""
+        executor = SQLExecutor(
+            db_path=self.test_db, use_pool=False, max_connections=2,
+            max_query_seconds=None, max_vm_steps=None, result_cache_size=0
+        )
+        slow = (
+            "WITH RECURSIVE n(i) AS (SELECT 1 UNION ALL SELECT i + 1 FROM n WHERE i < 100000000) "
+            "SELECT COUNT(*) AS c FROM n"
+        )
+        fast = "SELECT COUNT(*) AS c FROM leads"
+        try:
+            start = time.monotonic()
+            results = executor.execute_multi([slow, fast], deadline=0.3)
+            self.assertLess(time.monotonic() - start, 2)
+            
+            self.assertTrue(results[0]['timed_out'])
+            self.assertTrue(results[0]['error'])
+            self.assertNotIn('timed_out', results[1])
+            self.assertEqual(results[1]['rows'], [{'c': 30}])
+            
+            # The slow query's connection is released promptly
+            for _ in range(100):
+                if not executor._active:
+                    break
+                time.sleep(0.01)
+            self.assertEqual(executor._active, {})
+        finally:
+            executor.close()
+    
+    def test_close_shuts_down_workers(self):
+        """close() stops the worker threads; the executor is usable afterwards"""
+        asyncio.run(self.executor.aexecute("SELECT 1 AS n"))
+        workers = self.executor._workers
+        self.assertIsNotNone(workers)
+        self.executor.close()
+        self.assertIsNone(self.executor._workers)
+        with self.assertRaises(RuntimeError):
+            workers.submit(lambda: None)
+        result = asyncio.run(self.executor.aexecute("SELECT 1 AS n"))
+        self.assertEqual(result['rows'], [{'n': 1}])
+
+
+if __name__ == '__main__':
+    unittest.main()
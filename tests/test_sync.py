@@ -0,0 +1,473 @@
+"""
+Sync Tests
+Sync manifest bookkeeping and incremental syncs of the vector collection
+"""
+
+import unittest
+import json
+import os
+import shutil
+import sqlite3
+import sys
+import tempfile
+from unittest import mock
+
+# Add src to path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+from sync_manifest import SyncManifest, document_hash
+
+try:
+    import rag_system
+    from rag_system import LeadRAGSystem
+except ImportError:  # chromadb / langchain not installed
+    rag_system = None
+
+
+class StubEmbeddings:
+    """Stand-in for OpenAIEmbeddings that records every text it embeds"""
+    
+    def __init__(self):
+        self.embedded = []
+    
+    def embed_documents(self, texts):
+        self.embedded.extend(texts)
+        return [[float(len(text)), float(sum(map(ord, text)) % 101), 1.0] for text in texts]
+    
+    def embed_query(self, text):
+        return self.embed_documents([text])[0]
+
+
+def document(doc_id, text, source="summary", **metadata):
+    """(doc_id, text, metadata) tuple as produced by _iter_documents"""
+    return doc_id, text, {"source": source, **metadata}
+
+
+def timeline_text(lead, turns):
+    """Plain-text conversation with one dated turn per line"""
+    return "\n".join(
+        f"2024-03-{turn % 28 + 1:02d} Agent: Follow-up {turn} for {lead} about the room, the deposit, "
+        f"the move-in date and the documents still missing from the application"
+        for turn in range(turns)
+    )
+
+
+def create_fixture_db(path):
+    """Small leads database covering every document source and its filters"""
+    conn = sqlite3.connect(path)
+    conn.executescript("""
+        CREATE TABLE leads (
+            lead_id TEXT PRIMARY KEY, name TEXT, status TEXT,
+            communication_timeline TEXT, crm_conversation_details TEXT
+        );
+        CREATE TABLE rag_documents (
+            id INTEGER PRIMARY KEY AUTOINCREMENT, lead_id TEXT, chunk_type TEXT, content TEXT, metadata TEXT
+        );
+        CREATE TABLE rag_documents_events (
+            id INTEGER PRIMARY KEY AUTOINCREMENT, lead_id TEXT, event_id INTEGER,
+            document_type TEXT, content TEXT, metadata TEXT
+        );
+        CREATE TABLE lead_tasks (
+            id INTEGER PRIMARY KEY AUTOINCREMENT, lead_id TEXT, task_type TEXT,
+            description TEXT, status TEXT, due_date TEXT
+        );
+    """)
+    conn.executemany("INSERT INTO leads VALUES (?, ?, ?, ?, ?)", [
+        # Long timeline (several chunks) and CRM notes
+        ("L1", "Asha", "Won", timeline_text("Asha", 80), "CRM: asked for a twin room, budget agreed, deposit paid"),
+        # Single-chunk timeline, no CRM notes
+        ("L2", "Ben", "Lost", timeline_text("Ben", 2), ""),
+        # Both fields below the length thresholds
+        ("L3", None, None, "short", None),
+    ])
+    conn.executemany("INSERT INTO rag_documents (lead_id, chunk_type, content, metadata) VALUES (?, ?, ?, ?)", [
+        ("L1", "summary", "Asha wants a twin room near campus", json.dumps({"budget": 250, "visa": None})),
+        ("L2", "summary", "Ben went with another provider", None),
+        ("L3", "requirements", "Budget not shared yet", json.dumps({"lead_id": "overridden"})),
+        ("L9", "summary", "Lead without a leads row", None),
+    ])
+    conn.executemany(
+        "INSERT INTO rag_documents_events (lead_id, event_id, document_type, content, metadata) VALUES (?, ?, ?, ?, ?)", [
+            ("L1", 1, "call", "Call: confirmed move-in on 1 September", json.dumps({"event_id": 1})),
+            ("L1", 2, "email", "", None),
+            ("L2", 3, "whatsapp", "Message: no longer interested", None),
+            ("L3", 4, "note", None, None),
+        ]
+    )
+    conn.executemany("INSERT INTO lead_tasks (lead_id, task_type, description, status, due_date) VALUES (?, ?, ?, ?, ?)", [
+        ("L1", "follow_up", "Send the tenancy agreement", "pending", "2024-04-01"),
+        ("L2", None, "Ask for feedback on the decision", None, None),
+        ("L3", "call", "Call back", "done", None),
+    ])
+    conn.commit()
+    conn.close()
+
+
+def legacy_documents(db_path, include_events, include_raw_text):
+    """
+    Documents as built before streaming: every source fetched in full into
+    parallel id/text/metadata lists (reference for _iter_documents)
+    """
+    conn = sqlite3.connect(db_path)
+    cursor = conn.cursor()
+    ids, texts, metadatas = [], [], []
+    counts = {"summary": 0, "event": 0, "raw_timeline": 0, "raw_crm": 0, "task": 0}
+    
+    def add(doc_id, text, metadata, source):
+        ids.append(doc_id)
+        texts.append(text)
+        metadatas.append({k: v for k, v in metadata.items() if v is not None})
+        counts[source] += 1
+    
+    def row_metadata(metadata_json, doc_id, lead_id, chunk_type, name, status, source):
+        metadata = json.loads(metadata_json) if metadata_json else {}
+        metadata.update({
+            "doc_id": str(doc_id) if doc_id else "",
+            "lead_id": str(lead_id) if lead_id else "",
+            "chunk_type": str(chunk_type) if chunk_type else "",
+            "lead_name": str(name) if name else "Unknown",
+            "status": str(status) if status else "Unknown",
+            "source": source
+        })
+        return metadata
+    
+    cursor.execute("""
+        SELECT rd.id, rd.lead_id, rd.chunk_type, rd.content, rd.metadata, l.name, l.status
+        FROM rag_documents rd JOIN leads l ON rd.lead_id = l.lead_id
+    """)
+    for doc_id, lead_id, chunk_type, content, metadata_json, name, status in cursor.fetchall():
+        add(f"doc_{doc_id}", content, row_metadata(metadata_json, doc_id, lead_id, chunk_type, name, status, "summary"), "summary")
+    
+    if include_events:
+        cursor.execute("""
+            SELECT rde.id, rde.lead_id, rde.document_type, rde.content, rde.metadata, l.name, l.status
+            FROM rag_documents_events rde JOIN leads l ON rde.lead_id = l.lead_id
+            WHERE rde.content IS NOT NULL AND rde.content != ''
+        """)
+        for doc_id, lead_id, doc_type, content, metadata_json, name, status in cursor.fetchall():
+            add(f"event_{doc_id}", content, row_metadata(metadata_json, doc_id, lead_id, doc_type, name, status, "event"), "event")
+    
+    if include_raw_text:
+        for source, column, id_suffix, chunk_type, min_length in [
+            ("raw_timeline", "communication_timeline", "timeline", "raw_communication_timeline", 100),
+            ("raw_crm", "crm_conversation_details", "crm", "raw_crm_conversation_details", 50),
+        ]:
+            cursor.execute(f"""
+                SELECT l.lead_id, l.{column}, l.name, l.status FROM leads l
+                WHERE l.{column} IS NOT NULL AND l.{column} != '' AND LENGTH(l.{column}) > {min_length}
+            """)
+            for chunk_id, lead_id, chunk_type, content, name, status in list(
+                LeadRAGSystem._chunk_raw_text(cursor.fetchall(), id_suffix, chunk_type)
+            ):
+                add(f"{source}_{chunk_id}", content, {
+                    "chunk_id": str(chunk_id),
+                    "lead_id": str(lead_id) if lead_id else "",
+                    "chunk_type": str(chunk_type) if chunk_type else "",
+                    "lead_name": str(name) if name else "Unknown",
+                    "status": str(status) if status else "Unknown",
+                    "source": source
+                }, source)
+    
+    if include_events:
+        cursor.execute("""
+            SELECT lt.id, lt.lead_id, lt.description, lt.task_type, lt.status,
+                   lt.due_date, l.name, l.status as lead_status
+            FROM lead_tasks lt JOIN leads l ON lt.lead_id = l.lead_id
+            WHERE lt.description IS NOT NULL AND lt.description != '' AND LENGTH(lt.description) > 10
+        """)
+        for task_id, lead_id, description, task_type, task_status, due_date, name, lead_status in cursor.fetchall():
+            task_text = f"Task: {description}"
+            if task_type:
+                task_text += f" | Type: {task_type}"
+            if task_status:
+                task_text += f" | Status: {task_status}"
+            if due_date:
+                task_text += f" | Due: {due_date}"
+            add(f"task_task_{task_id}", task_text, {
+                "chunk_id": f"task_{task_id}",
+                "lead_id": str(lead_id) if lead_id else "",
+                "chunk_type": "task",
+                "lead_name": str(name) if name else "Unknown",
+                "status": str(lead_status) if lead_status else "Unknown",
+                "task_status": str(task_status) if task_status else "pending",
+                "source": "task"
+            }, "task")
+    
+    conn.close()
+    return ids, texts, metadatas, counts
+
+
+class TestSyncManifest(unittest.TestCase):
+    """Checkpoints, run stamps and stale detection"""
+    
+    def setUp(self):
+        """Empty manifest"""
+        self.directory = tempfile.mkdtemp()
+        self.manifest = SyncManifest(os.path.join(self.directory, "manifest.db"))
+    
+    def tearDown(self):
+        """Close and remove the manifest"""
+        self.manifest.close()
+        shutil.rmtree(self.directory, ignore_errors=True)
+    
+    def test_stale_documents_of_included_sources(self):
+        """Documents not seen in a run are stale, but only for the run's sources"""
+        old_run = self.manifest.begin_run()
+        self.manifest.record([("doc_1", "summary", "h1"), ("doc_2", "summary", "h2"), ("event_1", "event", "h3")], old_run)
+        run = self.manifest.begin_run()
+        self.manifest.mark_seen(["doc_1"], run)
+        
+        stale = [doc_id for page in self.manifest.iter_stale({"summary"}, run, page_size=1) for doc_id in page]
+        self.assertEqual(stale, ["doc_2"])
+    
+    def test_version_changes_on_writes(self):
+        """The version moves when documents are recorded or forgotten"""
+        empty = self.manifest.version()
+        self.manifest.record([("doc_1", "summary", "h1")])
+        recorded = self.manifest.version()
+        self.assertNotEqual(recorded, empty)
+        self.manifest.forget(["doc_1"])
+        self.assertNotEqual(self.manifest.version(), recorded)
+    
+    def test_document_hash_covers_metadata(self):
+        """A metadata-only change (e.g. lead status) changes the hash"""
+        self.assertNotEqual(
+            document_hash("text", {"status": "Won"}),
+            document_hash("text", {"status": "Lost"})
+        )
+
+
+@unittest.skipUnless(rag_system is not None, "rag_system dependencies not installed")
+class TestSyncDocuments(unittest.TestCase):
+    """Only new or changed documents are embedded; stale ones are removed"""
+    
+    def setUp(self):
+        """RAG system on a temporary numpy index with a stub embedder"""
+        self.directory = tempfile.mkdtemp()
+        self.env = mock.patch.dict(os.environ, {"OPENAI_API_KEY": "test-key"})
+        self.env.start()
+        self.rag = LeadRAGSystem(
+            db_path=os.path.join(self.directory, "leads.db"),
+            chroma_path=os.path.join(self.directory, "chroma_db"),
+            vector_backend="numpy"
+        )
+        self.rag.embeddings = StubEmbeddings()
+        self.documents = [
+            document("doc_1", "Asked about wifi in the studio", status="Won"),
+            document("doc_2", "Wants a deposit refund", status="Lost"),
+            document("doc_3", "Visa appointment next week", status="Won"),
+        ]
+    
+    def tearDown(self):
+        """Restore the environment and remove temporary files"""
+        self.env.stop()
+        self.rag.manifest.close()
+        shutil.rmtree(self.directory, ignore_errors=True)
+    
+    def sync(self, documents):
+        """Sync documents of the summary source"""
+        return self.rag.sync_documents(iter(documents), sources={"summary"})
+    
+    def test_unchanged_documents_skipped(self):
+        """A second sync of the same documents embeds and writes nothing"""
+        self.assertEqual(self.sync(self.documents), {"upserted": 3, "deleted": 0, "unchanged": 0})
+        embedded = len(self.rag.embeddings.embedded)
+        
+        self.assertEqual(self.sync(self.documents), {"upserted": 0, "deleted": 0, "unchanged": 3})
+        self.assertEqual(len(self.rag.embeddings.embedded), embedded)
+    
+    def test_changed_documents_reembedded(self):
+        """Only the changed text is embedded; a metadata-only change reuses the stored embedding"""
+        self.sync(self.documents)
+        self.rag.embeddings.embedded.clear()
+        
+        changed = list(self.documents)
+        changed[0] = document("doc_1", "Asked about wifi and parking", status="Won")
+        changed[1] = document("doc_2", "Wants a deposit refund", status="Won")
+        self.assertEqual(self.sync(changed), {"upserted": 2, "deleted": 0, "unchanged": 1})
+        self.assertEqual(self.rag.embeddings.embedded, ["Asked about wifi and parking"])
+        stored = self.rag.collection.get(ids=["doc_1", "doc_2"], include=["documents", "metadatas"])
+        self.assertEqual(stored['documents'][0], "Asked about wifi and parking")
+        self.assertEqual(stored['metadatas'][1]['status'], "Won")
+    
+    def test_stale_documents_deleted(self):
+        """Documents gone from the source are removed from the collection and manifest"""
+        self.sync(self.documents)
+        self.assertEqual(self.sync(self.documents[:2]), {"upserted": 0, "deleted": 1, "unchanged": 2})
+        self.assertEqual(self.rag.collection.count(), 2)
+        self.assertEqual(len(self.rag.manifest), 2)
+        self.assertEqual(self.rag.collection.get(ids=["doc_3"])['ids'], [])
+    
+    def test_other_sources_not_deleted(self):
+        """A sync only removes stale documents of the sources it covers"""
+        self.rag.sync_documents(iter(self.documents + [document("event_1", "Viewing booked", source="event")]),
+                                sources={"summary", "event"})
+        self.assertEqual(self.sync(self.documents)["deleted"], 0)
+        self.assertEqual(self.rag.collection.count(), 4)
+    
+    def test_lexical_index_follows_sync(self):
+        """The lexical index holds the synced documents under their ids and drops stale ones"""
+        self.sync(self.documents)
+        found = self.rag.lexical_index.search("deposit refund")
+        self.assertEqual([result['id'] for result in found], ["doc_2"])
+        self.assertEqual(found[0]['metadata']['status'], "Lost")
+        
+        self.sync(self.documents[1:])
+        self.assertEqual(self.rag.lexical_index.search("wifi"), [])
+        self.assertEqual(self.rag.lexical_index.count(), 2)
+    
+    def test_lexical_index_backfilled_at_startup(self):
+        """A missing lexical index is rebuilt from the collection on startup, without embedding anything"""
+        self.sync(self.documents)
+        self.rag.collection.close()
+        self.rag.lexical_index.close()
+        self.rag.manifest.close()
+        os.remove(self.rag.lexical_index.path)
+        
+        embeddings = StubEmbeddings()
+        with mock.patch.object(rag_system, "OpenAIEmbeddings", return_value=embeddings):
+            self.rag = LeadRAGSystem(
+                db_path=os.path.join(self.directory, "leads.db"),
+                chroma_path=os.path.join(self.directory, "chroma_db"),
+                vector_backend="numpy"
+            )
+        self.assertEqual(embeddings.embedded, [])
+        self.assertEqual(self.rag.lexical_index.count(), 3)
+        self.assertEqual([result['id'] for result in self.rag.lexical_index.search("deposit refund")], ["doc_2"])
+        self.assertEqual(self.rag._backfill_lexical_index(), 0)
+        
+        # The next sync finds the backfilled documents unchanged and still removes stale ones
+        self.sync(self.documents[1:])
+        self.assertEqual(self.rag.lexical_index.count(), 2)
+    
+    def test_empty_lexical_index_warns_once(self):
+        """Searching with lexical retrieval and no lexical index prints one warning"""
+        with mock.patch("builtins.print") as printed:
+            self.rag.semantic_search_many(["wifi"], mode="lexical")
+            self.rag.semantic_search_many(["wifi", "deposit"], mode="lexical")
+        warnings = [call for call in printed.call_args_list if "Lexical index is empty" in str(call)]
+        self.assertEqual(len(warnings), 1)
+    
+    def test_reconcile_adopts_existing_documents(self):
+        """Documents already in the collection without a manifest are adopted, not re-embedded"""
+        self.rag.collection.upsert(
+            ids=[doc_id for doc_id, _, _ in self.documents],
+            embeddings=self.rag.embeddings.embed_documents([text for _, text, _ in self.documents]),
+            documents=[text for _, text, _ in self.documents],
+            metadatas=[metadata for _, _, metadata in self.documents]
+        )
+        self.rag.embeddings.embedded.clear()
+        self.assertEqual(len(self.rag.manifest), 0)
+        
+        self.assertEqual(self.sync(self.documents), {"upserted": 0, "deleted": 0, "unchanged": 3})
+        self.assertEqual(self.rag.embeddings.embedded, [])
+        self.assertEqual(len(self.rag.manifest), 3)
+    
+    def test_reconcile_drops_vanished_documents(self):
+        """Manifest rows whose document left the collection are re-upserted"""
+        self.sync(self.documents)
+        self.rag.collection.delete(ids=["doc_2"])
+        self.assertEqual(self.sync(self.documents), {"upserted": 1, "deleted": 0, "unchanged": 2})
+        self.assertEqual(self.rag.collection.count(), 3)
+
+
+class FailingEmbeddings(StubEmbeddings):
+    """Stub embedder whose first request containing a given text fails"""
+    
+    def __init__(self, fail_on):
+        super().__init__()
+        self.fail_on = fail_on
+        self.chunk_size = 2  # Two documents per embedding request
+    
+    def embed_documents(self, texts):
+        if self.fail_on in texts:
+            self.fail_on = None
+            raise RuntimeError("embedding request failed")
+        return super().embed_documents(texts)
+
+
+@unittest.skipUnless(rag_system is not None, "rag_system dependencies not installed")
+class TestSyncFromDatabase(unittest.TestCase):
+    """Documents streamed from a fixture database, and resuming an interrupted sync"""
+    
+    def setUp(self):
+        """Fixture database and a RAG system on a temporary numpy index"""
+        self.directory = tempfile.mkdtemp()
+        self.db_path = os.path.join(self.directory, "leads.db")
+        create_fixture_db(self.db_path)
+        self.env = mock.patch.dict(os.environ, {"OPENAI_API_KEY": "test-key"})
+        self.env.start()
+        self.rag = LeadRAGSystem(
+            db_path=self.db_path,
+            chroma_path=os.path.join(self.directory, "chroma_db"),
+            vector_backend="numpy"
+        )
+        self.rag.embeddings = StubEmbeddings()
+    
+    def tearDown(self):
+        """Restore the environment and remove temporary files"""
+        self.env.stop()
+        self.rag.manifest.close()
+        shutil.rmtree(self.directory, ignore_errors=True)
+    
+    def streamed(self, include_events, include_raw_text):
+        """(ids, texts, metadatas, counts) from _iter_documents"""
+        counts = {"summary": 0, "event": 0, "raw_timeline": 0, "raw_crm": 0, "task": 0}
+        documents = list(self.rag._iter_documents(include_events, include_raw_text, counts))
+        return (
+            [doc_id for doc_id, _, _ in documents],
+            [text for _, text, _ in documents],
+            [metadata for _, _, metadata in documents],
+            counts
+        )
+    
+    def test_documents_match_list_implementation(self):
+        """Ids, texts, metadata and per-source counts match the pre-streaming lists"""
+        for include_events in (True, False):
+            for include_raw_text in (True, False):
+                with self.subTest(include_events=include_events, include_raw_text=include_raw_text):
+                    self.assertEqual(
+                        self.streamed(include_events, include_raw_text),
+                        legacy_documents(self.db_path, include_events, include_raw_text)
+                    )
+    
+    def test_fixture_covers_every_source(self):
+        """The fixture yields documents of every source, including a multi-chunk timeline"""
+        ids, _, _, counts = self.streamed(True, True)
+        self.assertEqual(counts, {"summary": 3, "event": 2, "raw_timeline": 4, "raw_crm": 1, "task": 2})
+        self.assertIn("raw_timeline_L1_timeline_chunk_1", ids)
+        self.assertIn("raw_timeline_L2_timeline", ids)
+        self.assertIn("task_task_1", ids)
+        self.assertEqual(len(ids), len(set(ids)))
+    
+    def test_interrupted_sync_resumes_from_checkpoint(self):
+        """After a failed run, only documents that were not checkpointed are embedded again"""
+        ids, texts, _, _ = self.streamed(True, True)
+        # Fail the third embedding request (documents 5 and 6)
+        self.rag.embeddings = FailingEmbeddings(fail_on=texts[4])
+        with mock.patch.object(rag_system, "SYNC_BATCH_SIZE", 2), \
+                mock.patch.object(rag_system, "EMBEDDING_CONCURRENCY", 1):
+            with self.assertRaises(RuntimeError):
+                self.rag.create_embeddings()
+            
+            checkpointed = set(self.rag.manifest.lookup(ids))
+            self.assertTrue(set(ids[:2]) <= checkpointed)
+            self.assertNotIn(ids[4], checkpointed)
+            self.assertEqual(set(self.rag.collection.get(ids=ids, include=[])['ids']), checkpointed)
+            embedded_before = list(self.rag.embeddings.embedded)
+            self.rag.embeddings.embedded.clear()
+            
+            result = self.rag.create_embeddings()
+        
+        remaining = [text for doc_id, text in zip(ids, texts) if doc_id not in checkpointed]
+        self.assertEqual(sorted(self.rag.embeddings.embedded), sorted(remaining))
+        self.assertFalse(set(embedded_before) & set(self.rag.embeddings.embedded))
+        self.assertEqual(result, {"upserted": len(remaining), "deleted": 0, "unchanged": len(checkpointed)})
+        self.assertEqual(self.rag.collection.count(), len(ids))
+        
+        # A further run has nothing left to do
+        self.assertEqual(self.rag.create_embeddings(), {"upserted": 0, "deleted": 0, "unchanged": len(ids)})
+
+
+if __name__ == '__main__':
+    unittest.main()
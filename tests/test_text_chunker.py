@@ -0,0 +1,114 @@
+"""
+Text Chunker Tests
+Message splitting, token budgets and overlap of raw conversation chunking
+"""
+
+import unittest
+import json
+import os
+import sys
+
+# Add src to path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+from text_chunker import ChunkingReport, chunk_messages, chunk_text, split_messages
+from token_counter import count_tokens
+
+
+MODEL = "text-embedding-3-small"
+
+
+class TestSplitMessages(unittest.TestCase):
+    """JSON event lists and plain-text turns become messages"""
+    
+    def test_json_event_list(self):
+        """Each event is one message, with a short header in front of its text"""
+        timeline = json.dumps([
+            {"timestamp": "2024-01-02", "direction": "inbound", "content": "Is wifi included?"},
+            {"timestamp": "2024-01-03", "direction": "outbound", "message": "Yes, 100 Mbps."},
+            {"event_type": "status_change", "status": "Won"},
+        ])
+        messages = list(split_messages(timeline))
+        self.assertEqual(messages[0], "[2024-01-02 | inbound] Is wifi included?")
+        self.assertEqual(messages[1], "[2024-01-03 | outbound] Yes, 100 Mbps.")
+        # Events without message text are flattened to "key: value" lines
+        self.assertEqual(messages[2:], ["event_type: status_change", "status: Won"])
+    
+    def test_json_events_nested_in_object(self):
+        """Event lists inside an object are found"""
+        data = json.dumps({"lead": "42", "events": [{"text": "Called back"}, {"text": "Sent contract"}]})
+        self.assertEqual(list(split_messages(data)), ["lead: 42", "Called back", "Sent contract"])
+    
+    def test_plain_text_turns(self):
+        """Turns start at timestamps, speaker prefixes and blank lines"""
+        text = "Agent: Hello\nhow can I help?\nLead: Wifi question\n\n2024-01-02 follow up"
+        self.assertEqual(
+            list(split_messages(text)),
+            ["Agent: Hello\nhow can I help?", "Lead: Wifi question", "2024-01-02 follow up"]
+        )
+
+
+class TestChunkMessages(unittest.TestCase):
+    """Budgets, overlap and oversized messages"""
+    
+    def test_chunks_within_budget_with_bounded_overlap(self):
+        """Every chunk fits the budget, and repeated messages fit the overlap budget"""
+        messages = [f"Message {i}: " + "word " * (i % 7 + 3) for i in range(200)]
+        for max_tokens, overlap in ((64, 16), (128, 40), (40, 39)):
+            chunks = list(chunk_messages(messages, max_tokens, overlap, MODEL))
+            previous = None
+            for chunk in chunks:
+                self.assertLessEqual(count_tokens(chunk, MODEL), max_tokens)
+                lines = chunk.split("\n")
+                if previous is not None:
+                    repeated = [line for line in lines if line in previous]
+                    self.assertEqual(repeated, lines[:len(repeated)])  # Overlap is a prefix
+                    self.assertLessEqual(sum(count_tokens(line, MODEL) + 1 for line in repeated), overlap)
+                previous = set(lines)
+            # No message lost, none split
+            self.assertEqual(
+                sorted(set(line for chunk in chunks for line in chunk.split("\n"))),
+                sorted(message.strip() for message in messages)
+            )
+    
+    def test_no_overlap(self):
+        """With overlap 0 every message appears exactly once"""
+        messages = [f"Note {i} about the deposit" for i in range(50)]
+        chunks = list(chunk_messages(messages, 32, 0, MODEL))
+        self.assertEqual([line for chunk in chunks for line in chunk.split("\n")], messages)
+    
+    def test_oversized_single_message(self):
+        """A message over the budget is split at sentences, then by characters, within the budget"""
+        sentence_message = " ".join(f"Sentence number {i} is about the guarantor." for i in range(60))
+        unbroken_message = "x" * 5000
+        chunks = list(chunk_messages(["Short intro.", sentence_message, unbroken_message], 50, 10, MODEL))
+        self.assertGreater(len(chunks), 3)
+        for chunk in chunks:
+            self.assertLessEqual(count_tokens(chunk, MODEL), 50)
+        text = "".join(chunks)
+        self.assertIn("Sentence number 59 is about the guarantor.", text)
+        self.assertEqual(sum(chunk.count("x") for chunk in chunks if set(chunk) == {"x"}), 5000)
+    
+    def test_short_text_single_chunk(self):
+        """Text within the budget is one chunk"""
+        self.assertEqual(list(chunk_text("Agent: Hi\nLead: Hello", 100, 10, MODEL)), ["Agent: Hi\nLead: Hello"])
+
+
+class TestChunkingReport(unittest.TestCase):
+    """Before/after totals"""
+    
+    def test_totals(self):
+        """Chunk and token totals are compared against character slices"""
+        text = "\n".join(f"Agent: message {i} " + "word " * 20 for i in range(100))
+        chunks = list(chunk_text(text, 200, 0, MODEL))
+        report = ChunkingReport(model=MODEL)
+        report.add(text, chunks)
+        stats = report.get_stats()
+        self.assertEqual(stats["texts"], 1)
+        self.assertEqual(stats["chunks"], len(chunks))
+        self.assertEqual(stats["tokens"], sum(count_tokens(chunk, MODEL) for chunk in chunks))
+        self.assertEqual(stats["legacy_tokens"], count_tokens(text, MODEL))
+
+
+if __name__ == '__main__':
+    unittest.main()
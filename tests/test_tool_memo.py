@@ -0,0 +1,209 @@
+"""
+Tool Memo Tests
+Memo keys, what gets memoized, per-query isolation and session memos of the agent's tool calls
+"""
+
+import unittest
+import asyncio
+import json
+import os
+import sys
+import threading
+from collections import OrderedDict
+from unittest import mock
+
+# Add src to path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+try:
+    import ai_agent_simple
+    from ai_agent_simple import SEARCH_RESULT_COLUMNS, SimpleLeadIntelligenceAgent, _ToolMemo
+    from rag_system import FALLBACK_RETRIEVAL
+    from tool_output import to_columnar
+except ImportError:  # pydantic / langchain not installed
+    ai_agent_simple = None
+
+
+def make_agent(session_tool_memo=False, data_version=(1,)):
+    """Agent with only the memo state set up (no LLM, database or RAG system)"""
+    agent = object.__new__(SimpleLeadIntelligenceAgent)
+    agent.session_tool_memo = session_tool_memo
+    agent._session_memos = OrderedDict()
+    agent._session_memos_lock = threading.Lock()
+    agent.tool_calls_saved = 0
+    agent.sql_executor = mock.Mock()
+    agent.sql_executor.data_version.return_value = data_version
+    agent._lookup_answer = lambda question, chat_history: (None, None)
+    agent._store_answer = lambda question, scope, response: None
+    return agent
+
+
+class CountingTool:
+    """Tool function returning a fixed output and counting its calls"""
+    
+    def __init__(self, output='{"columns":["n"],"rows":[[1]]}'):
+        self.output = output
+        self.calls = []
+    
+    def __call__(self, *args, **kwargs):
+        self.calls.append(args)
+        return self.output
+
+
+class ScriptedExecutor:
+    """Stand-in for the AgentExecutor: calls a tool with each given input, in order"""
+    
+    def __init__(self, tool, inputs):
+        self.tool = tool
+        self.inputs = inputs
+    
+    def invoke(self, request):
+        for tool_input in self.inputs:
+            self.tool(tool_input)
+        return {"output": "done", "intermediate_steps": [None] * len(self.inputs)}
+    
+    async def ainvoke(self, request):
+        for tool_input in self.inputs:
+            await self.tool(tool_input)
+            await asyncio.sleep(0.01)  # Let the other query run in between
+        return {"output": "done", "intermediate_steps": [None] * len(self.inputs)}
+
+
+def search_output(retrieval):
+    """semantic_search tool output with one result of the given retrieval"""
+    rows = [{"distance": None, "retrieval": retrieval, "metadata": {}, "content": "wifi"}]
+    return json.dumps(to_columnar(rows, SEARCH_RESULT_COLUMNS))
+
+
+@unittest.skipUnless(ai_agent_simple is not None, "agent dependencies not installed")
+class TestToolMemo(unittest.TestCase):
+    """Which calls share a memo entry and which results are reused"""
+    
+    def setUp(self):
+        self.agent = make_agent()
+    
+    def test_key_normalization(self):
+        """Whitespace and SQL comments do not change the key; arguments and tools do"""
+        key = self.agent._tool_memo_key
+        self.assertEqual(
+            key("execute_sql_query", ("SELECT  status\nFROM leads -- all leads",), {}),
+            key("execute_sql_query", ({"query": "SELECT status FROM leads"},), {})
+        )
+        self.assertNotEqual(
+            key("execute_sql_query", ("SELECT status FROM leads WHERE status = 'Won'",), {}),
+            key("execute_sql_query", ("SELECT status FROM leads WHERE status = 'won'",), {})
+        )
+        self.assertEqual(key("semantic_search", ("  wifi   issues ",), {}), key("semantic_search", ("wifi issues",), {}))
+        self.assertNotEqual(key("semantic_search", ("wifi",), {"n_results": 5}), key("semantic_search", ("wifi",), {"n_results": 10}))
+        self.assertNotEqual(key("semantic_search", ("wifi",), {}), key("get_lead_by_id", ("wifi",), {}))
+    
+    def test_repeat_served_from_memo(self):
+        """A repeated call within a run returns the stored result; outside a run nothing is memoized"""
+        tool = CountingTool()
+        wrapped = self.agent._memoize_tool("execute_sql_query", tool)
+        wrapped("SELECT 1")
+        wrapped("SELECT 1")
+        self.assertEqual(len(tool.calls), 2)
+        
+        memo, token, saved_before = self.agent._run_with_tool_memo(None)
+        self.assertEqual(wrapped("SELECT 1"), tool.output)
+        self.assertEqual(wrapped("SELECT  1 -- again"), tool.output)
+        self.assertEqual(self.agent._finish_tool_memo(memo, token, saved_before), 1)
+        self.assertEqual(len(tool.calls), 3)
+        self.assertIsNone(ai_agent_simple._current_tool_memo.get())
+    
+    def test_errors_and_fallbacks_not_memoized(self):
+        """Errors, non-string results and lexical fallbacks are recomputed on every call"""
+        for output in (json.dumps({"error": "database is locked"}), None, search_output(FALLBACK_RETRIEVAL),
+                       json.dumps({"searches": [{"query": "wifi", **json.loads(search_output(FALLBACK_RETRIEVAL))}]})):
+            with self.subTest(output=output):
+                tool = CountingTool(output)
+                wrapped = self.agent._memoize_tool("semantic_search", tool)
+                memo, token, saved_before = self.agent._run_with_tool_memo(None)
+                wrapped("wifi")
+                wrapped("wifi")
+                self.assertEqual(self.agent._finish_tool_memo(memo, token, saved_before), 0)
+                self.assertEqual(len(tool.calls), 2)
+        
+        for retrieval in ("vector", "hybrid", "lexical"):
+            with self.subTest(retrieval=retrieval):
+                self.assertTrue(self.agent._is_memoizable(search_output(retrieval)))
+    
+    def test_memo_keeps_most_recent_entries(self):
+        """Past TOOL_MEMO_MAX_ENTRIES results the least recently used one is dropped"""
+        memo = _ToolMemo()
+        with mock.patch.object(ai_agent_simple, "TOOL_MEMO_MAX_ENTRIES", 2):
+            memo.set("a", "1")
+            memo.set("b", "2")
+            self.assertEqual(memo.get("a"), "1")
+            memo.set("c", "3")
+        self.assertEqual(list(memo.results), ["a", "c"])
+        self.assertEqual(memo.saved_calls, 1)
+
+
+@unittest.skipUnless(ai_agent_simple is not None, "agent dependencies not installed")
+class TestToolMemoScope(unittest.TestCase):
+    """Memos are per query, or per session with session_tool_memo"""
+    
+    def test_concurrent_aqueries_isolated(self):
+        """Concurrent aquery calls each get their own memo, even for identical tool calls"""
+        agent = make_agent()
+        calls = []
+        
+        async def search(query):
+            calls.append(query)
+            await asyncio.sleep(0.01)
+            return search_output("vector")
+        
+        agent.agent_executor = ScriptedExecutor(agent._amemoize_tool("semantic_search", search), ["wifi", "wifi"])
+        
+        async def run():
+            return await asyncio.gather(agent.aquery("wifi?"), agent.aquery("wifi again?"))
+        
+        responses = asyncio.run(run())
+        self.assertEqual([response["tool_calls_saved"] for response in responses], [1, 1])
+        self.assertEqual(calls, ["wifi", "wifi"])
+        self.assertEqual(agent.tool_calls_saved, 2)
+        self.assertIsNone(ai_agent_simple._current_tool_memo.get())
+    
+    def test_session_memo_shared_and_counted(self):
+        """With session_tool_memo, a later query reuses results of an earlier one in the same session"""
+        agent = make_agent(session_tool_memo=True)
+        tool = CountingTool()
+        wrapped = agent._memoize_tool("execute_sql_query", tool)
+        agent.agent_executor = ScriptedExecutor(wrapped, ["SELECT 1", "SELECT 1"])
+        self.assertEqual(agent.query("first", session_id="s1")["tool_calls_saved"], 1)
+        agent.agent_executor = ScriptedExecutor(wrapped, ["SELECT 1"])
+        self.assertEqual(agent.query("second", session_id="s1")["tool_calls_saved"], 1)
+        self.assertEqual(agent.query("other session", session_id="s2")["tool_calls_saved"], 0)
+        self.assertEqual(agent.query("no session")["tool_calls_saved"], 0)
+        self.assertEqual(len(tool.calls), 3)
+        self.assertEqual(agent.tool_calls_saved, 2)
+    
+    def test_session_memo_reset_on_data_change(self):
+        """A new data version starts the session's memo over"""
+        agent = make_agent(session_tool_memo=True)
+        memo = agent._get_tool_memo("s1")
+        self.assertIs(agent._get_tool_memo("s1"), memo)
+        agent.sql_executor.data_version.return_value = (2,)
+        fresh = agent._get_tool_memo("s1")
+        self.assertIsNot(fresh, memo)
+        self.assertEqual(fresh.data_version, (2,))
+        self.assertIsNot(agent._get_tool_memo(None), agent._get_tool_memo(None))
+        self.assertIsNot(make_agent()._get_tool_memo("s1"), make_agent()._get_tool_memo("s1"))
+    
+    def test_session_count_bounded(self):
+        """Only the TOOL_MEMO_MAX_SESSIONS most recently used sessions keep a memo"""
+        agent = make_agent(session_tool_memo=True)
+        with mock.patch.object(ai_agent_simple, "TOOL_MEMO_MAX_SESSIONS", 3):
+            memos = {session: agent._get_tool_memo(session) for session in ("s0", "s1", "s2")}
+            agent._get_tool_memo("s0")
+            agent._get_tool_memo("s3")
+            self.assertEqual(list(agent._session_memos), ["s2", "s0", "s3"])
+            self.assertIs(agent._get_tool_memo("s0"), memos["s0"])
+            self.assertIsNot(agent._get_tool_memo("s1"), memos["s1"])
+            self.assertEqual(len(agent._session_memos), 3)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,97 @@
+"""
+Tool Output Tests
+Columnar encoding round trips and token savings tracking
+"""
+
+import unittest
+import json
+import os
+import sys
+
+# Add src to path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+from tool_output import TRACK_SAVINGS_ENV_VAR, ToolOutputEncoder, compact_dumps, to_columnar
+
+
+def from_columnar(payload):
+    """Rebuild row dicts from a to_columnar payload"""
+    return [dict(zip(payload['columns'], row)) for row in payload['rows']]
+
+
+class TestColumnar(unittest.TestCase):
+    """to_columnar keeps every value and the column order"""
+    
+    def test_round_trip(self):
+        """Rows survive columnar encoding and JSON serialization unchanged"""
+        rows = [
+            {'lead_id': 1, 'name': 'Ana', 'budget': 250.5, 'status': 'Won'},
+            {'lead_id': 2, 'name': 'Bo "B" Ö', 'budget': None, 'status': 'Lost'},
+        ]
+        payload = json.loads(compact_dumps(to_columnar(rows)))
+        self.assertEqual(payload['columns'], ['lead_id', 'name', 'budget', 'status'])
+        self.assertEqual(from_columnar(payload), rows)
+    
+    def test_explicit_columns_keep_order(self):
+        """Given columns fix the output order"""
+        rows = [{'b': 2, 'a': 1}]
+        payload = to_columnar(rows, ['a', 'b'])
+        self.assertEqual(payload, {'columns': ['a', 'b'], 'rows': [[1, 2]]})
+    
+    def test_ragged_rows(self):
+        """Keys missing from some rows come back as None"""
+        rows = [{'a': 1}, {'b': 2}]
+        payload = to_columnar(rows)
+        self.assertEqual(payload['columns'], ['a', 'b'])
+        self.assertEqual(from_columnar(payload), [{'a': 1, 'b': None}, {'a': None, 'b': 2}])
+    
+    def test_empty(self):
+        """No rows, no columns"""
+        self.assertEqual(to_columnar([]), {'columns': [], 'rows': []})
+        self.assertEqual(to_columnar([], ['a']), {'columns': ['a'], 'rows': []})
+
+
+class TestToolOutputEncoder(unittest.TestCase):
+    """Savings are only measured when tracking is on"""
+    
+    ROWS = [{'lead_id': i, 'status': 'Won', 'name': f'Lead {i}'} for i in range(20)]
+    
+    def setUp(self):
+        """Make sure the environment does not turn tracking on"""
+        self.previous = os.environ.pop(TRACK_SAVINGS_ENV_VAR, None)
+    
+    def tearDown(self):
+        """Restore the environment"""
+        os.environ.pop(TRACK_SAVINGS_ENV_VAR, None)
+        if self.previous is not None:
+            os.environ[TRACK_SAVINGS_ENV_VAR] = self.previous
+    
+    def test_tracking_off_by_default(self):
+        """Encoding does not measure anything unless asked to"""
+        encoder = ToolOutputEncoder()
+        text = encoder.encode("tool", to_columnar(self.ROWS), legacy_payload={'rows': self.ROWS})
+        self.assertEqual(from_columnar(json.loads(text)), self.ROWS)
+        self.assertIsNone(encoder.last_call())
+        stats = encoder.get_stats()
+        self.assertFalse(stats['tracking'])
+        self.assertEqual(stats['calls'], 0)
+    
+    def test_tracking_from_env(self):
+        """The env var turns tracking on"""
+        os.environ[TRACK_SAVINGS_ENV_VAR] = "1"
+        self.assertTrue(ToolOutputEncoder().track_savings)
+    
+    def test_tracking_records_savings(self):
+        """Compact columnar output is smaller than the legacy encoding"""
+        encoder = ToolOutputEncoder(track_savings=True)
+        encoder.encode("tool", to_columnar(self.ROWS), legacy_payload={'rows': self.ROWS})
+        call = encoder.last_call()
+        self.assertGreater(call['saved_tokens'], 0)
+        stats = encoder.get_stats()
+        self.assertEqual(stats['calls'], 1)
+        self.assertEqual(stats['by_tool']['tool']['calls'], 1)
+        self.assertGreater(stats['saved_percent'], 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,190 @@
+"""
+Vector Index Tests
+Where filtering, row reuse, paging, search ordering and concurrent access of the numpy index
+"""
+
+import unittest
+import os
+import shutil
+import sys
+import tempfile
+import threading
+from unittest import mock
+
+import numpy as np
+
+# Add src to path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+import vector_index
+from vector_index import NumpyVectorIndex, matches_where
+
+
+STATUSES = ["Won", "Lost", "Open"]
+SOURCES = ["summary", "event", "raw_timeline", "raw_crm", "task"]
+
+
+def fixture_metadata(i):
+    """Metadata with a mix of indexed, unindexed, numeric and missing fields"""
+    metadata = {"source": SOURCES[i % len(SOURCES)], "lead_id": f"L{i % 7}", "score": i % 10}
+    if i % 4:
+        metadata["status"] = STATUSES[i % len(STATUSES)]
+    if i % 3 == 0:
+        metadata["budget"] = 100 * (i % 5)
+    return metadata
+
+
+class TestNumpyVectorIndex(unittest.TestCase):
+    """Index behaviour checked against brute-force references"""
+    
+    def setUp(self):
+        """Index of 200 random 16-dimensional vectors"""
+        self.directory = tempfile.mkdtemp()
+        self.index = NumpyVectorIndex(self.directory, name="test")
+        rng = np.random.default_rng(7)
+        self.ids = [f"doc_{i}" for i in range(200)]
+        self.vectors = rng.normal(size=(200, 16)).astype(np.float32)
+        self.metadatas = [fixture_metadata(i) for i in range(200)]
+        self.index.upsert(self.ids, self.vectors, [f"text {i}" for i in range(200)], self.metadatas)
+        self.queries = rng.normal(size=(5, 16)).astype(np.float32)
+    
+    def tearDown(self):
+        """Close and remove the index"""
+        self.index.close()
+        shutil.rmtree(self.directory, ignore_errors=True)
+    
+    def brute_force(self, query, n_results, where=None):
+        """Ids ranked by cosine similarity over the documents matching where"""
+        unit = self.vectors / np.linalg.norm(self.vectors, axis=1, keepdims=True)
+        scores = unit @ (query / np.linalg.norm(query))
+        rows = [row for row in np.argsort(-scores) if matches_where(self.metadatas[row], where)]
+        return [self.ids[row] for row in rows[:n_results]], [1.0 - float(scores[row]) for row in rows[:n_results]]
+    
+    def test_where_mask_matches_reference(self):
+        """Column masks select exactly the documents matches_where accepts"""
+        clauses = [
+            {"status": "Won"},
+            {"status": {"$eq": "Lost"}},
+            {"status": {"$ne": "Won"}},
+            {"source": {"$in": ["raw_timeline", "raw_crm"]}},
+            {"source": {"$nin": ["summary"]}},
+            {"score": {"$gte": 5}},
+            {"budget": {"$lt": 300}},
+            {"budget": {"$ne": 0}},
+            {"$and": [{"status": "Won"}, {"source": {"$in": ["event", "task"]}}]},
+            {"$or": [{"lead_id": "L3"}, {"score": {"$gt": 8}}]},
+            {"status": "Nobody"},
+        ]
+        for where in clauses:
+            with self.subTest(where=where):
+                expected = [doc_id for doc_id, metadata in zip(self.ids, self.metadatas) if matches_where(metadata, where)]
+                self.assertEqual(self.index.get(where=where, include=[])['ids'], expected)
+    
+    def test_query_ordering_matches_brute_force(self):
+        """Top-k ids and distances match an exhaustive cosine ranking, with and without filters"""
+        for where in (None, {"status": "Won"}, {"source": {"$in": ["raw_crm"]}}):
+            for query in self.queries:
+                with self.subTest(where=where):
+                    result = self.index.query(query_embeddings=[query], n_results=8, where=where)
+                    ids, distances = self.brute_force(query, 8, where)
+                    self.assertEqual(result['ids'][0], ids)
+                    np.testing.assert_allclose(result['distances'][0], distances, atol=1e-5)
+    
+    def test_query_batch_and_empty_filter(self):
+        """Several query embeddings return one result list each; an empty filter returns empty lists"""
+        result = self.index.query(query_embeddings=self.queries, n_results=3)
+        self.assertEqual([ids for ids in result['ids']], [self.brute_force(query, 3)[0] for query in self.queries])
+        empty = self.index.query(query_embeddings=self.queries[:2], n_results=3, where={"status": "Nobody"})
+        self.assertEqual(empty['ids'], [[], []])
+    
+    def test_upsert_reuses_rows(self):
+        """Updating keeps a document's row, and new documents fill deleted rows before growing"""
+        row = self.index._rows["doc_5"]
+        capacity = len(self.index._alive)
+        self.index.upsert(["doc_5"], [self.vectors[6]], ["updated"], [{"status": "Won"}])
+        self.assertEqual(self.index._rows["doc_5"], row)
+        self.assertEqual(self.index.get(ids=["doc_5"])['documents'], ["updated"])
+        self.assertEqual(self.index.count(), 200)
+        
+        freed = sorted(self.index._rows[doc_id] for doc_id in ("doc_10", "doc_11"))
+        self.index.delete(["doc_10", "doc_11"])
+        self.index.upsert(["new_1", "new_2"], self.vectors[:2])
+        self.assertEqual(sorted(self.index._rows[doc_id] for doc_id in ("new_1", "new_2")), freed)
+        self.assertEqual(len(self.index._alive), capacity)
+        self.assertEqual(self.index.count(), 200)
+    
+    def test_deleted_documents_not_returned(self):
+        """Deleted documents leave get, filters and search results"""
+        target = self.brute_force(self.queries[0], 1)[0][0]
+        self.index.delete([target])
+        self.assertEqual(self.index.get(ids=[target])['ids'], [])
+        self.assertNotIn(target, self.index.query(query_embeddings=[self.queries[0]], n_results=5)['ids'][0])
+        self.assertNotIn(target, self.index.get(include=[])['ids'])
+    
+    def test_get_pages(self):
+        """limit/offset pages cover every document exactly once, also under a filter"""
+        self.index.delete(["doc_3", "doc_50"])
+        for where in (None, {"status": {"$ne": "Lost"}}):
+            with self.subTest(where=where):
+                everything = self.index.get(where=where, include=[])['ids']
+                pages = []
+                offset = 0
+                while True:
+                    page = self.index.get(where=where, limit=7, offset=offset, include=["metadatas"])
+                    if not page['ids']:
+                        break
+                    self.assertLessEqual(len(page['ids']), 7)
+                    self.assertEqual(len(page['metadatas']), len(page['ids']))
+                    pages.extend(page['ids'])
+                    offset += len(page['ids'])
+                self.assertEqual(pages, everything)
+                self.assertEqual(len(set(pages)), len(pages))
+        self.assertEqual(len(self.index.get(include=[])['ids']), 198)
+    
+    def test_reopen(self):
+        """A reopened index serves the same documents and search results"""
+        before = self.index.query(query_embeddings=[self.queries[1]], n_results=5)
+        self.index.close()
+        self.index = NumpyVectorIndex(self.directory, name="test")
+        self.assertEqual(self.index.count(), 200)
+        self.assertEqual(self.index.query(query_embeddings=[self.queries[1]], n_results=5)['ids'], before['ids'])
+    
+    def test_query_during_growth_and_deletes(self):
+        """Queries running while the matrix grows and rows are deleted never fail or score deleted rows"""
+        errors = []
+        stop = threading.Event()
+        rng = np.random.default_rng(1)
+        
+        def search():
+            while not stop.is_set():
+                try:
+                    result = self.index.query(query_embeddings=self.queries[:2], n_results=10, where={"source": "summary"})
+                    for ids, distances in zip(result['ids'], result['distances']):
+                        # A row zeroed by a delete scores exactly 1.0
+                        if len(ids) != len(distances) or distances != sorted(distances) or 1.0 in distances:
+                            errors.append(result)
+                except Exception as e:  # noqa: BLE001 - any failure is a test failure
+                    errors.append(e)
+        
+        readers = [threading.Thread(target=search) for _ in range(3)]
+        for reader in readers:
+            reader.start()
+        try:
+            with mock.patch.object(vector_index, "INITIAL_CAPACITY", 16):
+                for batch in range(20):
+                    ids = [f"gone_{batch}_{i}" for i in range(50)]
+                    self.index.upsert(ids, rng.normal(size=(50, 16)), metadatas=[{"source": "summary"}] * 50)
+                    self.index.delete(ids)
+                    self.index.upsert([f"grow_{batch}_{i}" for i in range(50)], rng.normal(size=(50, 16)),
+                                      metadatas=[{"source": "event"}] * 50)
+        finally:
+            stop.set()
+            for reader in readers:
+                reader.join()
+        
+        self.assertEqual(errors, [])
+        self.assertEqual(self.index.count(), 200 + 20 * 50)
+
+
+if __name__ == '__main__':
+    unittest.main()